@@ -0,0 +1,46 @@
+"""add_search_sessions
+
+Revision ID: b7c1d2e3f4a5
+Revises: add_page_fields_001
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d2e3f4a5'
+down_revision: Union[str, Sequence[str], None] = 'add_page_fields_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create search_sessions table."""
+    op.create_table(
+        'search_sessions',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('query', sa.String(), nullable=False),
+        sa.Column('country', sa.String(), nullable=False, server_default='US'),
+        sa.Column('negative_keywords', sa.JSON(), nullable=True),
+        sa.Column('page_size', sa.Integer(), nullable=False, server_default='10'),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('after_cursor', sa.String(), nullable=True),
+        sa.Column('exhausted', sa.Boolean(), nullable=True, server_default=sa.false()),
+        sa.Column('seen_ids', sa.JSON(), nullable=True),
+        sa.Column('pages_served', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('ads_served', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_search_sessions_updated_at', 'search_sessions', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Drop search_sessions table."""
+    op.drop_index('ix_search_sessions_updated_at', table_name='search_sessions')
+    op.drop_table('search_sessions')
@@ -0,0 +1,39 @@
+"""add_graph_api_calls
+
+Revision ID: c3d8e1f2a4b6
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8e1f2a4b6'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create graph_api_calls table."""
+    op.create_table(
+        'graph_api_calls',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('path', sa.String(), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('calls', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_graph_api_calls_created_at', 'graph_api_calls', ['created_at'])
+
+
+def downgrade() -> None:
+    """Drop graph_api_calls table."""
+    op.drop_index('ix_graph_api_calls_created_at', table_name='graph_api_calls')
+    op.drop_table('graph_api_calls')
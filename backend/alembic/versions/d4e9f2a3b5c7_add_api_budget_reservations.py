@@ -0,0 +1,38 @@
+"""add_api_budget_reservations
+
+Revision ID: d4e9f2a3b5c7
+Revises: c3d8e1f2a4b6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e9f2a3b5c7'
+down_revision: Union[str, Sequence[str], None] = 'c3d8e1f2a4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create api_budget_reservations table."""
+    op.create_table(
+        'api_budget_reservations',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False),
+        sa.Column('owner', sa.String(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_api_budget_reservations_expires_at', 'api_budget_reservations', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Drop api_budget_reservations table."""
+    op.drop_index('ix_api_budget_reservations_expires_at', table_name='api_budget_reservations')
+    op.drop_table('api_budget_reservations')
@@ -0,0 +1,46 @@
+"""add_media_objects
+
+Revision ID: e5f1a3b4c6d8
+Revises: d4e9f2a3b5c7
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a3b4c6d8'
+down_revision: Union[str, Sequence[str], None] = 'd4e9f2a3b5c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create media_objects table."""
+    op.create_table(
+        'media_objects',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('r2_key', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(), nullable=True),
+        sa.Column('source_key', sa.String(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_media_objects_sha256', 'media_objects', ['sha256'], unique=True)
+    op.create_index('ix_media_objects_r2_key', 'media_objects', ['r2_key'], unique=True)
+    op.create_index('ix_media_objects_source_key', 'media_objects', ['source_key'])
+
+
+def downgrade() -> None:
+    """Drop media_objects table."""
+    op.drop_index('ix_media_objects_source_key', table_name='media_objects')
+    op.drop_index('ix_media_objects_r2_key', table_name='media_objects')
+    op.drop_index('ix_media_objects_sha256', table_name='media_objects')
+    op.drop_table('media_objects')
@@ -110,9 +110,9 @@ router = APIRouter()
 import os
 import asyncio
 import uuid
-import httpx
 from pathlib import Path
 from app.core.config import settings
+from app.services.http_clients import get_http_client
 
 try:
     import fal_client
@@ -130,21 +130,21 @@ async def download_and_save_image(image_url: str, prefix: str = "generated") ->
     Returns the local URL path.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(image_url, timeout=30.0)
-            response.raise_for_status()
+        client = get_http_client()
+        response = await client.get(image_url, timeout=30.0)
+        response.raise_for_status()
 
-            # Generate unique filename
-            unique_id = str(uuid.uuid4())
-            filename = f"{prefix}_{unique_id}.png"
-            file_path = UPLOAD_DIR / filename
+        # Generate unique filename
+        unique_id = str(uuid.uuid4())
+        filename = f"{prefix}_{unique_id}.png"
+        file_path = UPLOAD_DIR / filename
 
-            # Save image
-            with open(file_path, "wb") as f:
-                f.write(response.content)
+        # Save image
+        with open(file_path, "wb") as f:
+            f.write(response.content)
 
-            # Return local URL
-            return f"/uploads/{filename}"
+        # Return local URL
+        return f"/uploads/{filename}"
     except Exception as e:
         print(f"Error downloading image: {e}")
         # Return original URL as fallback
@@ -1,20 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Tuple
 from app.database import get_db
+from app.core.config import settings
 from app.schemas.research import (
     AdSearchRequest, ScrapedAdResponse, ScrapedAdCreate, ScrapedAdSearchResult, SavedSearchResponse,
+    SearchSessionCreate, SearchSessionPage, BatchSearchRequest,
     BrandScrapeCreate, BrandScrapeResponse, BrandScrapeListResponse
 )
 from app.services.research_service import ResearchService
 from app.services.rate_limiter import rate_limiter
+from app.services.search_cache import search_cache
+from app.services.blacklist_snapshot import blacklists
 
 router = APIRouter()
 
 @router.post("/search", response_model=List[ScrapedAdSearchResult])
 async def search_ads(request: AdSearchRequest, db: Session = Depends(get_db)):
     """Search ads without saving"""
-    # Check rate limit (now uses database)
+    # Check rate limit (metered Graph API calls)
     allowed, remaining, reset_seconds = rate_limiter.check_limit(db)
     if not allowed:
         raise HTTPException(
@@ -25,10 +30,45 @@ async def search_ads(request: AdSearchRequest, db: Session = Depends(get_db)):
     service = ResearchService(db)
     return await service.search_ads_async(request)
 
+@router.post("/search-batch")
+async def search_batch(request: BatchSearchRequest, db: Session = Depends(get_db)):
+    """
+    Search every query in every country concurrently.
+
+    Streams newline-delimited JSON: one "result" (or "error") object per
+    query/country as it completes, with ads deduped across the batch, then a
+    final "summary" object.
+    """
+    import json
+
+    searches = len(ResearchService.batch_searches(request))
+    if searches == 0:
+        raise HTTPException(status_code=400, detail="At least one query and one country are required")
+    if searches > settings.BATCH_SEARCH_MAX_SEARCHES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch has {searches} searches; the maximum is {settings.BATCH_SEARCH_MAX_SEARCHES}"
+        )
+
+    allowed, remaining, reset_seconds = rate_limiter.check_limit(db)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Try again in {reset_seconds} seconds."
+        )
+
+    service = ResearchService(db)
+
+    async def stream():
+        async for event in service.iter_batch_search(request):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.post("/search-and-save")
 async def search_and_save(request: AdSearchRequest, db: Session = Depends(get_db)):
     """Execute search and save as SavedSearch with all ads"""
-    # Check rate limit (now uses database)
+    # Check rate limit (metered Graph API calls)
     allowed, remaining, reset_seconds = rate_limiter.check_limit(db)
     if not allowed:
         raise HTTPException(
@@ -45,6 +85,52 @@ async def search_and_save(request: AdSearchRequest, db: Session = Depends(get_db
         "ads_count": len(ads)
     }
 
+@router.post("/search-sessions", response_model=SearchSessionPage)
+async def create_search_session(request: SearchSessionCreate, db: Session = Depends(get_db)):
+    """Start a paginated search and return its first page"""
+    allowed, remaining, reset_seconds = rate_limiter.check_limit(db)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Try again in {reset_seconds} seconds."
+        )
+
+    service = ResearchService(db)
+    session = service.create_search_session(request)
+    return await service.next_search_session_page(session.id)
+
+@router.post("/search-sessions/{session_id}/next", response_model=SearchSessionPage)
+async def next_search_session_page(session_id: str, db: Session = Depends(get_db)):
+    """Get the next page of a search session"""
+    allowed, remaining, reset_seconds = rate_limiter.check_limit(db)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Try again in {reset_seconds} seconds."
+        )
+
+    from app.services.api_budget import BudgetExceeded
+
+    service = ResearchService(db)
+    try:
+        page = await service.next_search_session_page(session_id)
+    except BudgetExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Try again in {e.reset_seconds} seconds."
+        )
+    if not page:
+        raise HTTPException(status_code=404, detail="Search session not found")
+    return page
+
+@router.delete("/search-sessions/{session_id}")
+def delete_search_session(session_id: str, db: Session = Depends(get_db)):
+    """Delete a search session"""
+    service = ResearchService(db)
+    if service.delete_search_session(session_id):
+        return {"message": "Search session deleted"}
+    raise HTTPException(status_code=404, detail="Search session not found")
+
 @router.get("/saved-searches", response_model=List[SavedSearchResponse])
 def get_saved_searches(db: Session = Depends(get_db)):
     """Get all saved searches with their ads"""
@@ -121,6 +207,7 @@ def add_to_blacklist(page_name: str, reason: str = None, db: Session = Depends(g
 
     blacklist_entry = PageBlacklist(page_name=page_name, reason=reason)
     db.add(blacklist_entry)
+    blacklists.publish_change(db)
     db.commit()
     db.refresh(blacklist_entry)
 
@@ -141,6 +228,7 @@ def remove_from_blacklist(blacklist_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Blacklist entry not found")
 
     db.delete(entry)
+    blacklists.publish_change(db)
     db.commit()
     return {"message": "Removed from blacklist"}
 
@@ -171,6 +259,7 @@ def add_to_keyword_blacklist(keyword: str, reason: str = None, db: Session = Dep
 
     blacklist_entry = KeywordBlacklist(keyword=keyword.lower(), reason=reason)
     db.add(blacklist_entry)
+    blacklists.publish_change(db)
     db.commit()
     db.refresh(blacklist_entry)
 
@@ -191,6 +280,7 @@ def remove_from_keyword_blacklist(blacklist_id: str, db: Session = Depends(get_d
         raise HTTPException(status_code=404, detail="Keyword blacklist entry not found")
 
     db.delete(entry)
+    blacklists.publish_change(db)
     db.commit()
     return {"message": "Removed from keyword blacklist"}
 
@@ -199,6 +289,30 @@ def get_rate_limit(db: Session = Depends(get_db)):
     """Get current rate limit usage (trailing 59 minutes)"""
     return rate_limiter.get_usage_stats(db)
 
+@router.get("/graph-meter")
+def get_graph_meter_stats():
+    """Get metered Graph API call counts, budget reservations and usage-header throttle pressure"""
+    from app.services.graph_metering import graph_meter
+    from app.services.api_budget import api_budget
+    from app.services.graph_throttle import graph_throttle
+    return {**graph_meter.stats(), "budget": api_budget.stats(), "throttle": graph_throttle.stats()}
+
+@router.get("/blacklist-snapshot")
+def get_blacklist_snapshot_stats():
+    """Get in-memory blacklist snapshot version and reload counters"""
+    return blacklists.stats()
+
+@router.get("/search-cache")
+def get_search_cache_stats():
+    """Get search result cache hit/miss counters"""
+    return search_cache.stats()
+
+@router.get("/browser-pool")
+def get_browser_pool_stats():
+    """Get Playwright browser pool utilisation"""
+    from app.services.browser_pool import browser_pool
+    return browser_pool.stats()
+
 @router.get("/facebook-pages")
 def get_facebook_pages(
     limit: int = 50,
@@ -207,12 +321,11 @@ def get_facebook_pages(
     db: Session = Depends(get_db)
 ):
     """Get Facebook pages with ad counts (excludes blacklisted pages)"""
-    from app.models import FacebookPage, PageBlacklist
+    from app.models import FacebookPage
     from sqlalchemy import desc
 
-    # Get blacklisted page names
-    blacklisted_pages = db.query(PageBlacklist.page_name).all()
-    blacklisted_names = {p.page_name.lower() for p in blacklisted_pages}
+    # Blacklisted page names (lowercased, from the in-memory snapshot)
+    blacklisted_names = blacklists.get(db).pages
 
     query = db.query(FacebookPage)
 
@@ -301,7 +414,7 @@ def create_vertical(name: str, description: str = None, db: Session = Depends(ge
 def get_vertical_aggregated_ads(vertical_id: str, db: Session = Depends(get_db)):
     """Get all unique ads for a vertical, grouped by Facebook page with media type counts (excluding blacklisted pages)"""
     try:
-        from app.models import ScrapedAd, SavedSearch, FacebookPage, PageBlacklist
+        from app.models import ScrapedAd, SavedSearch, FacebookPage
         from sqlalchemy import func, distinct, case
 
         # Get all searches for this vertical
@@ -311,9 +424,8 @@ def get_vertical_aggregated_ads(vertical_id: str, db: Session = Depends(get_db))
         if not search_ids:
             return []
 
-        # Get blacklisted page names
-        blacklisted_pages = db.query(PageBlacklist.page_name).all()
-        blacklisted_names = {p.page_name.lower() for p in blacklisted_pages}
+        # Blacklisted page names (lowercased, from the in-memory snapshot)
+        blacklisted_names = blacklists.get(db).pages
 
         # Get all unique ads for these searches, grouped by page
         # Use COALESCE to fall back to ID when content_hash is NULL
@@ -456,7 +568,7 @@ async def create_brand_scrape(
             scraper = BrandScraperService(scrape_db)
             scrape_record = scrape_db.query(BrandScrape).filter(BrandScrape.id == brand_scrape.id).first()
             if scrape_record:
-                await scraper.scrape_brand(scrape_record)
+                await scraper.scrape_brand(scrape_record, only_new=request.only_new_ads)
         except Exception as e:
             print(f"Background scrape error: {e}")
             scrape_record = scrape_db.query(BrandScrape).filter(BrandScrape.id == brand_scrape.id).first()
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 import os
 import uuid
-from typing import Dict
+from typing import AsyncIterator, Dict
 from pathlib import Path
 from app.core.config import settings
+from app.services.storage import ObjectTooLarge, r2_storage
 
 router = APIRouter()
 
@@ -19,46 +20,55 @@ UPLOAD_DIR = Path(__file__).parent.parent.parent.parent / "uploads"
 UPLOAD_DIR = UPLOAD_DIR.resolve()
 os.makedirs(UPLOAD_DIR, mode=0o755, exist_ok=True)
 
-# Initialize R2 client if configured
-_s3_client = None
-
-def get_s3_client():
-    global _s3_client
-    if _s3_client is None and settings.r2_enabled:
-        import boto3
-        _s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.r2_endpoint_url,
-            aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-            region_name='auto'
-        )
-    return _s3_client
-
-
-async def upload_to_r2(file_content: bytes, filename: str, content_type: str) -> str:
-    """Upload file to Cloudflare R2 and return public URL"""
-    client = get_s3_client()
-    if not client:
+# Uploads are read in chunks of this size and never held in memory whole
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {max_size / (1024 * 1024)}MB"
+    )
+
+
+async def read_chunks(file: UploadFile, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield an uploaded file's content chunk by chunk."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def upload_to_r2(chunks: AsyncIterator[bytes], filename: str, content_type: str, max_size: int) -> str:
+    """Stream file to Cloudflare R2 (multipart for large files) and return public URL"""
+    if not r2_storage.enabled:
         raise HTTPException(status_code=500, detail="R2 storage not configured")
 
     try:
-        client.put_object(
-            Bucket=settings.R2_BUCKET_NAME,
-            Key=filename,
-            Body=file_content,
-            ContentType=content_type
-        )
-        return f"{settings.R2_PUBLIC_URL}/{filename}"
+        stored = await r2_storage.put_stream(filename, chunks, content_type, max_size=max_size)
+        return stored.url
+    except ObjectTooLarge:
+        raise _file_too_large(max_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload to R2: {str(e)}")
 
 
-async def upload_to_local(file_content: bytes, filename: str) -> str:
-    """Upload file to local filesystem and return relative URL"""
+async def upload_to_local(chunks: AsyncIterator[bytes], filename: str, max_size: int) -> str:
+    """Stream file to local filesystem and return relative URL"""
     file_path = UPLOAD_DIR / filename
-    with open(file_path, "wb") as buffer:
-        buffer.write(file_content)
+    size = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise _file_too_large(max_size)
+                buffer.write(chunk)
+    except BaseException:
+        # No partial files left behind (too large, or the upload broke off)
+        file_path.unlink(missing_ok=True)
+        raise
     return f"/uploads/{filename}"
 
 
@@ -80,24 +90,14 @@ async def upload_file(file: UploadFile = File(...)):
         is_video = file_extension in ALLOWED_VIDEO_EXTENSIONS
         max_size = MAX_VIDEO_SIZE if is_video else MAX_IMAGE_SIZE
 
-        # Read file content
-        file_content = await file.read()
-
-        # Security: Validate file size
-        if len(file_content) > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {max_size / (1024 * 1024)}MB"
-            )
-
         # Generate a unique filename
         filename = f"{uuid.uuid4()}{file_extension}"
 
-        # Upload to R2 if configured, otherwise local
+        # Stream to R2 if configured, otherwise local; size is enforced as the file is read
         if settings.r2_enabled:
-            url = await upload_to_r2(file_content, filename, file.content_type or 'application/octet-stream')
+            url = await upload_to_r2(read_chunks(file), filename, file.content_type or 'application/octet-stream', max_size)
         else:
-            url = await upload_to_local(file_content, filename)
+            url = await upload_to_local(read_chunks(file), filename, max_size)
 
         # Return media type along with URL
         media_type = 'video' if is_video else 'image'
@@ -106,3 +106,9 @@ async def upload_file(file: UploadFile = File(...)):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not upload file: {str(e)}")
+
+
+@router.get("/storage-stats")
+def get_storage_stats():
+    """Get R2 operation counts, errors and latencies"""
+    return r2_storage.stats()
@@ -50,6 +50,92 @@ class Settings:
     R2_SECRET_ACCESS_KEY: str = os.getenv("R2_SECRET_ACCESS_KEY", "")
     R2_BUCKET_NAME: str = os.getenv("R2_BUCKET_NAME", "")
     R2_PUBLIC_URL: str = os.getenv("R2_PUBLIC_URL", "")
+    # Threads for blocking R2 calls (the client's connection pool is sized to match), botocore retry attempts and timeouts (seconds)
+    R2_MAX_WORKERS: int = int(os.getenv("R2_MAX_WORKERS", "8"))
+    R2_MAX_ATTEMPTS: int = int(os.getenv("R2_MAX_ATTEMPTS", "4"))
+    R2_CONNECT_TIMEOUT: float = float(os.getenv("R2_CONNECT_TIMEOUT", "10"))
+    R2_READ_TIMEOUT: float = float(os.getenv("R2_READ_TIMEOUT", "60"))
+    # Streamed (multipart) uploads: part size in bytes (min 5 MiB) and parts in flight per object
+    R2_PART_SIZE: int = int(os.getenv("R2_PART_SIZE", str(8 * 1024 * 1024)))
+    R2_PART_CONCURRENCY: int = int(os.getenv("R2_PART_CONCURRENCY", "4"))
+
+    # Outbound HTTP connection pools (per upstream)
+    GRAPH_HTTP_MAX_CONNECTIONS: int = int(os.getenv("GRAPH_HTTP_MAX_CONNECTIONS", "10"))
+    MEDIA_HTTP_MAX_CONNECTIONS: int = int(os.getenv("MEDIA_HTTP_MAX_CONNECTIONS", "20"))
+
+    # Ads Library result pages fetched ahead of parsing
+    GRAPH_PAGER_LOOKAHEAD: int = int(os.getenv("GRAPH_PAGER_LOOKAHEAD", "1"))
+
+    # Warm Chromium pool for Playwright fallbacks
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_MAX_PAGES: int = int(os.getenv("BROWSER_MAX_PAGES", "50"))  # Jobs per browser before relaunch
+    BROWSER_MAX_RSS_MB: int = int(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+
+    # Ad search result cache (0 disables caching; identical in-flight searches are still shared)
+    SEARCH_CACHE_TTL_SECONDS: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "120"))
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+
+    # Server-side search sessions idle longer than this are deleted
+    SEARCH_SESSION_TTL_HOURS: int = int(os.getenv("SEARCH_SESSION_TTL_HOURS", "24"))
+
+    # Batch search fan-out (/research/search-batch)
+    BATCH_SEARCH_CONCURRENCY: int = int(os.getenv("BATCH_SEARCH_CONCURRENCY", "4"))
+    BATCH_SEARCH_MAX_SEARCHES: int = int(os.getenv("BATCH_SEARCH_MAX_SEARCHES", "50"))
+
+    # Graph API call budget (rolling window across all workers), metering writes, call history kept and reservation expiry
+    GRAPH_RATE_LIMIT_CALLS: int = int(os.getenv("GRAPH_RATE_LIMIT_CALLS", "200"))
+    GRAPH_RATE_WINDOW_MINUTES: int = int(os.getenv("GRAPH_RATE_WINDOW_MINUTES", "59"))
+    GRAPH_METER_FLUSH_SECONDS: int = int(os.getenv("GRAPH_METER_FLUSH_SECONDS", "5"))
+    GRAPH_METER_FLUSH_BATCH: int = int(os.getenv("GRAPH_METER_FLUSH_BATCH", "50"))
+    GRAPH_METER_RETENTION_HOURS: int = int(os.getenv("GRAPH_METER_RETENTION_HOURS", "24"))
+    API_BUDGET_RESERVATION_TTL_SECONDS: int = int(os.getenv("API_BUDGET_RESERVATION_TTL_SECONDS", "600"))
+
+    # Graph API throttling: spacing starts at this usage %, reaching the max delay at 100%; retries use jittered backoff
+    GRAPH_THROTTLE_START_PCT: int = int(os.getenv("GRAPH_THROTTLE_START_PCT", "75"))
+    GRAPH_THROTTLE_MAX_DELAY_SECONDS: int = int(os.getenv("GRAPH_THROTTLE_MAX_DELAY_SECONDS", "20"))
+    GRAPH_RETRY_ATTEMPTS: int = int(os.getenv("GRAPH_RETRY_ATTEMPTS", "4"))
+    GRAPH_RETRY_BASE_SECONDS: float = float(os.getenv("GRAPH_RETRY_BASE_SECONDS", "1"))
+    GRAPH_RETRY_MAX_SECONDS: int = int(os.getenv("GRAPH_RETRY_MAX_SECONDS", "30"))
+
+    # Date-window sharding for large Graph pulls (searches/brand scrapes asking for at least GRAPH_SHARD_MIN_LIMIT ads)
+    GRAPH_SHARD_MIN_LIMIT: int = int(os.getenv("GRAPH_SHARD_MIN_LIMIT", "1000"))
+    GRAPH_SHARD_COUNT: int = int(os.getenv("GRAPH_SHARD_COUNT", "8"))
+    GRAPH_SHARD_CONCURRENCY: int = int(os.getenv("GRAPH_SHARD_CONCURRENCY", "4"))
+    GRAPH_SHARD_LOOKBACK_DAYS: int = int(os.getenv("GRAPH_SHARD_LOOKBACK_DAYS", "365"))
+
+    # Per-query API yield history: hedge with Chromium below this yield, skip the API after this many empty results
+    SEARCH_HEDGE_YIELD_THRESHOLD: float = float(os.getenv("SEARCH_HEDGE_YIELD_THRESHOLD", "0.5"))
+    SEARCH_SKIP_API_AFTER_ZERO: int = int(os.getenv("SEARCH_SKIP_API_AFTER_ZERO", "2"))
+    SEARCH_YIELD_TTL_HOURS: int = int(os.getenv("SEARCH_YIELD_TTL_HOURS", "24"))
+
+    # Brand scrape media pipeline: concurrent snapshot fetches, downloads (and per media host), R2 uploads and ads in flight;
+    # progress is committed every BRAND_PROGRESS_COMMIT_ADS ads
+    BRAND_SNAPSHOT_CONCURRENCY: int = int(os.getenv("BRAND_SNAPSHOT_CONCURRENCY", "4"))
+    BRAND_DOWNLOAD_CONCURRENCY: int = int(os.getenv("BRAND_DOWNLOAD_CONCURRENCY", "8"))
+    BRAND_DOWNLOAD_PER_HOST: int = int(os.getenv("BRAND_DOWNLOAD_PER_HOST", "4"))
+    BRAND_UPLOAD_CONCURRENCY: int = int(os.getenv("BRAND_UPLOAD_CONCURRENCY", "4"))
+    BRAND_ADS_IN_FLIGHT: int = int(os.getenv("BRAND_ADS_IN_FLIGHT", "16"))
+    BRAND_PROGRESS_COMMIT_ADS: int = int(os.getenv("BRAND_PROGRESS_COMMIT_ADS", "10"))
+
+    # Media captured during Playwright scrapes: in memory up to MEDIA_SPOOL_MEMORY_BYTES (items up to
+    # MEDIA_SPOOL_INLINE_MAX_BYTES), spilled to temp files in MEDIA_SPOOL_DIR (default: system temp) beyond that,
+    # MEDIA_SPOOL_MAX_BYTES in total per scrape
+    MEDIA_SPOOL_MEMORY_BYTES: int = int(os.getenv("MEDIA_SPOOL_MEMORY_BYTES", str(32 * 1024 * 1024)))
+    MEDIA_SPOOL_INLINE_MAX_BYTES: int = int(os.getenv("MEDIA_SPOOL_INLINE_MAX_BYTES", str(512 * 1024)))
+    MEDIA_SPOOL_MAX_BYTES: int = int(os.getenv("MEDIA_SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+    MEDIA_SPOOL_DIR: str = os.getenv("MEDIA_SPOOL_DIR", "")
+
+    # Raw Graph API / Playwright payload archive (zstd NDJSON by day): "off", "local" (RAW_ARCHIVE_DIR, an absolute path) or "r2" (under RAW_ARCHIVE_PREFIX)
+    RAW_ARCHIVE_BACKEND: str = os.getenv("RAW_ARCHIVE_BACKEND", "off")
+    RAW_ARCHIVE_DIR: str = os.getenv("RAW_ARCHIVE_DIR", "")
+    RAW_ARCHIVE_PREFIX: str = os.getenv("RAW_ARCHIVE_PREFIX", "raw-archive")
+    RAW_ARCHIVE_FLUSH_SECONDS: int = int(os.getenv("RAW_ARCHIVE_FLUSH_SECONDS", "60"))
+    RAW_ARCHIVE_FLUSH_BYTES: int = int(os.getenv("RAW_ARCHIVE_FLUSH_BYTES", str(8 * 1024 * 1024)))  # Uncompressed
+    RAW_ARCHIVE_MAX_PENDING_BYTES: int = int(os.getenv("RAW_ARCHIVE_MAX_PENDING_BYTES", str(64 * 1024 * 1024)))  # Oldest records dropped beyond this
+    RAW_ARCHIVE_ZSTD_LEVEL: int = int(os.getenv("RAW_ARCHIVE_ZSTD_LEVEL", "10"))
+
+    # In-memory blacklist snapshot (invalidated via LISTEN/NOTIFY; reloaded at least this often)
+    BLACKLIST_SNAPSHOT_MAX_AGE_SECONDS: int = int(os.getenv("BLACKLIST_SNAPSHOT_MAX_AGE_SECONDS", "300"))
 
     @property
     def r2_enabled(self) -> bool:
@@ -7,8 +7,10 @@ Telegram: @jasonakatiff
 Email: jason@jasonakatiff.com
 """
 
+import asyncio
 import os
 import re
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -18,12 +20,70 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from app.core.config import settings
 from app.core.rate_limit import limiter
+from app.services.http_clients import http_clients
+from app.services.storage import r2_storage
+from app.services.browser_pool import browser_pool
+from app.services.blacklist_snapshot import blacklists
+from app.services.graph_metering import graph_meter
+from app.services.raw_archive import raw_archive
+
+
+def validate_database_connection():
+    """Validate PostgreSQL connection on startup"""
+    from app.database import engine
+    from sqlalchemy import text
+
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text("SELECT version()"))
+            version = result.scalar()
+            print(f"✅ Connected to PostgreSQL")
+            print(f"   Version: {version}")
+    except Exception as e:
+        # Sanitize DATABASE_URL - hide password
+        sanitized_url = re.sub(r'://[^:]+:[^@]+@', '://***:***@', settings.DATABASE_URL)
+        print(f"❌ Failed to connect to database: {e}")
+        print(f"   DATABASE_URL: {sanitized_url}")
+        raise RuntimeError(f"Database connection failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup checks and app-lifetime resources shared by all requests."""
+    validate_database_connection()
+
+    # Pooled outbound HTTP clients (Graph API, fbcdn media)
+    http_clients.start()
+
+    # Drop the in-memory blacklist snapshot when another worker changes it
+    blacklists.start_listener()
+
+    # Batched writes of metered Graph API calls
+    graph_meter.start()
+
+    # Compressed archive of raw Graph API / Playwright payloads
+    raw_archive.start()
+
+    # Warm Chromium pool for Playwright fallbacks (launched without blocking startup)
+    browser_warmup = asyncio.create_task(browser_pool.start_in_background())
+    try:
+        yield
+    finally:
+        browser_warmup.cancel()
+        await asyncio.to_thread(blacklists.stop_listener)
+        await asyncio.to_thread(graph_meter.stop)
+        await asyncio.to_thread(raw_archive.stop)
+        r2_storage.shutdown()
+        await browser_pool.close()
+        await http_clients.aclose()
+
 
 app = FastAPI(
     title="Facebook Ad Automation API",
     version="1.0.0",
     openapi_url="/api/v1/openapi.json",
     docs_url="/api/v1/docs",
+    lifespan=lifespan,
 )
 
 # Register rate limiter
@@ -74,27 +134,6 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-# Database Connection Validation
-@app.on_event("startup")
-async def startup_event():
-    """Validate PostgreSQL connection on startup"""
-    from app.database import engine
-    from sqlalchemy import text
-    
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT version()"))
-            version = result.scalar()
-            print(f"✅ Connected to PostgreSQL")
-            print(f"   Version: {version}")
-    except Exception as e:
-        # Sanitize DATABASE_URL - hide password
-        sanitized_url = re.sub(r'://[^:]+:[^@]+@', '://***:***@', settings.DATABASE_URL)
-        print(f"❌ Failed to connect to database: {e}")
-        print(f"   DATABASE_URL: {sanitized_url}")
-        raise RuntimeError(f"Database connection failed: {e}")
-
-
 # Include Routers
 from app.api.v1 import brands, products, research, generated_ads, templates, facebook, uploads, dashboard, copy_generation, profiles, ad_remix, prompts, ad_styles, auth, users
 
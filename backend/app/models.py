@@ -322,6 +322,25 @@ class SavedSearch(Base):
     ads = relationship("ScrapedAd", back_populates="saved_search", cascade="all, delete-orphan")
 
 
+class SearchSession(Base):
+    """Server-side pagination state for an ad search (replaces client-sent exclude_ids)"""
+    __tablename__ = "search_sessions"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    query = Column(String, nullable=False)
+    country = Column(String, nullable=False, default='US')
+    negative_keywords = Column(JSON, nullable=True)  # List of negative keywords
+    page_size = Column(Integer, nullable=False, default=10)  # Ads requested per page
+    source = Column(String, nullable=True)  # 'api' or 'playwright', set by the first page
+    after_cursor = Column(String, nullable=True)  # Graph API paging.cursors.after for the next page
+    exhausted = Column(Boolean, default=False)  # No more results upstream
+    seen_ids = Column(JSON, nullable=True)  # Ad IDs already served in this session
+    pages_served = Column(Integer, default=0)
+    ads_served = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
+
 class ApiUsageLog(Base):
     __tablename__ = "api_usage_logs"
 
@@ -335,6 +354,27 @@ class ApiUsageLog(Base):
     date = Column(String, nullable=False, index=True)  # YYYY-MM-DD for daily grouping
 
 
+class GraphApiCall(Base):
+    __tablename__ = "graph_api_calls"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    source = Column(String, nullable=False)  # 'graph_client' (httpx), 'facebook_sdk' or 'facebook_service'
+    path = Column(String, nullable=True)  # Graph API path, e.g. /v21.0/ads_archive
+    status_code = Column(Integer, nullable=True)  # HTTP status, if a response arrived
+    calls = Column(Integer, nullable=False, default=1)  # Requests counted (batch calls count each request)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class ApiBudgetReservation(Base):
+    __tablename__ = "api_budget_reservations"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    calls = Column(Integer, nullable=False)  # Graph API calls claimed from the shared budget
+    owner = Column(String, nullable=True)  # What claimed them, e.g. 'ads_library_search'
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Claims from crashed workers lapse here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class PageBlacklist(Base):
     __tablename__ = "page_blacklist"
 
@@ -443,7 +483,7 @@ class BrandScrape(Base):
     __tablename__ = "brand_scrapes"
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    brand_name = Column(String, nullable=False, index=True)  # User-defined name, also R2 folder name
+    brand_name = Column(String, nullable=False, index=True)  # User-defined name
     page_id = Column(String, nullable=False)  # FB page ID from URL
     page_name = Column(String, nullable=True)  # Actual FB page name (discovered during scrape)
     page_url = Column(String, nullable=False)  # Original FB Ads Library URL
@@ -470,7 +510,7 @@ class BrandScrapedAd(Base):
     ad_copy = Column(Text, nullable=True)
     cta_text = Column(String, nullable=True)
     media_type = Column(String, nullable=True)  # image, video, carousel
-    media_urls = Column(JSON, nullable=True)  # R2 URLs for downloaded media
+    media_urls = Column(JSON, nullable=True)  # R2 URLs for downloaded media (content-addressed, see media_objects)
     original_media_urls = Column(JSON, nullable=True)  # Original FB media URLs
     platforms = Column(JSON, nullable=True)  # ['facebook', 'instagram']
     start_date = Column(String, nullable=True)
@@ -478,3 +518,18 @@ class BrandScrapedAd(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     brand_scrape = relationship("BrandScrape", back_populates="ads")
+
+
+class MediaObject(Base):
+    """Content-addressed media file on R2, shared by every brand scraped ad that uses it."""
+    __tablename__ = "media_objects"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)  # Hash of the file's bytes
+    r2_key = Column(String, nullable=False, unique=True, index=True)  # Object key, e.g. media/ab/<sha256>.jpg
+    size = Column(Integer, nullable=False)  # Bytes
+    mime_type = Column(String, nullable=True)
+    source_key = Column(String, nullable=True, index=True)  # fbcdn host + path it was first downloaded from
+    ref_count = Column(Integer, nullable=False, default=0)  # brand_scraped_ads media URLs pointing here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -8,11 +8,18 @@ class AdSearchRequest(BaseModel):
     limit: int = 10
     country: str = "US"
     offset: int = 0  # Pagination: controls scroll depth
-    exclude_ids: List[str] = []  # IDs to skip (already fetched)
+    exclude_ids: List[str] = []  # IDs to skip (already fetched) - prefer search sessions for paging
     negative_keywords: List[str] = []  # Keywords to exclude from results
     vertical_id: Optional[str] = None  # Vertical category ID
     search_type: str = "one_time"  # one_time, scheduled_daily, scheduled_weekly
     schedule_config: Optional[Dict[str, Any]] = None  # Cron schedule configuration
+    id_first: bool = False  # List IDs first and fetch full fields only for ads not already saved
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    countries: List[str] = ["US"]  # Every query is searched in every country
+    limit: int = 10  # Per query/country search
+    negative_keywords: List[str] = []  # Keywords to exclude from results
 
 class ScrapedAdBase(BaseModel):
     brand_name: Optional[str] = None
@@ -33,6 +40,19 @@ class ScrapedAdCreate(ScrapedAdBase):
 class ScrapedAdSearchResult(ScrapedAdBase):
     pass
 
+class SearchSessionCreate(BaseModel):
+    query: str
+    country: str = "US"
+    limit: int = 10  # Ads per page
+    negative_keywords: List[str] = []  # Keywords to exclude from results
+
+class SearchSessionPage(BaseModel):
+    session_id: str
+    page: int  # 1-based page number within the session
+    ads: List[ScrapedAdSearchResult]
+    has_more: bool  # False once the result set is exhausted
+    ads_served: int  # Total ads served by the session so far
+
 class ScrapedAdResponse(ScrapedAdBase):
     id: str
     search_id: Optional[str] = None
@@ -66,8 +86,9 @@ class SavedSearchResponse(SavedSearchBase):
 
 # Brand Scrapes schemas
 class BrandScrapeCreate(BaseModel):
-    brand_name: str  # User-defined name, also R2 folder name
+    brand_name: str  # User-defined name (media is stored by content hash, not under it)
     page_url: str  # Facebook Ads Library URL with view_all_page_id
+    only_new_ads: bool = False  # Skip ads already stored by earlier scrapes of this page
 
 
 class BrandScrapedAdResponse(BaseModel):
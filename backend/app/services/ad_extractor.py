@@ -0,0 +1,287 @@
+"""
+Incremental Ads Library DOM Extractor
+
+Injects a MutationObserver into an Ads Library page that finds each ad once,
+as its "Library ID:" text is rendered, and queues a raw record for it in
+window.__ads. Python drains the queue in chunks while (or after) scrolling, so
+extraction cost grows with the number of ads rather than with every div on the
+page, and no single page.evaluate call serialises the whole result set.
+
+Raw records hold the ad container's text lines plus a few DOM facts:
+
+    {id, lines, ctas, page_id, image_urls, has_video}
+
+The parse_* functions below turn them into the shapes each scraper expects.
+"""
+
+import re
+from typing import AsyncIterator, List
+
+DRAIN_CHUNK_SIZE = 200
+
+INSTALL_EXTRACTOR_JS = """
+() => {
+    if (window.__adExtractor) return window.__adIds.size;
+
+    const ID_RE = /Library ID:\\s*(\\d+)/;
+    const MAX_LEVELS = 10;
+    const MAX_CONTAINER_TEXT = 15000;
+
+    window.__ads = [];          // Extracted records waiting to be drained
+    window.__adIds = new Set(); // Every Library ID seen so far
+    const containers = new Map(); // id -> container element, until drained
+    let retry = new Set();        // "Library ID" elements whose container was incomplete
+
+    // Highest ancestor (within MAX_LEVELS) holding exactly this one ad.
+    // Uses textContent, which does not force layout.
+    const findContainer = (el) => {
+        let container = null;
+        let current = el;
+        for (let i = 0; i < MAX_LEVELS && current && current !== document.body; i++) {
+            const text = current.textContent || '';
+            if (text.length >= MAX_CONTAINER_TEXT) break;
+            if (text.split('Library ID:').length > 2) break;  // Reached a multi-ad wrapper
+            if (text.includes('Sponsored') || text.length > 200) container = current;
+            current = current.parentElement;
+        }
+        return container;
+    };
+
+    const extract = (el) => {
+        // The number may be rendered in a sibling of the "Library ID:" label
+        let match = null;
+        for (let node = el, i = 0; node && !match && i < 3; node = node.parentElement, i++) {
+            match = (node.textContent || '').match(ID_RE);
+        }
+        if (!match || window.__adIds.has(match[1])) return;
+
+        const container = findContainer(el);
+        if (!container) {
+            retry.add(el);
+            return;
+        }
+
+        const libraryId = match[1];
+        window.__adIds.add(libraryId);
+        container.setAttribute('data-ad-extracted', libraryId);
+        containers.set(libraryId, container);
+
+        // One innerText read per ad (keeps the rendered line breaks)
+        const lines = (container.innerText || '')
+            .split(String.fromCharCode(10))
+            .map(l => l.trim())
+            .filter(l => l.length > 0 && l !== String.fromCharCode(8203));
+
+        const ctas = [];
+        container.querySelectorAll('a, button').forEach(node => {
+            const text = (node.innerText || '').trim();
+            if (text && text.length < 40) ctas.push(text);
+        });
+
+        let pageId = null;
+        container.querySelectorAll('a[href*="view_all_page_id"]').forEach(link => {
+            const m = link.href.match(/view_all_page_id=(\\d+)/);
+            if (m) pageId = m[1];
+        });
+
+        window.__ads.push({id: libraryId, lines: lines, ctas: ctas, page_id: pageId});
+    };
+
+    const scan = (root) => {
+        if (root.nodeType === Node.TEXT_NODE) {
+            if (root.nodeValue.includes('Library ID:') && root.parentElement) extract(root.parentElement);
+            return;
+        }
+        if (root.nodeType !== Node.ELEMENT_NODE) return;
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        let node;
+        while ((node = walker.nextNode())) {
+            if (node.nodeValue.includes('Library ID:') && node.parentElement) extract(node.parentElement);
+        }
+    };
+
+    const retryPending = () => {
+        const pending = retry;
+        retry = new Set();
+        pending.forEach(el => { if (el.isConnected) extract(el); });
+    };
+
+    // Media is read when drained, since lazy images load after the text
+    const mediaOf = (container) => {
+        const imageUrls = [];
+        const add = (url) => {
+            if (url && (url.includes('scontent') || url.includes('fbcdn')) && !url.includes('emoji') && !imageUrls.includes(url)) {
+                imageUrls.push(url);
+            }
+        };
+        container.querySelectorAll('img').forEach(img => {
+            if (img.src && img.width > 50) add(img.src);
+            if (img.dataset && img.dataset.src) add(img.dataset.src);
+        });
+        container.querySelectorAll('[style*="background-image"]').forEach(node => {
+            const m = node.style.backgroundImage.match(/url\\(["']?(https:[^"')]+)["']?\\)/);
+            if (m) add(m[1]);
+        });
+        const hasVideo = container.querySelector('video') !== null ||
+                         /\\d+:\\d+/.test(container.textContent || '');
+        return {image_urls: imageUrls, has_video: hasVideo};
+    };
+
+    window.__drainAds = (max) => {
+        retryPending();
+        const chunk = window.__ads.splice(0, max);
+        chunk.forEach(record => {
+            const container = containers.get(record.id);
+            Object.assign(record, container ? mediaOf(container) : {image_urls: [], has_video: false});
+            containers.delete(record.id);
+        });
+        return chunk;
+    };
+
+    window.__adExtractor = new MutationObserver(mutations => {
+        mutations.forEach(mutation => {
+            if (mutation.type === 'characterData') scan(mutation.target);
+            mutation.addedNodes.forEach(scan);
+        });
+        if (retry.size) retryPending();
+    });
+    window.__adExtractor.observe(document.body, {childList: true, subtree: true, characterData: true});
+
+    scan(document.body);
+    return window.__adIds.size;
+}
+"""
+
+# Ad count for the adaptive scroller (O(1) once the extractor is installed)
+EXTRACTED_COUNT_JS = "() => window.__adIds ? window.__adIds.size : 0"
+
+
+async def install_extractor(page) -> int:
+    """Start extracting ads on the page; returns the number found so far."""
+    return await page.evaluate(INSTALL_EXTRACTOR_JS)
+
+
+async def drain_ads(page, chunk_size: int = DRAIN_CHUNK_SIZE) -> AsyncIterator[List[dict]]:
+    """Yield queued raw ad records in chunks until the queue is empty."""
+    while True:
+        chunk = await page.evaluate("max => window.__drainAds ? window.__drainAds(max) : []", chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def collect_ads(page, chunk_size: int = DRAIN_CHUNK_SIZE) -> List[dict]:
+    """Drain every queued raw ad record."""
+    records = []
+    async for chunk in drain_ads(page, chunk_size):
+        records.extend(chunk)
+    return records
+
+
+# Ads Library page chrome that never holds ad content
+_METADATA_MARKERS = ('Library ID', 'See ad details', 'Menu')
+_STOP_MARKERS = ('Library ID', 'Started running', 'Platforms', 'http://', 'https://', 'HTTPS://', 'HTTP://')
+SEARCH_CTAS = ('learn more', 'shop now', 'sign up', 'get started', 'download', 'subscribe', 'buy now', 'see more')
+LIBRARY_CTAS = ('Learn More', 'Shop Now', 'Sign Up', 'Get Offer', 'Book Now', 'Contact Us', 'Download', 'Apply Now', 'Get Quote', 'Subscribe')
+_START_DATE_RE = re.compile(r'Started running on\s+([A-Za-z]+\s+\d+,?\s*\d*)')
+
+
+def _sponsored_index(lines: List[str]) -> int:
+    try:
+        return lines.index('Sponsored')
+    except ValueError:
+        return -1
+
+
+def parse_search_record(record: dict) -> dict:
+    """Parse a raw record into the text-only fields used by ad search results."""
+    lines = record.get('lines') or []
+    text = '\n'.join(lines)
+    sponsored = _sponsored_index(lines)
+
+    # Brand is the line right before "Sponsored", unless it is page metadata
+    brand_name = 'Unknown Brand'
+    if sponsored > 0:
+        candidate = lines[sponsored - 1]
+        if (3 < len(candidate) < 150
+                and not any(marker in candidate for marker in _METADATA_MARKERS)
+                and candidate not in ('Active', 'Inactive')):
+            brand_name = candidate
+
+    # First substantive line after "Sponsored" is the headline, the rest is copy
+    headline = None
+    copy_lines = []
+    for line in lines[sponsored + 1:]:
+        if any(marker in line for marker in _STOP_MARKERS):
+            break
+        if len(line) < 10:
+            continue
+        if headline is None:
+            headline = line
+        else:
+            copy_lines.append(line)
+
+    cta_text = None
+    for candidate in record.get('ctas') or []:
+        if any(cta in candidate.lower() for cta in SEARCH_CTAS):
+            cta_text = candidate
+
+    platforms = [
+        platform for label, platform in (
+            ('Facebook', 'facebook'), ('Instagram', 'instagram'),
+            ('Messenger', 'messenger'), ('Audience Network', 'audience_network'),
+        ) if label in text
+    ]
+
+    date_match = _START_DATE_RE.search(text)
+
+    return {
+        'external_id': record['id'],
+        'brand_name': brand_name,
+        'headline': headline,
+        'ad_copy': '\n'.join(copy_lines)[:500],
+        'cta_text': cta_text,
+        'platforms': platforms or None,
+        'start_date': date_match.group(1) if date_match else None,
+    }
+
+
+def parse_library_record(record: dict, full_copy: bool = False) -> dict:
+    """
+    Parse a raw record into a Graph API-shaped ad dict for brand scrapes.
+
+    Args:
+        full_copy: Join every body line into the copy instead of only the first
+    """
+    lines = record.get('lines') or []
+    text = '\n'.join(lines)
+    sponsored = _sponsored_index(lines)
+
+    page_name = lines[sponsored - 1] if sponsored > 0 else None
+
+    headline = None
+    ad_copy = None
+    for line in lines[sponsored + 1:] if sponsored >= 0 else []:
+        if 'Library ID' in line or (full_copy and 'http' in line):
+            break
+        if len(line) <= 10:
+            continue
+        if headline is None:
+            headline = line
+        elif full_copy:
+            ad_copy = f"{ad_copy} {line}" if ad_copy else line
+        elif ad_copy is None:
+            ad_copy = line
+
+    cta_text = next((cta for cta in LIBRARY_CTAS if cta in text), None)
+
+    return {
+        'id': record['id'],
+        'page_name': page_name,
+        'page_id': record.get('page_id'),
+        'ad_creative_link_titles': [headline] if headline else None,
+        'ad_creative_bodies': [ad_copy] if ad_copy else None,
+        'ad_creative_link_captions': [cta_text] if cta_text else None,
+        '_image_urls': record.get('image_urls') or [],
+        '_has_video': bool(record.get('has_video')),
+    }
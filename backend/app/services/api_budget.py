@@ -0,0 +1,188 @@
+"""
+Graph API Call Budget
+
+Reserve / settle accounting on top of the Graph API meter, so concurrent
+searches (in any worker) can't all read "190 used" and each spend 5 calls.
+
+- reserve(n) atomically claims n calls from the shared budget, or raises
+  BudgetExceeded. Claims live in the api_budget_reservations table and are
+  made under a Postgres advisory lock, so only one worker decides at a time.
+- spend(1, reservation) wraps a single request: it draws from the caller's
+  reservation while that lasts, and reserves (then settles) one call at a
+  time beyond it, e.g. for long pagination.
+- settle(reservation) writes the meter's pending calls, so the calls actually
+  made are visible to every worker, then drops the claim.
+
+Used calls are counted from graph_api_calls (see graph_metering) plus every
+unexpired claim. A claim still held while its calls are written is counted
+twice until it is settled, which errs on the side of staying under the limit.
+Claims left behind by a crashed worker expire after
+API_BUDGET_RESERVATION_TTL_SECONDS.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.services.graph_metering import GraphMeter, graph_meter
+
+# pg_advisory_xact_lock key serialising reservations across workers
+BUDGET_LOCK_KEY = 7_146_212_301
+
+
+class BudgetExceeded(Exception):
+    """Not enough Graph API calls left in the window."""
+
+    def __init__(self, requested: int, reset_seconds: int = 0):
+        super().__init__(f"Graph API budget exhausted (requested {requested} calls); resets in {reset_seconds}s")
+        self.requested = requested
+        self.reset_seconds = reset_seconds
+
+
+class Reservation:
+    """Calls claimed from the budget, and how many of them were used."""
+
+    def __init__(self, reservation_id: Optional[str], calls: int):
+        self.id = reservation_id
+        self.calls = calls
+        self.used = 0
+        self.settled = False
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.calls - self.used)
+
+
+class PostgresBudgetLedger:
+    """Reservation rows in api_budget_reservations, decided under an advisory lock."""
+
+    def reserve(self, calls: int, max_calls: int, window_seconds: int, ttl_seconds: int, owner: str) -> Optional[str]:
+        """Claim calls if they fit in the window; returns the claim ID or None."""
+        from sqlalchemy import func, text
+        from app.database import SessionLocal
+        from app.models import ApiBudgetReservation, GraphApiCall
+
+        db = SessionLocal()
+        try:
+            # Held until commit/rollback, so checking and claiming is atomic
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": BUDGET_LOCK_KEY})
+            now = datetime.now(timezone.utc)
+
+            spent = db.query(func.coalesce(func.sum(GraphApiCall.calls), 0)).filter(
+                GraphApiCall.created_at >= now - timedelta(seconds=window_seconds)
+            ).scalar()
+            held = db.query(func.coalesce(func.sum(ApiBudgetReservation.calls), 0)).filter(
+                ApiBudgetReservation.expires_at > now
+            ).scalar()
+
+            if spent + held + calls > max_calls:
+                db.rollback()
+                return None
+
+            db.query(ApiBudgetReservation).filter(
+                ApiBudgetReservation.expires_at <= now
+            ).delete(synchronize_session=False)
+            reservation = ApiBudgetReservation(
+                calls=calls,
+                owner=owner,
+                expires_at=now + timedelta(seconds=ttl_seconds)
+            )
+            db.add(reservation)
+            db.commit()
+            return reservation.id
+        finally:
+            db.close()
+
+    def release(self, reservation_id: str):
+        """Drop a claim."""
+        from app.database import SessionLocal
+        from app.models import ApiBudgetReservation
+
+        db = SessionLocal()
+        try:
+            db.query(ApiBudgetReservation).filter(
+                ApiBudgetReservation.id == reservation_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+class ApiBudget:
+    """Shared Graph API call budget with reserve / settle semantics."""
+
+    def __init__(self, ledger=None, meter: GraphMeter = None, max_calls: int = None, window_minutes: int = None, ttl_seconds: int = None):
+        self.ledger = ledger or PostgresBudgetLedger()
+        self.meter = meter or graph_meter
+        self.max_calls = max_calls or settings.GRAPH_RATE_LIMIT_CALLS
+        self.window_seconds = (window_minutes or settings.GRAPH_RATE_WINDOW_MINUTES) * 60
+        self.ttl_seconds = ttl_seconds or settings.API_BUDGET_RESERVATION_TTL_SECONDS
+
+        self.reserved = 0
+        self.rejected = 0
+
+    async def reserve(self, calls: int, owner: str = "graph") -> Reservation:
+        """Claim calls from the shared budget; raises BudgetExceeded if they don't fit."""
+        try:
+            reservation_id = await asyncio.to_thread(
+                self.ledger.reserve, calls, self.max_calls, self.window_seconds, self.ttl_seconds, owner
+            )
+            allowed = reservation_id is not None
+        except Exception as e:
+            # Ledger unavailable: fall back to this worker's view of the window
+            print(f"API budget ledger error: {e}, checking local meter only")
+            reservation_id = None
+            allowed = self.meter.calls_in_window() + calls <= self.max_calls
+
+        if not allowed:
+            self.rejected += 1
+            raise BudgetExceeded(calls, self.meter.reset_in_seconds())
+
+        self.reserved += calls
+        return Reservation(reservation_id, calls)
+
+    async def settle(self, reservation: Optional[Reservation]):
+        """
+        Finish a reservation: make the calls it used visible to every worker,
+        then return the claim (including any unused calls) to the budget.
+        """
+        if reservation is None or reservation.settled:
+            return
+        reservation.settled = True
+        try:
+            if reservation.used:
+                await asyncio.to_thread(self.meter.flush)
+            if reservation.id:
+                await asyncio.to_thread(self.ledger.release, reservation.id)
+        except Exception as e:
+            # The claim expires on its own
+            print(f"API budget settle error: {e}")
+
+    @asynccontextmanager
+    async def spend(self, calls: int = 1, reservation: Reservation = None, owner: str = "graph"):
+        """Account for one request: from `reservation` while it lasts, otherwise reserved on its own."""
+        if reservation is not None and not reservation.settled and reservation.remaining >= calls:
+            reservation.used += calls
+            yield reservation
+            return
+
+        single = await self.reserve(calls, owner)
+        single.used = calls
+        try:
+            yield single
+        finally:
+            await self.settle(single)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.max_calls,
+            "window_seconds": self.window_seconds,
+            "reserved": self.reserved,
+            "rejected": self.rejected,
+        }
+
+
+# Singleton instance
+api_budget = ApiBudget()
@@ -0,0 +1,184 @@
+"""
+Offline Re-parse of the Raw Archive
+
+Runs the current parsers over archived raw payloads (see raw_archive) and
+bulk-updates the parsed fields of scraped_ads and brand_scraped_ads, so parser
+fixes reach old data without a single API call.
+
+Archive files are parsed in a process pool; for each ad the most recently
+captured payload wins. Only text fields are rewritten; media (R2 URLs and
+the media type derived from downloads) is left alone for brand ads.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.raw_archive import (
+    DOM_LIBRARY, DOM_SEARCH, GRAPH_BRAND, GRAPH_SEARCH, GRAPHQL_LIBRARY, GRAPHQL_SEARCH,
+    decode_records, partition, days_between
+)
+
+SCRAPED_ADS = "scraped_ads"
+BRAND_SCRAPED_ADS = "brand_scraped_ads"
+
+UPDATE_CHUNK_SIZE = 500
+
+# {table: {external_id: (captured_at, fields)}}
+Updates = Dict[str, Dict[str, Tuple[str, dict]]]
+
+
+def _search_api_fields(payload: dict, context: dict) -> Optional[dict]:
+    from app.services.scraper import FacebookAdsLibraryAPI
+
+    ad = FacebookAdsLibraryAPI._parse_api_ad(payload)
+    if not ad:
+        return None
+    return ad.model_dump(include={"brand_name", "headline", "ad_copy", "cta_text", "platforms", "start_date", "media_type"})
+
+
+def _scraped_ad_fields(parsed: dict) -> dict:
+    """Fields of a Playwright search result, as _iter_fallback_search stores them."""
+    fields = {
+        "brand_name": parsed.get("brand_name", "Unknown Brand"),
+        "headline": parsed.get("headline"),
+        "ad_copy": (parsed.get("ad_copy") or "No copy available")[:500],
+        "cta_text": parsed.get("cta_text"),
+        "platforms": parsed.get("platforms"),
+        "start_date": parsed.get("start_date"),
+    }
+    if parsed.get("media_type"):
+        fields["media_type"] = parsed["media_type"]
+    return fields
+
+
+def _search_dom_fields(payload: dict, context: dict) -> dict:
+    from app.services.ad_extractor import parse_search_record
+
+    return _scraped_ad_fields(parse_search_record(payload))
+
+
+def _search_graphql_fields(payload: dict, context: dict) -> dict:
+    from app.services.graphql_capture import parse_search_node
+
+    return _scraped_ad_fields(parse_search_node(payload))
+
+
+def _brand_api_fields(payload: dict, context: dict) -> dict:
+    from app.services.brand_scraper import parse_brand_ad
+
+    return parse_brand_ad(payload)
+
+
+def _brand_dom_fields(payload: dict, context: dict) -> dict:
+    from app.services.ad_extractor import parse_library_record
+    from app.services.brand_scraper import parse_brand_ad
+
+    return parse_brand_ad(parse_library_record(payload, full_copy=bool(context.get("full_copy"))))
+
+
+def _brand_graphql_fields(payload: dict, context: dict) -> dict:
+    from app.services.brand_scraper import parse_brand_ad
+    from app.services.graphql_capture import parse_library_node
+
+    return parse_brand_ad(parse_library_node(payload))
+
+
+# kind -> (table, parser); payloads carry the ad's Library ID as "id" (or "ad_archive_id" for JSON captures)
+PARSERS = {
+    GRAPH_SEARCH: (SCRAPED_ADS, _search_api_fields),
+    DOM_SEARCH: (SCRAPED_ADS, _search_dom_fields),
+    GRAPHQL_SEARCH: (SCRAPED_ADS, _search_graphql_fields),
+    GRAPH_BRAND: (BRAND_SCRAPED_ADS, _brand_api_fields),
+    DOM_LIBRARY: (BRAND_SCRAPED_ADS, _brand_dom_fields),
+    GRAPHQL_LIBRARY: (BRAND_SCRAPED_ADS, _brand_graphql_fields),
+}
+
+
+def _merge(into: Updates, updates: Updates):
+    """Keep the most recently captured fields per ad."""
+    for table, ads in updates.items():
+        target = into.setdefault(table, {})
+        for external_id, (captured_at, fields) in ads.items():
+            current = target.get(external_id)
+            if current is None or captured_at >= current[0]:
+                target[external_id] = (captured_at, fields)
+
+
+def parse_archive_file(store, key: str, kinds: Iterable[str] = None) -> Tuple[Updates, int, int]:
+    """
+    Parse one archive file (runs in a worker process).
+
+    Returns (updates, records, errors).
+    """
+    kinds = set(kinds or PARSERS)
+    updates: Updates = {}
+    records = 0
+    errors = 0
+    for record in decode_records(store.get(key)):
+        kind = record.get("kind")
+        if kind not in kinds:
+            continue
+        records += 1
+        table, parse = PARSERS[kind]
+        payload = record.get("payload") or {}
+        external_id = payload.get("id") or payload.get("ad_archive_id")
+        try:
+            fields = parse(payload, record.get("context") or {})
+        except Exception:
+            errors += 1
+            continue
+        if not external_id or not fields:
+            continue
+        captured_at = record.get("captured_at") or ""
+        ads = updates.setdefault(table, {})
+        current = ads.get(str(external_id))
+        if current is None or captured_at >= current[0]:
+            ads[str(external_id)] = (captured_at, fields)
+    return updates, records, errors
+
+
+def collect_updates(store, since: date, until: date, kinds: Iterable[str] = None, workers: int = None) -> Tuple[Updates, dict]:
+    """Parse every archive file captured between two days, in a process pool."""
+    keys = [key for day in days_between(since, until) for key in store.list(partition(day))]
+    kinds = list(kinds or PARSERS)
+    updates: Updates = {}
+    stats = {"files": len(keys), "records": 0, "parse_errors": 0}
+    if not keys:
+        return updates, stats
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(keys)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_archive_file, store, key, kinds) for key in keys]
+        for future in futures:
+            file_updates, records, errors = future.result()
+            _merge(updates, file_updates)
+            stats["records"] += records
+            stats["parse_errors"] += errors
+
+    stats.update({table: len(ads) for table, ads in updates.items()})
+    return updates, stats
+
+
+def apply_updates(db, updates: Updates, chunk_size: int = UPDATE_CHUNK_SIZE) -> Dict[str, int]:
+    """Bulk-update parsed fields by external ID; returns rows updated per table."""
+    from app.models import BrandScrapedAd, ScrapedAd
+
+    models = {SCRAPED_ADS: ScrapedAd, BRAND_SCRAPED_ADS: BrandScrapedAd}
+    updated = {}
+    for table, ads in updates.items():
+        model = models[table]
+        external_ids = list(ads)
+        count = 0
+        for start in range(0, len(external_ids), chunk_size):
+            chunk = external_ids[start:start + chunk_size]
+            rows = db.query(model.id, model.external_id).filter(model.external_id.in_(chunk)).all()
+            # Brand ads are stored once per scrape, so one ID may update several rows
+            mappings: List[dict] = [dict(ads[external_id][1], id=row_id) for row_id, external_id in rows]
+            if mappings:
+                db.bulk_update_mappings(model, mappings)
+                db.commit()
+                count += len(mappings)
+        updated[table] = count
+    return updated
@@ -0,0 +1,177 @@
+"""
+Blacklist Snapshot
+
+Keeps the page and keyword blacklists in memory as an immutable, versioned
+snapshot, so searches and page listings don't scan both tables per request.
+
+- The blacklist endpoints call publish_change() in the same transaction as
+  their write. On commit that sends a Postgres NOTIFY on BLACKLIST_CHANNEL
+  and drops this worker's snapshot.
+- Every worker runs a LISTEN thread (started in the FastAPI lifespan) that
+  drops its snapshot when the notification arrives.
+- Snapshots older than BLACKLIST_SNAPSHOT_MAX_AGE_SECONDS are reloaded anyway,
+  in case a notification is missed while the listener reconnects.
+
+Other in-memory state derived from the blacklists (e.g. the search result
+cache) registers with add_listener() to be invalidated alongside.
+"""
+
+import select
+import threading
+import time
+from typing import Callable, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+BLACKLIST_CHANNEL = "blacklist_changed"
+LISTEN_POLL_SECONDS = 5
+LISTEN_RETRY_SECONDS = 10
+
+
+class BlacklistSnapshot:
+    """Immutable view of both blacklists at one version."""
+
+    def __init__(self, version: int, pages: FrozenSet[str], keywords: Tuple[str, ...]):
+        self.version = version
+        self.pages = pages  # Lowercased page names
+        self.keywords = keywords  # Lowercased keywords
+        self.loaded_at = time.monotonic()
+
+    def is_page_blacklisted(self, page_name: Optional[str]) -> bool:
+        return bool(page_name) and page_name.lower() in self.pages
+
+
+def _load_from_db(db: Session) -> Tuple[FrozenSet[str], Tuple[str, ...]]:
+    """Read both blacklist tables."""
+    from app.models import PageBlacklist, KeywordBlacklist
+
+    pages = frozenset(name.lower() for (name,) in db.query(PageBlacklist.page_name).all())
+    keywords = tuple(sorted({kw.lower() for (kw,) in db.query(KeywordBlacklist.keyword).all()}))
+    return pages, keywords
+
+
+class BlacklistCache:
+    """Process-wide holder of the current blacklist snapshot."""
+
+    def __init__(self, loader: Callable[[Session], Tuple[FrozenSet[str], Tuple[str, ...]]] = _load_from_db, max_age_seconds: int = None):
+        self._loader = loader
+        self.max_age_seconds = settings.BLACKLIST_SNAPSHOT_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self._snapshot: Optional[BlacklistSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+        self._listen_thread: Optional[threading.Thread] = None
+        self._listen_stop = threading.Event()
+
+        self.loads = 0
+        self.invalidations = 0
+
+    def get(self, db: Session) -> BlacklistSnapshot:
+        """Current snapshot, loading it with db if missing or expired."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.max_age_seconds:
+            return snapshot
+
+        version = self._version
+        pages, keywords = self._loader(db)
+        snapshot = BlacklistSnapshot(version, pages, keywords)
+        with self._lock:
+            self.loads += 1
+            # Don't install a snapshot that was invalidated while loading
+            if self._version == version:
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """Drop the snapshot and notify listeners (local change or NOTIFY received)."""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+            self.invalidations += 1
+        for listener in list(self._listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"Blacklist listener error: {e}")
+
+    def publish_change(self, db: Session):
+        """
+        Announce a blacklist write to every worker.
+
+        Call after the write and before db.commit(): Postgres delivers the
+        NOTIFY when the transaction commits, and this worker's snapshot is
+        dropped at the same point.
+        """
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": BLACKLIST_CHANNEL, "payload": str(self._version + 1)})
+        event.listen(db, "after_commit", lambda session: self.invalidate(), once=True)
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Call callback whenever the blacklists change."""
+        self._listeners.append(callback)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": self._version,
+            "loaded": snapshot is not None,
+            "pages": len(snapshot.pages) if snapshot else None,
+            "keywords": len(snapshot.keywords) if snapshot else None,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at) if snapshot else None,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "listening": bool(self._listen_thread and self._listen_thread.is_alive()),
+        }
+
+    def start_listener(self):
+        """Start the LISTEN thread for cross-worker invalidation."""
+        if self._listen_thread and self._listen_thread.is_alive():
+            return
+        self._listen_stop.clear()
+        self._listen_thread = threading.Thread(target=self._listen, name="blacklist-listener", daemon=True)
+        self._listen_thread.start()
+
+    def stop_listener(self):
+        self._listen_stop.set()
+        if self._listen_thread:
+            self._listen_thread.join(timeout=LISTEN_POLL_SECONDS + 1)
+            self._listen_thread = None
+
+    def _listen(self):
+        import psycopg2
+
+        while not self._listen_stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(settings.DATABASE_URL)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {BLACKLIST_CHANNEL}")
+                print(f"Listening for blacklist changes on '{BLACKLIST_CHANNEL}'")
+
+                # Changes made while we were disconnected
+                self.invalidate()
+
+                while not self._listen_stop.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.invalidate()
+            except Exception as e:
+                print(f"Blacklist listener error: {e}, retrying in {LISTEN_RETRY_SECONDS}s")
+                self._listen_stop.wait(LISTEN_RETRY_SECONDS)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+# Singleton instance
+blacklists = BlacklistCache()
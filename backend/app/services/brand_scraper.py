@@ -4,17 +4,34 @@ Brand Scraper Service
 Scrapes all ads from a specific Facebook page and downloads media to R2.
 """
 
-import httpx
+import asyncio
+import math
 import os
 import re
 import json
 from typing import List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from app.models import BrandScrape, BrandScrapedAd
+from app.models import BrandScrape, BrandScrapedAd, MediaObject
 from app.core.config import settings
+from app.services.api_budget import BudgetExceeded, api_budget
+from app.services.graph_pager import GraphCursorPager, MAX_IDS_PER_REQUEST, MAX_PAGE_SIZE, fetch_ads_by_id
+from app.services.graph_shards import ShardedGraphFetcher, ShardCheckpoint, ShardFetchError, date_windows
+from app.services.graph_throttle import graph_throttle
+from app.services.http_clients import get_http_client, GRAPH, MEDIA
+from app.services.graphql_capture import media_key
+from app.services.media_pipeline import MediaLimits
+from app.services.media_spool import MediaSpool
+from app.services.media_store import MediaStore, media_kind
+from app.services.raw_archive import raw_archive, DOM_LIBRARY, GRAPH_BRAND, GRAPHQL_LIBRARY
+from app.services.storage import r2_storage
 import uuid
 
+# Graph fields for a full ad, and the minimal fields for an ID-first listing
+BRAND_AD_FIELDS = "id,ad_creative_bodies,ad_creative_link_titles,ad_creative_link_captions,ad_snapshot_url,page_id,page_name,publisher_platforms,ad_delivery_start_time"
+ID_FIRST_FIELDS = "id,page_name"
+
 
 def parse_page_id_from_url(url: str) -> Optional[str]:
     """Extract view_all_page_id from Facebook Ads Library URL."""
@@ -38,12 +55,45 @@ def parse_search_query_from_url(url: str) -> Optional[str]:
         return None
 
 
-def sanitize_folder_name(name: str) -> str:
-    """Sanitize brand name for use as R2 folder name."""
-    # Remove special chars, replace spaces with underscores
-    sanitized = re.sub(r'[^\w\s-]', '', name)
-    sanitized = re.sub(r'\s+', '_', sanitized)
-    return sanitized.lower()[:50]  # Limit length
+def parse_brand_ad(ad_data: dict) -> dict:
+    """Text fields of a Graph API-shaped ad (from the API or parse_library_record)."""
+    def first(key, max_length):
+        value = ad_data.get(key)
+        if value and isinstance(value, list):
+            value = value[0]
+        return value[:max_length] if value else None
+
+    platforms = None
+    if ad_data.get("publisher_platforms"):
+        platforms = [p.lower() for p in ad_data["publisher_platforms"]]
+
+    page_name = ad_data.get("page_name")
+    return {
+        "page_name": page_name[:200] if page_name else None,
+        "headline": first("ad_creative_link_titles", 500),
+        "ad_copy": first("ad_creative_bodies", 2000),
+        "cta_text": first("ad_creative_link_captions", 200),
+        "platforms": platforms,
+        "start_date": ad_data.get("ad_delivery_start_time"),
+    }
+
+
+def _is_video_url(url: str) -> bool:
+    url_lower = url.lower()
+    return any(ext in url_lower for ext in ['.mp4', '.webm', '.mov'])
+
+
+def _media_extension(item: dict) -> str:
+    """File extension for a media item, from its type, content type or URL."""
+    url_lower = item["url"].lower()
+    content_type = item.get("content_type", "")
+    if item["media_type"] == "video":
+        return '.mp4'
+    if 'png' in content_type or '.png' in url_lower:
+        return '.png'
+    if 'webp' in content_type or '.webp' in url_lower:
+        return '.webp'
+    return '.jpg'
 
 
 class BrandScraperService:
@@ -53,13 +103,16 @@ class BrandScraperService:
         self.db = db
         self.access_token = os.getenv("FACEBOOK_ADS_LIBRARY_TOKEN") or os.getenv("VITE_FACEBOOK_ACCESS_TOKEN")
         self.base_url = "https://graph.facebook.com/v21.0/ads_archive"
+        # Media bodies captured by the Playwright fallbacks, kept until uploaded
+        self.media_spool: Optional[MediaSpool] = None
 
-    async def scrape_brand(self, brand_scrape: BrandScrape) -> BrandScrape:
+    async def scrape_brand(self, brand_scrape: BrandScrape, only_new: bool = False) -> BrandScrape:
         """
         Scrape all ads from a brand's Facebook page and download media.
 
         Args:
             brand_scrape: BrandScrape record with page_id and brand_name set
+            only_new: Skip ads already stored by earlier scrapes of this page
 
         Returns:
             Updated BrandScrape record
@@ -69,7 +122,7 @@ class BrandScraperService:
             self.db.commit()
 
             # Fetch ads from Facebook - pass brand_name for better video capture
-            ads_data = await self._fetch_page_ads(brand_scrape.page_id, brand_name=brand_scrape.brand_name)
+            ads_data = await self._fetch_page_ads(brand_scrape.page_id, brand_name=brand_scrape.brand_name, only_new=only_new)
 
             if not ads_data:
                 brand_scrape.status = "completed"
@@ -84,20 +137,10 @@ class BrandScraperService:
             brand_scrape.total_ads = len(ads_data)
             self.db.commit()
 
-            # Process each ad - download media and create records
-            media_count = 0
-            folder_name = sanitize_folder_name(brand_scrape.brand_name)
+            # Process ads concurrently (snapshot -> download -> upload within
+            # the per-stage limits) and persist them as they finish
+            await self._process_ads(ads_data, brand_scrape)
 
-            for ad_data in ads_data:
-                try:
-                    ad_record = await self._process_ad(ad_data, brand_scrape.id, folder_name)
-                    if ad_record and ad_record.media_urls:
-                        media_count += len(ad_record.media_urls)
-                except Exception as e:
-                    print(f"Error processing ad {ad_data.get('id')}: {e}")
-                    continue
-
-            brand_scrape.media_downloaded = media_count
             brand_scrape.status = "completed"
             self.db.commit()
 
@@ -109,10 +152,110 @@ class BrandScraperService:
             self.db.commit()
             raise
 
-    async def _fetch_page_ads(self, page_id: str, limit: int = 500, brand_name: str = None) -> List[dict]:
-        """Fetch all ads from a specific Facebook page or search query."""
-        ads = []
+        finally:
+            if self.media_spool:
+                self.media_spool.close()
+                self.media_spool = None
 
+    def _spool(self, wanted=None) -> MediaSpool:
+        """Spool for media captured by a Playwright fallback (shared by the scrape's fallbacks)."""
+        if self.media_spool is None:
+            self.media_spool = MediaSpool()
+        self.media_spool.wanted = wanted
+        return self.media_spool
+
+    async def _process_ads(self, ads_data: List[dict], brand_scrape: BrandScrape) -> int:
+        """
+        Run every ad through the media pipeline, at most BRAND_ADS_IN_FLIGHT at once.
+
+        Records are saved as ads complete, and media_downloaded is committed
+        every BRAND_PROGRESS_COMMIT_ADS ads so progress is visible while the
+        scrape runs. Media references taken for ads that were not saved are
+        given back at the end. Returns the number of media files stored.
+        """
+        limits = MediaLimits()
+        media_store = MediaStore(self.db)
+        in_flight = asyncio.Semaphore(settings.BRAND_ADS_IN_FLIGHT)
+        if not r2_storage.enabled:
+            print("R2 not configured, skipping media uploads")
+
+        async def process(ad_data: dict) -> Optional[BrandScrapedAd]:
+            async with in_flight:
+                try:
+                    return await self._process_ad(ad_data, brand_scrape.id, limits, media_store)
+                except Exception as e:
+                    print(f"Error processing ad {ad_data.get('id')}: {e}")
+                    return None
+
+        tasks = [asyncio.create_task(process(ad_data)) for ad_data in ads_data]
+        saved_media = []  # Media URLs of committed records
+        uncommitted_ads = 0
+        uncommitted_media = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                ad_record = await next_done
+                if ad_record is None or not self._add_record(ad_record):
+                    continue
+                uncommitted_ads += 1
+                uncommitted_media += ad_record.media_urls or []
+                if uncommitted_ads >= settings.BRAND_PROGRESS_COMMIT_ADS:
+                    if self._commit_progress(brand_scrape, len(saved_media) + len(uncommitted_media)):
+                        saved_media += uncommitted_media
+                    uncommitted_ads = 0
+                    uncommitted_media = []
+
+            if self._commit_progress(brand_scrape, len(saved_media) + len(uncommitted_media)):
+                saved_media += uncommitted_media
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # References taken for ads that failed, were rolled back or were cancelled
+            await media_store.settle(saved_media)
+
+        print(f"Processed {len(ads_data)} ads: {limits.stats()}, media store: {media_store.stats()}")
+        return len(saved_media)
+
+    def _add_record(self, ad_record: BrandScrapedAd) -> bool:
+        """Save one ad in its own savepoint, so a bad record doesn't fail the others."""
+        try:
+            with self.db.begin_nested():
+                self.db.add(ad_record)
+        except SQLAlchemyError as e:
+            print(f"Error saving ad {ad_record.external_id}: {e}")
+            return False
+        return True
+
+    def _commit_progress(self, brand_scrape: BrandScrape, media_count: int) -> bool:
+        """Commit saved ads and the media count; on failure roll back and carry on."""
+        brand_scrape.media_downloaded = media_count
+        try:
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            print(f"Error committing brand scrape progress: {e}")
+            return False
+        return True
+
+    async def _fetch_page_ads(self, page_id: str, limit: int = 500, brand_name: str = None, only_new: bool = False) -> List[dict]:
+        """
+        Fetch all ads from a specific Facebook page or search query.
+
+        With only_new, ads already stored by an earlier scrape of the page are
+        dropped whichever path fetched them (the Playwright fallbacks return
+        every ad they see).
+        """
+        if not only_new:
+            return await self._fetch_ads(page_id, limit)
+        known_ids = self._known_external_ids(page_id)
+        ads = await self._fetch_ads(page_id, limit, known_ids)
+        new_ads = [ad for ad in ads if ad.get("id") not in known_ids]
+        if len(new_ads) < len(ads):
+            print(f"Skipping {len(ads) - len(new_ads)} ads already stored for {page_id}")
+        return new_ads
+
+    async def _fetch_ads(self, page_id: str, limit: int, known_ids: Optional[set] = None) -> List[dict]:
+        """Fetch ads by whichever path is available; known_ids selects the ID-first API path."""
         # Check if page_id is actually a search query (non-numeric)
         is_search_query = not page_id.isdigit()
 
@@ -126,62 +269,198 @@ class BrandScraperService:
             print("No FB token, using Playwright for page scrape")
             return await self._playwright_scrape_ads(page_id, limit, is_search=False)
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            after_cursor = None
+        # Claim the listing calls this scrape should need up front; requests
+        # beyond them are reserved one at a time
+        try:
+            reservation = await api_budget.reserve(max(1, math.ceil(limit / MAX_PAGE_SIZE)), owner="brand_scrape")
+        except BudgetExceeded as e:
+            print(f"{e}, using Playwright for page scrape")
+            return await self._playwright_scrape_ads(page_id, limit, is_search=False)
 
-            while len(ads) < limit:
-                params = {
-                    "access_token": self.access_token,
-                    "ad_active_status": "ALL",
-                    "ad_reached_countries": "US",
-                    "limit": min(300, limit - len(ads)),
-                    "fields": "id,ad_creative_bodies,ad_creative_link_titles,ad_creative_link_captions,ad_snapshot_url,page_id,page_name,publisher_platforms,ad_delivery_start_time",
-                    "search_page_ids": page_id
-                }
+        try:
+            if known_ids is not None:
+                return await self._fetch_new_page_ads(page_id, limit, reservation, known_ids)
+            return await self._fetch_api_page_ads(page_id, limit, reservation)
+        finally:
+            await api_budget.settle(reservation)
 
-                if after_cursor:
-                    params["after"] = after_cursor
+    async def _fetch_api_page_ads(self, page_id: str, limit: int, reservation) -> List[dict]:
+        """Fetch a page's ads from the Graph API (Playwright if the API fails)."""
+        if limit >= settings.GRAPH_SHARD_MIN_LIMIT:
+            return await self._fetch_page_ads_sharded(page_id, limit, reservation)
 
-                try:
-                    response = await client.get(self.base_url, params=params)
-                    response.raise_for_status()
-                    data = response.json()
+        ads = []
+        client = get_http_client(GRAPH)
+        after_cursor = None
+
+        while len(ads) < limit:
+            params = {
+                "access_token": self.access_token,
+                "ad_active_status": "ALL",
+                "ad_reached_countries": "US",
+                "limit": min(300, limit - len(ads)),
+                "fields": BRAND_AD_FIELDS,
+                "search_page_ids": page_id
+            }
+
+            if after_cursor:
+                params["after"] = after_cursor
+
+            try:
+                # Spaced and retried according to Facebook's usage headers, each
+                # attempt drawn from the scrape's reservation
+                response = await graph_throttle.get(
+                    client, self.base_url, params=params,
+                    spend=lambda: api_budget.spend(1, reservation, owner="brand_scrape")
+                )
+                response.raise_for_status()
+                data = response.json()
 
-                    if not data.get("data"):
-                        break
+                if not data.get("data"):
+                    break
 
-                    ads.extend(data["data"])
-                    print(f"Fetched {len(data['data'])} ads, total: {len(ads)}")
+                ads.extend(data["data"])
+                raw_archive.record(GRAPH_BRAND, data["data"], page_id=page_id)
+                print(f"Fetched {len(data['data'])} ads, total: {len(ads)}")
 
-                    paging = data.get("paging", {})
-                    if paging.get("next"):
-                        after_cursor = paging.get("cursors", {}).get("after")
-                    else:
-                        break
+                paging = data.get("paging", {})
+                if paging.get("next"):
+                    after_cursor = paging.get("cursors", {}).get("after")
+                else:
+                    break
 
-                except Exception as e:
-                    print(f"API error: {e}, falling back to Playwright")
-                    return await self._playwright_scrape_ads(page_id, limit, is_search=False)
+            except Exception as e:
+                print(f"API error: {e}, falling back to Playwright")
+                return await self._playwright_scrape_ads(page_id, limit, is_search=False)
 
         return ads
 
+    async def _fetch_page_ads_sharded(self, page_id: str, limit: int, reservation) -> List[dict]:
+        """Fetch a large page backfill as concurrent date-window shards."""
+        fetcher = ShardedGraphFetcher(
+            get_http_client(GRAPH),
+            self.base_url,
+            params={
+                "access_token": self.access_token,
+                "ad_active_status": "ALL",
+                "ad_reached_countries": "US",
+                "fields": BRAND_AD_FIELDS,
+                "search_page_ids": page_id
+            },
+            limit=limit,
+            checkpoints=[ShardCheckpoint(*window) for window in date_windows(settings.GRAPH_SHARD_LOOKBACK_DAYS, settings.GRAPH_SHARD_COUNT)],
+            concurrency=settings.GRAPH_SHARD_CONCURRENCY,
+            budget=api_budget,
+            reservation=reservation,
+            throttle=graph_throttle,
+        )
+
+        ads = []
+        try:
+            async for page in fetcher.pages():
+                ads.extend(page["data"])
+                raw_archive.record(GRAPH_BRAND, page["data"], page_id=page_id)
+                print(f"Fetched {len(page['data'])} ads, total: {len(ads)}")
+        except ShardFetchError as e:
+            if not ads:
+                print(f"API error: {e}, falling back to Playwright")
+                return await self._playwright_scrape_ads(page_id, limit, is_search=False)
+            print(f"API error: {e}, keeping {len(ads)} ads from the other shards")
+        except Exception as e:
+            print(f"API error: {e}, falling back to Playwright")
+            return await self._playwright_scrape_ads(page_id, limit, is_search=False)
+
+        print(f"Sharded fetch: {fetcher.api_calls} API calls, {fetcher.duplicates} duplicates across windows")
+        return ads[:limit]
+
+    async def _fetch_new_page_ads(self, page_id: str, limit: int, reservation, known_ids: set) -> List[dict]:
+        """
+        Fetch only the page's ads not stored by an earlier scrape (ID-first).
+
+        Lists ad IDs first (cheap pages of {id, page_name}), drops known_ids
+        (already in brand_scraped_ads for this page), and fetches full fields
+        for the rest with batched ?ids= requests, so known ads are neither
+        re-fetched nor re-downloaded. If the budget can't cover it, Playwright
+        is used instead of a full-field re-list that would cost more calls.
+        """
+        client = get_http_client(GRAPH)
+        params = {
+            "access_token": self.access_token,
+            "ad_active_status": "ALL",
+            "ad_reached_countries": "US",
+            "fields": ID_FIRST_FIELDS,
+            "search_page_ids": page_id
+        }
+        if limit >= settings.GRAPH_SHARD_MIN_LIMIT:
+            lister = ShardedGraphFetcher(
+                client,
+                self.base_url,
+                params,
+                limit=limit,
+                checkpoints=[ShardCheckpoint(*window) for window in date_windows(settings.GRAPH_SHARD_LOOKBACK_DAYS, settings.GRAPH_SHARD_COUNT)],
+                concurrency=settings.GRAPH_SHARD_CONCURRENCY,
+                budget=api_budget,
+                reservation=reservation,
+                throttle=graph_throttle,
+            )
+        else:
+            lister = GraphCursorPager(client, self.base_url, params, limit=limit, budget=api_budget, reservation=reservation, throttle=graph_throttle)
+
+        try:
+            ad_ids = []
+            async for page in lister.pages():
+                ad_ids.extend(ad["id"] for ad in page["data"] if ad.get("id"))
+            new_ids = [ad_id for ad_id in dict.fromkeys(ad_ids) if ad_id not in known_ids]
+            print(f"ID-first: {len(ad_ids)} ads listed, {len(ad_ids) - len(new_ids)} already stored, fetching {len(new_ids)}")
+
+            # The ID batches are known now, so they are claimed in one go too
+            hydration = None
+            if new_ids:
+                hydration = await api_budget.reserve(math.ceil(len(new_ids) / MAX_IDS_PER_REQUEST), owner="brand_scrape")
+            try:
+                fetched = await fetch_ads_by_id(client, new_ids, BRAND_AD_FIELDS, self.access_token, budget=api_budget, reservation=hydration, throttle=graph_throttle, owner="brand_scrape")
+            finally:
+                await api_budget.settle(hydration)
+            raw_archive.record(GRAPH_BRAND, list(fetched.values()), page_id=page_id)
+            return [fetched[ad_id] for ad_id in new_ids if ad_id in fetched]
+        except BudgetExceeded as e:
+            print(f"ID-first fetch: {e}, using Playwright")
+            return await self._playwright_scrape_ads(page_id, limit, is_search=False)
+        except Exception as e:
+            print(f"ID-first fetch failed: {e}, fetching all ads and skipping stored ones")
+            return await self._fetch_api_page_ads(page_id, limit, reservation)
+
+    def _known_external_ids(self, page_id: str) -> set:
+        """Ad IDs already stored by any scrape of this page."""
+        rows = self.db.query(BrandScrapedAd.external_id).join(BrandScrape).filter(
+            BrandScrape.page_id == page_id
+        ).distinct().all()
+        return {row[0] for row in rows}
+
     async def _playwright_scrape_ads(self, query: str, limit: int = 500, is_search: bool = True) -> List[dict]:
-        """Scrape ads using Playwright browser automation with response interception for media."""
-        from playwright.async_api import async_playwright
+        """
+        Scrape ads using Playwright browser automation with response interception for media.
+
+        Ads come from the page's own JSON responses (with their media URLs),
+        or from the DOM extractor when none are captured.
+        """
+        from app.services.browser_pool import browser_pool
+        from app.services.ad_extractor import install_extractor, collect_ads, parse_library_record, EXTRACTED_COUNT_JS
+        from app.services.graphql_capture import AdsLibraryCapture, parse_library_node
+        from app.services.playwright_helpers import scroll_until_settled
         import urllib.parse
 
         ads = []
-        captured_images = {}  # url -> bytes
+        capture = AdsLibraryCapture()
+        # Captured images, kept in memory or spilled to disk within the spool's cap
+        spool = self._spool(wanted=capture.media_keys())
         fb_email = os.getenv("FB_SCRAPER_EMAIL")
         fb_password = os.getenv("FB_SCRAPER_PASSWORD")
 
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                )
+            async with browser_pool.context(
+                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            ) as context:
                 page = await context.new_page()
 
                 # Capture images as they load
@@ -192,11 +471,12 @@ class BrandScraperService:
                         try:
                             body = await response.body()
                             if len(body) > 5000:  # Only substantial images
-                                captured_images[url] = body
+                                await spool.add(url, body, content_type)
                         except:
                             pass
 
                 page.on('response', capture_image_response)
+                capture.attach(page)
 
                 # Login to Facebook if credentials provided
                 if fb_email and fb_password:
@@ -234,140 +514,71 @@ class BrandScraperService:
                     await page.wait_for_selector('text=Library ID:', timeout=15000)
                 except:
                     print("No ads found or page didn't load properly")
-                    await browser.close()
                     return []
 
-                # Scroll to load more ads
-                scroll_count = min(20, limit // 10)
-                for i in range(scroll_count):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await page.wait_for_timeout(1500)
-                    print(f"Scroll {i+1}/{scroll_count}")
-
-                # Extract ad data from DOM
-                ads = await page.evaluate("""
-                    () => {
-                        const results = [];
-                        const seenIds = new Set();
-
-                        document.querySelectorAll('div').forEach(div => {
-                            const text = div.innerText || '';
-                            const idMatch = text.match(/Library ID:\\s*(\\d+)/);
-                            if (!idMatch) return;
-
-                            const libraryId = idMatch[1];
-                            if (seenIds.has(libraryId)) return;
-                            seenIds.add(libraryId);
-
-                            // Extract page name
-                            let pageName = null;
-                            const sponsoredIdx = text.indexOf('Sponsored');
-                            if (sponsoredIdx > 0) {
-                                const before = text.substring(0, sponsoredIdx).split('\\n').filter(l => l.trim());
-                                if (before.length) pageName = before[before.length - 1].trim();
-                            }
-
-                            // Extract headline and copy
-                            let headline = null, adCopy = null, ctaText = null;
-                            const lines = text.split('\\n').map(l => l.trim()).filter(l => l);
-                            const sponsoredLine = lines.findIndex(l => l === 'Sponsored');
-                            if (sponsoredLine >= 0) {
-                                for (let i = sponsoredLine + 1; i < lines.length; i++) {
-                                    if (lines[i].includes('Library ID')) break;
-                                    if (!headline && lines[i].length > 10) headline = lines[i];
-                                    else if (headline && lines[i].length > 10 && !adCopy) adCopy = lines[i];
-                                }
-                            }
-
-                            // Find CTA
-                            const ctaPatterns = ['Learn More', 'Shop Now', 'Sign Up', 'Get Offer', 'Book Now', 'Download', 'Apply Now', 'Subscribe'];
-                            for (const cta of ctaPatterns) {
-                                if (text.includes(cta)) { ctaText = cta; break; }
-                            }
-
-                            // Find page link
-                            let pageId = null;
-                            div.querySelectorAll('a[href*="view_all_page_id"]').forEach(link => {
-                                const match = link.href.match(/view_all_page_id=(\\d+)/);
-                                if (match) pageId = match[1];
-                            });
-
-                            // Get images - try multiple selectors
-                            const imageUrls = [];
-                            // Try scontent images first
-                            div.querySelectorAll('img[src*="scontent"], img[src*="fbcdn"]').forEach(img => {
-                                if (img.src && !img.src.includes('emoji') && img.width > 50 && !imageUrls.includes(img.src)) {
-                                    imageUrls.push(img.src);
-                                }
-                            });
-                            // Also check for data-src (lazy loaded)
-                            div.querySelectorAll('img[data-src*="scontent"], img[data-src*="fbcdn"]').forEach(img => {
-                                if (img.dataset.src && !imageUrls.includes(img.dataset.src)) {
-                                    imageUrls.push(img.dataset.src);
-                                }
-                            });
-                            // Check for background images in style
-                            div.querySelectorAll('[style*="background-image"]').forEach(el => {
-                                const match = el.style.backgroundImage.match(/url\\(["']?(https:[^"')]+)["']?\\)/);
-                                if (match && (match[1].includes('scontent') || match[1].includes('fbcdn')) && !imageUrls.includes(match[1])) {
-                                    imageUrls.push(match[1]);
-                                }
-                            });
-
-                            results.push({
-                                id: libraryId,
-                                page_name: pageName,
-                                page_id: pageId,
-                                ad_creative_link_titles: headline ? [headline] : null,
-                                ad_creative_bodies: adCopy ? [adCopy] : null,
-                                ad_creative_link_captions: ctaText ? [ctaText] : null,
-                                _image_urls: imageUrls
-                            });
-                        });
-
-                        return results;
-                    }
-                """)
-
-                print(f"Playwright extracted {len(ads)} ads, captured {len(captured_images)} images from network")
+                # Read ads from the page's JSON responses when it loaded any;
+                # otherwise extract each ad once as it renders
+                use_capture = len(capture) > 0
+                if use_capture:
+                    scroll_stats = await scroll_until_settled(page, limit, count=capture.count)
+                else:
+                    print("No Ads Library JSON captured, extracting ads from the DOM")
+                    await install_extractor(page)
+                    scroll_stats = await scroll_until_settled(page, limit, count_js=EXTRACTED_COUNT_JS)
+                print(f"Scrolled for {limit} ads: {scroll_stats}")
+
+                if use_capture:
+                    nodes = capture.records()
+                    raw_archive.record(GRAPHQL_LIBRARY, nodes, query=query)
+                    ads = [parse_library_node(node) for node in nodes]
+                else:
+                    records = await collect_ads(page)
+                    raw_archive.record(DOM_LIBRARY, records, query=query, full_copy=False)
+                    ads = [parse_library_record(record) for record in records]
+
+                print(f"Playwright extracted {len(ads)} ads from {'JSON responses' if use_capture else 'DOM'}, captured {len(spool)} images from network ({spool.stats()})")
 
                 # Log image URL stats
                 total_img_urls = sum(len(ad.get('_image_urls', [])) for ad in ads)
-                print(f"Total image URLs extracted from DOM: {total_img_urls}")
+                print(f"Total image URLs extracted: {total_img_urls}")
 
-                # Attach captured image data to ads
+                # Attach captured images to ads (matched by media_key: signed query strings differ between loads)
                 matched_count = 0
                 for ad in ads:
                     ad['_media_data'] = []
                     for img_url in ad.get('_image_urls', [])[:5]:
-                        if img_url in captured_images:
+                        spooled = spool.get(img_url)
+                        if spooled:
                             ad['_media_data'].append({
-                                'url': img_url,
+                                'url': spooled.url,
                                 'type': 'image',
                                 'content_type': 'image/jpeg',
-                                'data': captured_images[img_url]
+                                'spooled': spool.claim(spooled)
                             })
                             matched_count += 1
 
                 print(f"Matched {matched_count} images to ads")
 
-                # If few matches, distribute captured images to ads without media
-                if matched_count < len(ads) // 2 and captured_images:
+                # If few matches, distribute captured images to ads without media.
+                # Not needed with JSON captures: media without a captured copy
+                # is downloaded from the ad's own URLs instead.
+                if not use_capture and matched_count < len(ads) // 2 and len(spool):
                     print("Low match rate, distributing captured images to ads")
-                    remaining_images = list(captured_images.items())
+                    remaining_images = [spooled for spooled in spool.items() if not spooled.claimed]
                     img_idx = 0
                     for ad in ads:
                         if not ad['_media_data'] and img_idx < len(remaining_images):
-                            url, data = remaining_images[img_idx]
+                            spooled = remaining_images[img_idx]
                             ad['_media_data'].append({
-                                'url': url,
+                                'url': spooled.url,
                                 'type': 'image',
                                 'content_type': 'image/jpeg',
-                                'data': data
+                                'spooled': spool.claim(spooled)
                             })
                             img_idx += 1
 
-                await browser.close()
+                # Images no ad was matched to are not needed any more
+                spool.release_unclaimed()
 
         except Exception as e:
             error_msg = f"Playwright scrape failed: {str(e)}"
@@ -380,18 +591,21 @@ class BrandScraperService:
 
     async def _fallback_fetch_page_ads(self, page_id: str, limit: int = 500, brand_name: str = None, is_search: bool = False) -> List[dict]:
         """Fallback to Playwright for scraping when API unavailable. Captures both images and videos."""
-        from playwright.async_api import async_playwright
+        from app.services.browser_pool import browser_pool
+        from app.services.ad_extractor import install_extractor, collect_ads, parse_library_record, EXTRACTED_COUNT_JS
+        from app.services.graphql_capture import AdsLibraryCapture, parse_library_node, media_key
+        from app.services.playwright_helpers import scroll_until_settled
 
         ads = []
-        captured_media = []  # Store captured video/image data
+        captured_videos = []  # Video URLs, streamed to R2 when the ads are processed
+        capture = AdsLibraryCapture()
+        # Captured images, kept in memory or spilled to disk within the spool's cap
+        spool = self._spool(wanted=capture.media_keys())
 
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                )
+            async with browser_pool.context(
+                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            ) as context:
                 page = await context.new_page()
 
                 # Capture video responses as they stream
@@ -399,36 +613,28 @@ class BrandScraperService:
                     url = response.url
                     content_type = response.headers.get('content-type', '')
 
-                    # Capture videos
+                    # Capture video URLs; videos are streamed to R2 later rather than held in memory
                     if 'video' in content_type:
-                        try:
-                            body = await response.body()
-                            if len(body) > 10000:  # Only capture substantial videos
-                                captured_media.append({
-                                    'url': url,
-                                    'type': 'video',
-                                    'content_type': content_type,
-                                    'data': body
-                                })
-                                print(f"Captured video: {len(body)} bytes")
-                        except:
-                            pass
+                        length = int(response.headers.get('content-length') or 0)
+                        if not length or length > 10000:  # Only capture substantial videos
+                            captured_videos.append({
+                                'url': url,
+                                'type': 'video',
+                                'content_type': content_type,
+                            })
+                            print(f"Captured video: {url[:80]}")
 
                     # Capture images from scontent
                     elif 'image' in content_type and ('scontent' in url or 'fbcdn' in url):
                         try:
                             body = await response.body()
                             if len(body) > 5000:  # Only substantial images
-                                captured_media.append({
-                                    'url': url,
-                                    'type': 'image',
-                                    'content_type': content_type,
-                                    'data': body
-                                })
+                                await spool.add(url, body, content_type)
                         except:
                             pass
 
                 page.on('response', capture_media_response)
+                capture.attach(page)
 
                 # Determine URL based on search type
                 import urllib.parse
@@ -453,96 +659,52 @@ class BrandScraperService:
                     await page.wait_for_selector('text=Library ID:', timeout=15000)
                 except:
                     print("No ads found")
-                    await browser.close()
                     return []
 
+                # Read ads from the page's JSON responses when it loaded any;
+                # otherwise extract each ad once as it renders
+                use_capture = len(capture) > 0
+                if not use_capture:
+                    print("No Ads Library JSON captured, extracting ads from the DOM")
+                    await install_extractor(page)
+
                 await page.wait_for_timeout(5000)  # Wait for video autoplay
 
                 # Scroll to load more ads and trigger video loading
-                for i in range(min(15, limit // 10)):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await page.wait_for_timeout(2000)  # More time for videos to load
-
-                print(f"Captured {len(captured_media)} media items during scroll")
-
-                # Extract ad metadata from DOM
-                ads_data = await page.evaluate("""
-                    () => {
-                        const results = [];
-                        const seenIds = new Set();
-
-                        document.querySelectorAll('div').forEach(div => {
-                            const text = div.innerText || '';
-                            const idMatch = text.match(/Library ID:\\s*(\\d+)/);
-                            if (!idMatch) return;
-
-                            const libraryId = idMatch[1];
-                            if (seenIds.has(libraryId)) return;
-                            seenIds.add(libraryId);
-
-                            // Extract brand name
-                            let brandName = 'Unknown';
-                            const sponsoredIdx = text.indexOf('Sponsored');
-                            if (sponsoredIdx > 0) {
-                                const before = text.substring(0, sponsoredIdx).split('\\n').filter(l => l.trim());
-                                if (before.length) brandName = before[before.length - 1].trim();
-                            }
-
-                            // Extract headline, copy, and CTA
-                            let headline = null, adCopy = null, ctaText = null;
-                            const lines = text.split('\\n').map(l => l.trim()).filter(l => l);
-                            const sponsoredLine = lines.findIndex(l => l === 'Sponsored');
-                            if (sponsoredLine >= 0) {
-                                for (let i = sponsoredLine + 1; i < lines.length; i++) {
-                                    if (lines[i].includes('Library ID') || lines[i].includes('http')) break;
-                                    if (!headline && lines[i].length > 10) headline = lines[i];
-                                    else if (headline && lines[i].length > 10) adCopy = (adCopy || '') + lines[i] + ' ';
-                                }
-                            }
-
-                            // Look for common CTA button texts
-                            const ctaPatterns = ['Learn More', 'Shop Now', 'Sign Up', 'Get Offer', 'Book Now', 'Contact Us', 'Download', 'Apply Now', 'Get Quote', 'Subscribe'];
-                            for (const cta of ctaPatterns) {
-                                if (text.includes(cta)) {
-                                    ctaText = cta;
-                                    break;
-                                }
-                            }
-
-                            // Try to find page link (view_all_page_id link)
-                            let pageId = null;
-                            div.querySelectorAll('a[href*="view_all_page_id"]').forEach(link => {
-                                const match = link.href.match(/view_all_page_id=(\\d+)/);
-                                if (match) pageId = match[1];
-                            });
-
-                            // Get image URLs visible in this ad container
-                            const imageUrls = [];
-                            div.querySelectorAll('img[src*="scontent"]').forEach(img => {
-                                if (img.src && !img.src.includes('emoji') && img.width > 50) {
-                                    imageUrls.push(img.src);
-                                }
-                            });
-
-                            // Check if this ad has a video
-                            const hasVideo = div.querySelector('video') !== null ||
-                                           text.match(/\\d+:\\d+/) !== null;  // Duration like "0:30"
-
-                            results.push({
-                                id: libraryId,
-                                page_name: brandName,
-                                page_id: pageId,
-                                ad_creative_link_titles: headline ? [headline] : null,
-                                ad_creative_bodies: adCopy ? [adCopy.trim()] : null,
-                                ad_creative_link_captions: ctaText ? [ctaText] : null,
-                                _image_urls: imageUrls,
-                                _has_video: hasVideo
-                            });
-                        });
-
-                        return results;
-                    }
-                """)
+                if use_capture:
+                    scroll_stats = await scroll_until_settled(page, limit, step_timeout_ms=3000, count=capture.count)
+                else:
+                    scroll_stats = await scroll_until_settled(page, limit, step_timeout_ms=3000, count_js=EXTRACTED_COUNT_JS)
+                print(f"Scrolled for {limit} ads: {scroll_stats}")
+
+                print(f"Captured {len(captured_videos)} videos and {len(spool)} images during scroll ({spool.stats()})")
+
+                def spooled_image(spooled) -> dict:
+                    return {'url': spooled.url, 'type': 'image', 'content_type': spooled.content_type, 'spooled': spool.claim(spooled)}
+
+                if use_capture:
+                    nodes = capture.records()
+                    raw_archive.record(GRAPHQL_LIBRARY, nodes, query=page_id)
+                    ads_data = [parse_library_node(node) for node in nodes]
+
+                    # Each ad lists its own media URLs, so captured media is matched by URL
+                    videos_by_key = {media_key(video['url']): video for video in captured_videos}
+                    for ad in ads_data[:limit]:
+                        ad['_media_data'] = []
+                        for url in ad['_media_urls'][:4]:
+                            spooled = spool.get(url)
+                            if spooled:
+                                ad['_media_data'].append(spooled_image(spooled))
+                            elif media_key(url) in videos_by_key:
+                                ad['_media_data'].append(videos_by_key[media_key(url)])
+                    spool.release_unclaimed()
+                    ads = ads_data[:limit]
+                    print(f"Extracted {len(ads)} ads with media data")
+                    return ads
+
+                records = await collect_ads(page)
+                raw_archive.record(DOM_LIBRARY, records, query=page_id, full_copy=True)
+                ads_data = [parse_library_record(record, full_copy=True) for record in records]
 
                 # Associate captured media with ads
                 video_index = 0
@@ -551,21 +713,17 @@ class BrandScraperService:
 
                     # Add images for this ad
                     for img_url in ad.get('_image_urls', [])[:3]:
-                        # Find matching captured image
-                        for media in captured_media:
-                            if media['type'] == 'image' and media['url'] == img_url:
-                                ad['_media_data'].append(media)
-                                break
+                        spooled = spool.get(img_url)
+                        if spooled:
+                            ad['_media_data'].append(spooled_image(spooled))
 
                     # If ad has video, assign next captured video
-                    if ad.get('_has_video') and video_index < len([m for m in captured_media if m['type'] == 'video']):
-                        videos = [m for m in captured_media if m['type'] == 'video']
-                        if video_index < len(videos):
-                            ad['_media_data'].append(videos[video_index])
-                            video_index += 1
+                    if ad.get('_has_video') and video_index < len(captured_videos):
+                        ad['_media_data'].append(captured_videos[video_index])
+                        video_index += 1
 
+                spool.release_unclaimed()
                 ads = ads_data[:limit]
-                await browser.close()
 
                 print(f"Extracted {len(ads)} ads with media data")
 
@@ -576,253 +734,198 @@ class BrandScraperService:
 
         return ads
 
-    async def _process_ad(self, ad_data: dict, brand_scrape_id: str, folder_name: str) -> Optional[BrandScrapedAd]:
-        """Process a single ad: extract media URLs and download to R2."""
+    async def _process_ad(
+        self, ad_data: dict, brand_scrape_id: str, limits: MediaLimits = None, media_store: MediaStore = None
+    ) -> Optional[BrandScrapedAd]:
+        """
+        Process a single ad: resolve its media, download it and upload it to R2.
+
+        Returns the (not yet saved) record; scrape_brand persists it. The
+        ad's media items are downloaded and uploaded concurrently, within the
+        scrape's shared per-stage limits. Media already in the content store
+        (same source URL or same bytes) is reused instead of uploaded again.
+        """
         ad_id = ad_data.get("id")
         if not ad_id:
             return None
+        limits = limits or MediaLimits()
+        media_store = media_store or MediaStore(self.db)
 
         # Parse ad fields
-        headline = None
-        if ad_data.get("ad_creative_link_titles"):
-            titles = ad_data["ad_creative_link_titles"]
-            headline = titles[0] if isinstance(titles, list) else titles
-
-        ad_copy = None
-        if ad_data.get("ad_creative_bodies"):
-            bodies = ad_data["ad_creative_bodies"]
-            ad_copy = bodies[0] if isinstance(bodies, list) else bodies
-
-        cta_text = None
-        if ad_data.get("ad_creative_link_captions"):
-            captions = ad_data["ad_creative_link_captions"]
-            cta_text = captions[0] if isinstance(captions, list) else captions
-
-        platforms = None
-        if ad_data.get("publisher_platforms"):
-            platforms = [p.lower() for p in ad_data["publisher_platforms"]]
+        fields = parse_brand_ad(ad_data)
 
-        start_date = ad_data.get("ad_delivery_start_time")
-
-        r2_urls = []
-        original_media_urls = []
-        media_type = "image"
-
-        # Check if we have pre-captured media data (from Playwright with response interception)
+        # Pre-captured media (from Playwright with response interception) is
+        # uploaded directly, or streamed from its URL for videos; otherwise
+        # media is downloaded from its URLs
         media_data_list = ad_data.get("_media_data", [])
-
-        if media_data_list:
-            # Upload pre-captured media directly to R2
-            for i, media_item in enumerate(media_data_list[:10]):
-                try:
-                    original_media_urls.append(media_item.get('url', ''))
-
-                    # Determine extension from content type
-                    content_type = media_item.get('content_type', '')
-                    if 'video' in content_type:
-                        ext = '.mp4'
-                        detected_type = 'video'
-                    elif 'png' in content_type:
-                        ext = '.png'
-                        detected_type = 'image'
-                    elif 'webp' in content_type:
-                        ext = '.webp'
-                        detected_type = 'image'
-                    else:
-                        ext = '.jpg'
-                        detected_type = 'image'
-
-                    # Upload to R2
-                    filename = f"{folder_name}/{ad_id}_{i}{ext}"
-                    r2_url = await self._upload_to_r2(media_item['data'], filename, detected_type)
-
-                    if r2_url:
-                        r2_urls.append(r2_url)
-                        if detected_type == "video":
-                            media_type = "video"
-                        print(f"Uploaded {detected_type} for ad {ad_id}: {len(media_item['data'])} bytes")
-
-                except Exception as e:
-                    print(f"Failed to upload media for ad {ad_id}: {e}")
-
+        captured = [
+            {"url": item.get("url", ""), "media_type": "video" if "video" in item.get("content_type", "") else "image", "content_type": item.get("content_type", ""), **({"spooled": item["spooled"]} if "spooled" in item else {})}
+            for item in media_data_list
+        ]
+        video_urls = set(ad_data.get("_video_urls") or [])
+        if captured and ad_data.get("_media_urls"):
+            # The ad lists its exact media (JSON capture): captured items stand in
+            # for the URLs they match, and the rest are downloaded from the ad's URLs
+            captured_by_key = {media_key(item["url"]): item for item in captured}
+            items = [
+                captured_by_key.pop(media_key(url), None) or {"url": url, "media_type": "video" if url in video_urls or _is_video_url(url) else "image"}
+                for url in ad_data["_media_urls"]
+            ]
+            items += captured_by_key.values()
+        elif captured:
+            items = captured
         else:
-            # Fallback: try to download from URLs (for API-sourced ads)
             url_list = ad_data.get("_media_urls", []) or ad_data.get("_image_urls", [])
-
             if not url_list and ad_data.get("ad_snapshot_url"):
-                url_list = await self._extract_media_from_snapshot(ad_data["ad_snapshot_url"])
-
-            original_media_urls = url_list[:10]
-
-            for i, media_url in enumerate(original_media_urls):
-                try:
-                    r2_url, detected_type = await self._download_and_upload_media(
-                        media_url, folder_name, ad_id, i
-                    )
-                    if r2_url:
-                        r2_urls.append(r2_url)
-                        if detected_type == "video":
-                            media_type = "video"
-                except Exception as e:
-                    print(f"Failed to download media {media_url}: {e}")
-
-        # Detect carousel
-        if len(r2_urls) > 1 and media_type == "image":
+                async with limits.snapshots:
+                    url_list = await self._extract_media_from_snapshot(ad_data["ad_snapshot_url"])
+                    limits.snapshots_fetched += 1
+            items = [{"url": url, "media_type": "video" if url in video_urls or _is_video_url(url) else "image"} for url in url_list]
+        # Spooled items past the per-ad cap are not uploaded, so their claims end here
+        for item in items[10:]:
+            if item.get("spooled") is not None and self.media_spool:
+                self.media_spool.done(item["spooled"])
+        items = items[:10]
+
+        async def store(item: dict) -> Tuple[Optional[str], str]:
+            spooled = item.get("spooled")
+            try:
+                if not r2_storage.enabled:
+                    return None, item["media_type"]
+                # Concurrent ads with the same creative wait for the first one's upload
+                async with media_store.lock(media_key(item["url"])):
+                    media = await media_store.find_source(item["url"]) if item["url"] else None
+                    if media is None:
+                        media = await self._store_media(item, media_store, limits)
+                if media is None:
+                    return None, item["media_type"]
+                return media_store.url(media), media_kind(media)
+            except Exception as e:
+                limits.failed += 1
+                print(f"Failed to store media {item.get('url')} for ad {ad_id}: {e}")
+                return None, "image"
+            finally:
+                if spooled is not None and self.media_spool:
+                    self.media_spool.done(spooled)
+
+        results = await asyncio.gather(*(store(item) for item in items))
+
+        r2_urls = [r2_url for r2_url, _ in results if r2_url]
+        media_type = "image"
+        if any(r2_url and detected_type == "video" for r2_url, detected_type in results):
+            media_type = "video"
+        elif len(r2_urls) > 1:
+            # Detect carousel
             media_type = "carousel"
+        original_media_urls = [item["url"] for item in items]
 
         # Extract page info
-        page_name = ad_data.get("page_name")
         page_id_from_ad = ad_data.get("page_id")
         page_link = None
         if page_id_from_ad:
             page_link = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=US&view_all_page_id={page_id_from_ad}"
 
-        # Create record
-        ad_record = BrandScrapedAd(
+        return BrandScrapedAd(
             brand_scrape_id=brand_scrape_id,
             external_id=ad_id,
-            page_name=page_name[:200] if page_name else None,
             page_link=page_link,
-            headline=headline[:500] if headline else None,
-            ad_copy=ad_copy[:2000] if ad_copy else None,
-            cta_text=cta_text[:200] if cta_text else None,
             media_type=media_type,
             media_urls=r2_urls if r2_urls else None,
             original_media_urls=original_media_urls[:10] if original_media_urls else None,
-            platforms=platforms,
-            start_date=start_date,
+            **fields,
             ad_link=f"https://www.facebook.com/ads/library/?id={ad_id}"
         )
 
-        self.db.add(ad_record)
-        self.db.commit()
-
-        return ad_record
-
     async def _extract_media_from_snapshot(self, snapshot_url: str) -> List[str]:
         """Extract media URLs from ad snapshot page."""
         media_urls = []
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(snapshot_url, follow_redirects=True)
-                html = response.text
+            client = get_http_client(MEDIA)
+            response = await client.get(snapshot_url, timeout=30.0)
+            html = response.text
 
-                # Look for image URLs
-                img_pattern = r'https://[^"\']+\.(?:jpg|jpeg|png|webp)[^"\']*'
-                images = re.findall(img_pattern, html, re.IGNORECASE)
-                media_urls.extend([url for url in images if 'scontent' in url][:5])
+            # Look for image URLs
+            img_pattern = r'https://[^"\']+\.(?:jpg|jpeg|png|webp)[^"\']*'
+            images = re.findall(img_pattern, html, re.IGNORECASE)
+            media_urls.extend([url for url in images if 'scontent' in url][:5])
 
-                # Look for video URLs
-                video_pattern = r'https://[^"\']+\.(?:mp4|webm)[^"\']*'
-                videos = re.findall(video_pattern, html, re.IGNORECASE)
-                media_urls.extend(videos[:3])
+            # Look for video URLs
+            video_pattern = r'https://[^"\']+\.(?:mp4|webm)[^"\']*'
+            videos = re.findall(video_pattern, html, re.IGNORECASE)
+            media_urls.extend(videos[:3])
 
         except Exception as e:
             print(f"Error extracting media from snapshot: {e}")
 
         return media_urls
 
-    async def _download_and_upload_media(
-        self, media_url: str, folder_name: str, ad_id: str, index: int
-    ) -> Tuple[Optional[str], str]:
-        """Download media from URL and upload to R2."""
-        try:
-            # Determine file extension
-            url_lower = media_url.lower()
-            if any(ext in url_lower for ext in ['.mp4', '.webm', '.mov']):
-                ext = '.mp4'
-                media_type = "video"
-            elif '.png' in url_lower:
-                ext = '.png'
-                media_type = "image"
-            elif '.webp' in url_lower:
-                ext = '.webp'
-                media_type = "image"
-            else:
-                ext = '.jpg'
-                media_type = "image"
-
-            # Download media
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(media_url, follow_redirects=True)
-                response.raise_for_status()
-                content = response.content
-
-            if len(content) < 1000:  # Too small, likely error
-                return None, media_type
+    async def _download_media(self, media_url: str, limits: MediaLimits) -> Optional[dict]:
+        """Download media from URL; returns a media item, or None if it was too small to be real."""
+        media_type = "video" if _is_video_url(media_url) else "image"
 
-            # Upload to R2
-            filename = f"{folder_name}/{ad_id}_{index}{ext}"
-            r2_url = await self._upload_to_r2(content, filename, media_type)
+        async with limits.download_slot(media_url):
+            client = get_http_client(MEDIA)
+            response = await client.get(media_url)
+            response.raise_for_status()
+            content = response.content
 
-            return r2_url, media_type
-
-        except Exception as e:
-            print(f"Download/upload error: {e}")
-            return None, "image"
-
-    async def _upload_to_r2(self, content: bytes, filename: str, media_type: str) -> Optional[str]:
-        """Upload content to R2 and return public URL."""
-        if not settings.r2_enabled:
-            print("R2 not configured, skipping upload")
+        if len(content) < 1000:  # Too small, likely error
             return None
+        limits.downloaded += 1
+        limits.downloaded_bytes += len(content)
+        return {"url": media_url, "data": content, "media_type": media_type, "content_type": response.headers.get("content-type", "")}
+
+    async def _store_media(self, item: dict, media_store: MediaStore, limits: MediaLimits) -> Optional[MediaObject]:
+        """Store one media item: from the spool, streamed from the CDN (videos), or downloaded."""
+        ext = _media_extension(item)
+        spooled = item.get("spooled")
+        if spooled is not None:
+            # Captured by Playwright; spilled items are streamed from their temp file
+            async with limits.uploads:
+                if spooled.in_memory:
+                    media = await media_store.put_bytes(spooled.data, ext, item["url"])
+                else:
+                    media = await media_store.put_stream(spooled.chunks(), ext, item["url"])
+        elif item["media_type"] == "video":
+            # Streamed from the CDN straight into a multipart upload
+            async with limits.download_slot(item["url"]), limits.uploads:
+                client = get_http_client(MEDIA)
+                async with client.stream("GET", item["url"]) as response:
+                    response.raise_for_status()
+                    length = int(response.headers.get("content-length") or 0)
+                    if 0 < length < 1000:  # Too small, likely error
+                        return None
+                    media = await media_store.put_stream(response.aiter_bytes(), ext, item["url"])
+            limits.downloaded += 1
+            limits.downloaded_bytes += media.size
+        else:
+            downloaded = await self._download_media(item["url"], limits)
+            if downloaded is None:
+                return None
+            async with limits.uploads:
+                media = await media_store.put_bytes(downloaded["data"], _media_extension(downloaded), item["url"])
 
-        try:
-            import boto3
-
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=settings.r2_endpoint_url,
-                aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-                region_name='auto'
-            )
-
-            content_type = 'video/mp4' if media_type == 'video' else 'image/jpeg'
-
-            s3_client.put_object(
-                Bucket=settings.R2_BUCKET_NAME,
-                Key=filename,
-                Body=content,
-                ContentType=content_type
-            )
-
-            return f"{settings.R2_PUBLIC_URL}/{filename}"
-
-        except Exception as e:
-            print(f"R2 upload error: {e}")
-            return None
+        limits.uploaded += 1
+        print(f"Stored {media_kind(media)} {media.r2_key}: {media.size} bytes")
+        return media
 
     async def delete_brand_scrape(self, brand_scrape: BrandScrape) -> bool:
         """Delete a brand scrape and its media from R2."""
         try:
-            # Delete media from R2
-            if settings.r2_enabled and brand_scrape.ads:
-                import boto3
-
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=settings.r2_endpoint_url,
-                    aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-                    region_name='auto'
-                )
-
-                for ad in brand_scrape.ads:
-                    if ad.media_urls:
-                        for url in ad.media_urls:
-                            try:
-                                # Extract key from URL
-                                key = url.replace(f"{settings.R2_PUBLIC_URL}/", "")
-                                s3_client.delete_object(Bucket=settings.R2_BUCKET_NAME, Key=key)
-                            except Exception as e:
-                                print(f"Error deleting {url}: {e}")
+            # Media shared with other scrapes' ads is kept; only objects nothing refers to any more are deleted
+            urls = [url for ad in brand_scrape.ads for url in ad.media_urls or []]
+            keys = MediaStore(self.db).release(urls)
 
             # Delete from DB (cascade will delete ads)
             self.db.delete(brand_scrape)
             self.db.commit()
 
+            # Delete media from R2
+            if r2_storage.enabled and keys:
+                for key in await r2_storage.delete(keys):
+                    print(f"Error deleting {key}")
+
             return True
 
         except Exception as e:
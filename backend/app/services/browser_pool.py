@@ -0,0 +1,316 @@
+"""
+Chromium Browser Pool
+
+Keeps a few long-lived headless Chromium processes for the Playwright
+fallbacks (Ads Library search and brand scrapes) so each job pays for a new
+browser context instead of a full browser launch.
+
+Every job gets a fresh, isolated context (own cookies, storage and cache) on
+one of the pooled browsers, so jobs cannot leak login or session state into
+each other. A browser is relaunched after serving BROWSER_MAX_PAGES jobs or
+once its process tree grows past BROWSER_MAX_RSS_MB.
+
+The pool is started in the FastAPI lifespan (see app.main) and lazily on first
+use everywhere else, e.g. in run_scheduled_searches.py. Playwright is optional:
+if it is not installed, start() logs and borrowing a context raises.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional, Set
+
+from app.core.config import settings
+from app.services.playwright_helpers import ResourceBlocker
+
+DEFAULT_VIEWPORT = {'width': 1920, 'height': 1080}
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+
+
+def _children(pid: int) -> Set[int]:
+    """Direct children of pid, from /proc/<pid>/task/*/children (Linux only)."""
+    children = set()
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return children
+    for task in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.update(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return children
+
+
+def _descendants(root: int, children: Callable[[int], Set[int]] = _children) -> Set[int]:
+    """All pids below root in the process tree."""
+    found = set()
+    frontier = [root]
+    while frontier:
+        pid = frontier.pop()
+        new = children(pid) - found
+        found.update(new)
+        frontier.extend(new)
+    return found
+
+
+async def _browser_pid(browser) -> Optional[int]:
+    """Pid of the Chromium browser process, as reported by Chromium itself."""
+    try:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send('SystemInfo.getProcessInfo')
+        finally:
+            await session.detach()
+    except Exception as e:
+        print(f"Could not read browser pid, RSS recycling disabled for it: {e}")
+        return None
+    for process in info.get('processInfo', []):
+        if process.get('type') == 'browser':
+            return int(process['id'])
+    return None
+
+
+def _rss_mb(pids: Set[int]) -> Optional[float]:
+    """Summed resident set size of pids in MB, or None if /proc is unavailable."""
+    total_kb = 0
+    seen_any = False
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        seen_any = True
+                        break
+        except (OSError, ValueError):
+            continue
+    return round(total_kb / 1024, 1) if seen_any else None
+
+
+class _PooledBrowser:
+    """One Chromium process and its recycling counters."""
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.browser = None
+        self.root_pid: Optional[int] = None
+        self.launched_at: Optional[float] = None
+        self.pages_served = 0
+        self.busy = False
+
+    def rss_mb(self) -> Optional[float]:
+        if not self.root_pid:
+            return None
+        pids = _descendants(self.root_pid) | {self.root_pid}
+        return _rss_mb(pids)
+
+
+class BrowserPool:
+    """Pool of warm Chromium browsers handing out one fresh context per job."""
+
+    def __init__(self, size: int = None, max_pages: int = None, max_rss_mb: int = None):
+        self.size = max(1, size or settings.BROWSER_POOL_SIZE)
+        self.max_pages = max_pages or settings.BROWSER_MAX_PAGES
+        self.max_rss_mb = max_rss_mb or settings.BROWSER_MAX_RSS_MB
+
+        self._playwright = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+        # Utilisation counters
+        self.jobs_served = 0
+        self.launches = 0
+        self.recycles = 0
+        self.waiting = 0
+        self.total_wait_ms = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """Start Playwright and launch the browsers (safe to call repeatedly)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Playwright's connection is bound to the loop that started it
+            self._reset(loop)
+
+        async with self._start_lock:
+            if self._playwright is not None:
+                return
+
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browsers = [_PooledBrowser(slot) for slot in range(self.size)]
+            for pooled in self._browsers:
+                try:
+                    await self._launch(pooled)
+                except Exception as e:
+                    # Slot stays in the pool and is relaunched on checkout
+                    print(f"Browser launch failed: {e}")
+                self._idle.put_nowait(pooled)
+            print(f"Browser pool started with {self.size} Chromium browser(s)")
+
+    async def start_in_background(self):
+        """Warm the pool without failing app startup if Chromium is unavailable."""
+        try:
+            await self.start()
+        except ImportError:
+            print("Playwright not installed, browser pool disabled")
+        except Exception as e:
+            print(f"Browser pool failed to start: {e}")
+
+    @asynccontextmanager
+    async def context(self, block_resources: bool = False, **context_options) -> AsyncIterator:
+        """
+        Borrow a fresh browser context on a pooled browser.
+
+        The context is closed when the block exits; the browser stays warm.
+        Options are passed to browser.new_context() (viewport and user agent
+        default to a desktop Chrome profile).
+
+        Args:
+            block_resources: Abort image, media, font and analytics requests
+                (for scrapes that only read ad text)
+        """
+        if not self.started or self._loop is not asyncio.get_running_loop():
+            await self.start()
+
+        options = {'viewport': DEFAULT_VIEWPORT, 'user_agent': DEFAULT_USER_AGENT}
+        options.update(context_options)
+
+        self.waiting += 1
+        wait_start = time.monotonic()
+        try:
+            pooled = await self._idle.get()
+        finally:
+            self.waiting -= 1
+            self.total_wait_ms += (time.monotonic() - wait_start) * 1000
+
+        pooled.busy = True
+        context = None
+        blocker = None
+        try:
+            if pooled.browser is None or not pooled.browser.is_connected():
+                await self._launch(pooled)
+            context = await pooled.browser.new_context(**options)
+            if block_resources:
+                blocker = ResourceBlocker()
+                await blocker.install(context)
+            yield context
+        finally:
+            if blocker is not None:
+                print(f"Blocked {blocker.blocked} of {blocker.blocked + blocker.allowed} requests (text-only scrape)")
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"Error closing browser context: {e}")
+            pooled.pages_served += 1
+            self.jobs_served += 1
+            try:
+                await self._maybe_recycle(pooled)
+            finally:
+                pooled.busy = False
+                self._idle.put_nowait(pooled)
+
+    async def close(self):
+        """Close every browser and stop Playwright (called on shutdown)."""
+        if self._playwright is None:
+            return
+        for pooled in self._browsers:
+            await self._close_browser(pooled)
+        try:
+            await self._playwright.stop()
+        except Exception as e:
+            print(f"Error stopping Playwright: {e}")
+        self._playwright = None
+        self._browsers = []
+        self._loop = None
+
+    def stats(self) -> dict:
+        """Pool utilisation for the runtime stats endpoint."""
+        busy = sum(1 for pooled in self._browsers if pooled.busy)
+        return {
+            "started": self.started,
+            "size": self.size,
+            "busy": busy,
+            "idle": len(self._browsers) - busy,
+            "waiting": self.waiting,
+            "utilisation": round(busy / self.size, 2),
+            "jobs_served": self.jobs_served,
+            "avg_wait_ms": round(self.total_wait_ms / self.jobs_served, 1) if self.jobs_served else 0.0,
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "max_pages": self.max_pages,
+            "max_rss_mb": self.max_rss_mb,
+            "browsers": [
+                {
+                    "slot": pooled.slot,
+                    "busy": pooled.busy,
+                    "pages_served": pooled.pages_served,
+                    "rss_mb": pooled.rss_mb(),
+                    "uptime_s": round(time.monotonic() - pooled.launched_at) if pooled.launched_at else None,
+                }
+                for pooled in self._browsers
+            ],
+        }
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        """Forget state from a previous event loop."""
+        self._loop = loop
+        self._playwright = None
+        self._browsers = []
+        self._idle = asyncio.Queue()
+        self._start_lock = asyncio.Lock()
+
+    async def _launch(self, pooled: _PooledBrowser):
+        """(Re)launch the Chromium process for a slot."""
+        pooled.browser = await self._playwright.chromium.launch(headless=True)
+        pooled.root_pid = await _browser_pid(pooled.browser)
+
+        pooled.launched_at = time.monotonic()
+        pooled.pages_served = 0
+        self.launches += 1
+
+    async def _maybe_recycle(self, pooled: _PooledBrowser):
+        """Relaunch a browser that served too many jobs or grew too large."""
+        reason = None
+        if pooled.pages_served >= self.max_pages:
+            reason = f"{pooled.pages_served} jobs served"
+        else:
+            rss = pooled.rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f"RSS {rss} MB"
+
+        if not reason:
+            return
+
+        print(f"Recycling browser {pooled.slot} ({reason})")
+        await self._close_browser(pooled)
+        self.recycles += 1
+        try:
+            await self._launch(pooled)
+        except Exception as e:
+            # Relaunched on next checkout instead
+            print(f"Browser relaunch failed: {e}")
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        if pooled.browser is None:
+            return
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+        pooled.browser = None
+        pooled.root_pid = None
+
+
+# Singleton instance
+browser_pool = BrowserPool()
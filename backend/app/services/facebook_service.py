@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 from pathlib import Path
 from facebook_business.adobjects.user import User
 import time
+from app.services.graph_metering import graph_meter
 
 # Load .env from project root (parent of backend)
 env_path = Path(__file__).resolve().parent.parent.parent.parent / '.env'
@@ -37,7 +38,8 @@ class FacebookService:
                 app_secret=self.app_secret,
                 access_token=self.access_token
             )
-            self.api = FacebookAdsApi.get_default_api()
+            # Count SDK requests against the shared Graph API budget
+            self.api = graph_meter.instrument_sdk(FacebookAdsApi.get_default_api())
             
             # Only set up the AdAccount object if we have an ID
             if self.ad_account_id:
@@ -435,6 +437,7 @@ class FacebookService:
         }
 
         response = requests.get(url, params=params, timeout=30)
+        graph_meter.record("facebook_service", url, response.status_code)
         data = response.json()
 
         if 'error' in data:
@@ -494,6 +497,7 @@ class FacebookService:
         }
 
         response = requests.get(url, params=params, timeout=30)
+        graph_meter.record("facebook_service", url, response.status_code)
         data = response.json()
 
         if 'error' in data:
@@ -0,0 +1,338 @@
+"""
+Graph API Call Metering
+
+Every outbound Graph API request is counted here, whichever client made it:
+- httpx: the shared GRAPH client (Ads Library scraper, brand scraper) reports
+  each response through an event hook (see http_clients).
+- facebook_business SDK: FacebookService instruments its FacebookAdsApi
+  instance with instrument_sdk(), so every SDK call (including batches) counts.
+- requests: FacebookService's direct video lookups call record().
+
+Calls land in an in-memory sliding-window counter that RateLimiter reads in
+O(1), and in a pending buffer that a background thread writes to the
+graph_api_calls table in batches. After each write the counter is rebuilt from
+that table, so every worker's budget view includes the other workers' calls
+(lagging by at most GRAPH_METER_FLUSH_SECONDS). The first load also happens
+on that thread, when start() is called, so no request waits on the database.
+The load is summed per bucket in the database, so it returns one row per
+minute of the window however many calls were made.
+
+Rows older than GRAPH_METER_RETENTION_HOURS (never less than the window) are
+deleted by the flush thread every PRUNE_SECONDS, so the table stays bounded.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+BUCKET_SECONDS = 60
+LOAD_RETRY_SECONDS = 30
+PRUNE_SECONDS = 600
+
+
+class SlidingWindowCounter:
+    """
+    Call count over a trailing window, in fixed time buckets.
+
+    add() and total() are O(1) amortised: a running total is kept and
+    buckets are retired as they fall out of the window.
+    """
+
+    def __init__(self, window_seconds: int, bucket_seconds: int = BUCKET_SECONDS):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self._buckets: "dict[int, int]" = {}  # bucket index -> calls, in insertion (time) order
+        self._total = 0
+
+    def add(self, calls: int = 1, at: float = None):
+        """Count calls made at the given time (now by default); times must not go backwards."""
+        bucket = int((time.time() if at is None else at) // self.bucket_seconds)
+        if bucket < self._oldest_live_bucket(time.time()):
+            return
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + calls
+        self._total += calls
+
+    def total(self, now: float = None) -> int:
+        self._expire(time.time() if now is None else now)
+        return self._total
+
+    def reset_in_seconds(self, now: float = None) -> int:
+        """Seconds until the oldest counted call leaves the window."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        if not self._buckets:
+            return 0
+        oldest = min(self._buckets)
+        return max(0, int((oldest + 1) * self.bucket_seconds + self.window_seconds - now))
+
+    def load(self, calls: Iterable[Tuple[float, int]]):
+        """Replace the contents with (timestamp, calls) pairs."""
+        self._buckets = {}
+        self._total = 0
+        for at, count in sorted(calls):
+            self.add(count, at)
+
+    def _oldest_live_bucket(self, now: float) -> int:
+        return int((now - self.window_seconds) // self.bucket_seconds)
+
+    def _expire(self, now: float):
+        oldest_live = self._oldest_live_bucket(now)
+        while self._buckets:
+            bucket = next(iter(self._buckets))
+            if bucket >= oldest_live:
+                break
+            self._total -= self._buckets.pop(bucket)
+
+
+def _write_batch(rows: List[dict]):
+    """Insert pending call records."""
+    from app.database import SessionLocal
+    from app.models import GraphApiCall
+
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(GraphApiCall, rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _load_window(since: datetime) -> List[Tuple[float, int]]:
+    """(bucket start timestamp, calls) for the calls recorded since the given time, across all workers."""
+    from sqlalchemy import func
+    from app.database import SessionLocal
+    from app.models import GraphApiCall
+
+    db = SessionLocal()
+    try:
+        bucket = func.floor(func.extract("epoch", GraphApiCall.created_at) / BUCKET_SECONDS)
+        rows = db.query(bucket, func.sum(GraphApiCall.calls)).filter(
+            GraphApiCall.created_at >= since
+        ).group_by(bucket).all()
+        return [(int(index) * BUCKET_SECONDS, int(calls)) for index, calls in rows]
+    finally:
+        db.close()
+
+
+def _delete_before(before: datetime):
+    """Delete call records older than the given time."""
+    from app.database import SessionLocal
+    from app.models import GraphApiCall
+
+    db = SessionLocal()
+    try:
+        db.query(GraphApiCall).filter(
+            GraphApiCall.created_at < before
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _batch_size(params) -> int:
+    """Requests in an SDK call: a batch counts once per request it carries."""
+    batch = params.get("batch") if isinstance(params, dict) else None
+    if isinstance(batch, str):
+        try:
+            batch = json.loads(batch)
+        except ValueError:
+            return 1
+    return max(1, len(batch)) if isinstance(batch, list) else 1
+
+
+class GraphMeter:
+    """Process-wide Graph API call meter."""
+
+    def __init__(
+        self,
+        window_seconds: int = None,
+        writer: Callable[[List[dict]], None] = _write_batch,
+        loader: Callable[[datetime], List[Tuple[float, int]]] = _load_window,
+        flush_seconds: float = None,
+        flush_batch_size: int = None,
+        pruner: Callable[[datetime], None] = _delete_before,
+        retention_seconds: int = None
+    ):
+        self.window_seconds = window_seconds or settings.GRAPH_RATE_WINDOW_MINUTES * 60
+        self.flush_seconds = flush_seconds or settings.GRAPH_METER_FLUSH_SECONDS
+        self.flush_batch_size = flush_batch_size or settings.GRAPH_METER_FLUSH_BATCH
+        # The budget check sums the window from the table, so it is never pruned
+        self.retention_seconds = max(retention_seconds or settings.GRAPH_METER_RETENTION_HOURS * 3600, self.window_seconds)
+        self._writer = writer
+        self._loader = loader
+        self._pruner = pruner
+
+        self._counter = SlidingWindowCounter(self.window_seconds)
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._loaded = False
+        self._retry_load_at = 0.0
+        self._prune_at: Optional[float] = None  # Scheduled by the flush thread
+
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flush_stop = threading.Event()
+        self._flush_now = threading.Event()
+
+        self.recorded = 0
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def record(self, source: str, url: str = None, status_code: int = None, calls: int = 1):
+        """Count calls to the Graph API (source: which service made them)."""
+        now = time.time()
+        row = {
+            "source": source,
+            "path": urlparse(url).path[:255] if url else None,
+            "status_code": status_code,
+            "calls": calls,
+            "created_at": datetime.fromtimestamp(now, tz=timezone.utc),
+        }
+        with self._lock:
+            self._counter.add(calls, now)
+            self._pending.append(row)
+            self.recorded += calls
+            full = len(self._pending) >= self.flush_batch_size
+        if full:
+            self._flush_now.set()
+
+    async def on_httpx_response(self, response):
+        """httpx response event hook for the shared GRAPH client."""
+        self.record("graph_client", str(response.request.url), response.status_code)
+
+    def instrument_sdk(self, api, source: str = "facebook_sdk"):
+        """Count every request made through a facebook_business FacebookAdsApi instance."""
+        if api is None or getattr(api, "_graph_metered", False):
+            return api
+
+        original_call = api.call
+        meter = self
+
+        def metered_call(method, path, params=None, *args, **kwargs):
+            url = path if isinstance(path, str) else "/".join(str(part) for part in path)
+            calls = _batch_size(params)
+            try:
+                response = original_call(method, path, params, *args, **kwargs)
+            except Exception as e:
+                # Errors from the API were still requests
+                meter.record(source, url, getattr(e, "http_status", lambda: None)(), calls)
+                raise
+            meter.record(source, url, response.status(), calls)
+            return response
+
+        api.call = metered_call
+        api._graph_metered = True
+        return api
+
+    def calls_in_window(self) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return self._counter.total()
+
+    def reset_in_seconds(self) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return self._counter.reset_in_seconds()
+
+    def flush(self):
+        """Write pending records, then resync the counter with every worker's calls."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                try:
+                    self._writer(batch)
+                    self.flushed += len(batch)
+                except Exception as e:
+                    self.flush_errors += 1
+                    print(f"Graph API meter flush failed ({len(batch)} records): {e}")
+                    with self._lock:
+                        self._pending = batch + self._pending
+                    return
+            self._sync()
+            if self._prune_at is not None and time.monotonic() >= self._prune_at:
+                self._prune()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "calls_in_window": self.calls_in_window(),
+            "window_seconds": self.window_seconds,
+            "pending_writes": pending,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+            "flushing": bool(self._flush_thread and self._flush_thread.is_alive()),
+        }
+
+    def start(self):
+        """Start the background flush thread."""
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        self._flush_stop.clear()
+        self._flush_thread = threading.Thread(target=self._run, name="graph-meter", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write anything still pending."""
+        self._flush_stop.set()
+        self._flush_now.set()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=self.flush_seconds + 5)
+            self._flush_thread = None
+        self.flush()
+
+    def _run(self):
+        self._sync()
+        self._prune()
+        while not self._flush_stop.is_set():
+            self._flush_now.wait(self.flush_seconds)
+            self._flush_now.clear()
+            if self._flush_stop.is_set():
+                break
+            self.flush()
+
+    def _ensure_loaded(self):
+        """Load the window on first use when the flush thread isn't running (e.g. tests)."""
+        if self._loaded or (self._flush_thread and self._flush_thread.is_alive()):
+            # The flush thread loads it; calls made meanwhile are already counted
+            return
+        if time.monotonic() < self._retry_load_at:
+            return
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                if not self._loaded:
+                    self._sync()
+            finally:
+                self._flush_lock.release()
+
+    def _prune(self):
+        """Delete call records older than the retention period."""
+        self._prune_at = time.monotonic() + PRUNE_SECONDS
+        try:
+            self._pruner(datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds))
+        except Exception as e:
+            print(f"Graph API meter prune failed: {e}")
+
+    def _sync(self):
+        """Rebuild the counter from the table plus records not yet written."""
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.window_seconds)
+        try:
+            calls = self._loader(since)
+        except Exception as e:
+            print(f"Graph API meter sync failed: {e}")
+            self._retry_load_at = time.monotonic() + LOAD_RETRY_SECONDS
+            return
+        with self._lock:
+            self._counter.load(calls + [(row["created_at"].timestamp(), row["calls"]) for row in self._pending])
+            self._loaded = True
+
+
+# Singleton instance
+graph_meter = GraphMeter()
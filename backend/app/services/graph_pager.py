@@ -0,0 +1,192 @@
+"""
+Graph API Cursor Pager
+
+Follows paging.cursors.after through an Ads Library result set, fetching the
+next page as soon as the current page's cursor is known instead of waiting for
+the caller to finish parsing it. At most `lookahead` fetched pages are buffered
+ahead of the consumer, so memory stays bounded by page size.
+
+With a `budget`, every request is accounted for before it is sent (drawing
+from `reservation` first, see api_budget); a request the budget can't cover
+ends the iteration with BudgetExceeded. With a `throttle`, requests are
+spaced and retried according to Facebook's usage headers (see graph_throttle),
+each retry accounted against the budget like the first attempt.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager, nullcontext, suppress
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Graph API max page size for ads_archive
+MAX_PAGE_SIZE = 300
+
+# Node lookups by ID (?ids=a,b,c), at most 50 IDs per request
+GRAPH_NODE_URL = "https://graph.facebook.com/v21.0/"
+MAX_IDS_PER_REQUEST = 50
+
+# End-of-stream markers: limit reached (cursor still valid) vs. no more results
+_DONE = object()
+_EXHAUSTED = object()
+
+
+class GraphCursorPager:
+    """Prefetching iterator over raw Graph API result pages."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        params: dict,
+        limit: int,
+        after: Optional[str] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        lookahead: int = 1,
+        budget=None,
+        reservation=None,
+        throttle=None,
+    ):
+        """
+        Args:
+            client: Shared HTTP client to fetch with
+            url: Graph API endpoint (e.g. .../ads_archive)
+            params: Query params for every page (without limit/after)
+            limit: Total number of ads to request across pages
+            after: Cursor to resume from
+            page_size: Ads requested per page (max 300)
+            lookahead: Pages fetched ahead of the consumer
+            budget: ApiBudget to account each request against
+            reservation: Calls already reserved from `budget` for this pager
+            throttle: GraphThrottle to send requests through
+        """
+        self.client = client
+        self.url = url
+        self.params = params
+        self.limit = limit
+        self.start_cursor = after
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.lookahead = max(1, lookahead)
+        self.budget = budget
+        self.reservation = reservation
+        self.throttle = throttle
+
+        # Accounting, read by callers for usage logging
+        self.api_calls = 0
+        self.ads_returned = 0
+
+        # Cursor after the last page handed to the consumer (None once exhausted)
+        self.next_cursor = after
+        self.exhausted = False
+
+    async def pages(self) -> AsyncIterator[dict]:
+        """Yield each page's JSON body in order while the next page downloads."""
+        queue = asyncio.Queue(maxsize=self.lookahead)
+        producer = asyncio.create_task(self._produce(queue))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if item is _EXHAUSTED:
+                    self.exhausted = True
+                    self.next_cursor = None
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                page, cursor = item
+                self.ads_returned += len(page.get("data") or [])
+                self.next_cursor = cursor
+                if cursor is None:
+                    self.exhausted = True
+                yield page
+        finally:
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+
+    async def _produce(self, queue: asyncio.Queue):
+        """Fetch pages back to back, blocking only when the lookahead buffer is full."""
+        try:
+            remaining = self.limit
+            after = self.start_cursor
+
+            while remaining > 0:
+                batch_size = min(remaining, self.page_size)
+                params = dict(self.params, limit=batch_size)
+                if after:
+                    params["after"] = after
+
+                print(f"Calling API: {self.url} (batch {self.api_calls + 1}, requesting {batch_size} ads)")
+                response = await _send(self.client, self.url, params, self.throttle, self._spend)
+                response.raise_for_status()
+                data = response.json()
+
+                if not data.get("data"):
+                    print("No more ads returned from API")
+                    await queue.put(_EXHAUSTED)
+                    return
+
+                paging = data.get("paging", {})
+                after = paging.get("cursors", {}).get("after") if paging.get("next") else None
+                await queue.put((data, after))
+
+                if not after:
+                    print("No more pages available")
+                    await queue.put(_EXHAUSTED)
+                    return
+
+                remaining -= batch_size
+
+            await queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+
+    @asynccontextmanager
+    async def _spend(self):
+        """Account for one request attempt (retries included) and count it."""
+        spend = self.budget.spend(1, self.reservation, owner="ads_library_search") if self.budget else nullcontext()
+        async with spend:
+            self.api_calls += 1
+            yield
+
+
+async def _send(client: httpx.AsyncClient, url: str, params: dict, throttle, spend) -> httpx.Response:
+    """GET through the throttle (which spends per attempt) or directly, inside spend()."""
+    if throttle:
+        return await throttle.get(client, url, params=params, spend=spend)
+    async with spend():
+        return await client.get(url, params=params)
+
+
+async def fetch_ads_by_id(
+    client: httpx.AsyncClient,
+    ids: List[str],
+    fields: str,
+    access_token: str,
+    budget=None,
+    reservation=None,
+    throttle=None,
+    owner: str = "ads_library_search",
+) -> Dict[str, dict]:
+    """
+    Fetch full fields for known ad IDs with batched ?ids= requests.
+
+    Returns {id: ad dict} for every ID the API returned; IDs it no longer
+    serves are simply missing.
+    """
+    ads = {}
+    for start in range(0, len(ids), MAX_IDS_PER_REQUEST):
+        chunk = ids[start:start + MAX_IDS_PER_REQUEST]
+        params = {"ids": ",".join(chunk), "fields": fields, "access_token": access_token}
+        print(f"Fetching full fields for {len(chunk)} new ads")
+        spend = (lambda: budget.spend(1, reservation, owner=owner)) if budget else nullcontext
+        response = await _send(client, GRAPH_NODE_URL, params, throttle, spend)
+        response.raise_for_status()
+        for ad_id, ad in response.json().items():
+            if isinstance(ad, dict):
+                ads[ad_id] = dict(ad, id=ad.get("id", ad_id))
+    return ads
@@ -0,0 +1,255 @@
+"""
+Date-Window Sharded Graph Fetch
+
+A single Graph cursor chain is serial: 5,000 ads means 17 back-to-back
+300-ad pages. For large pulls the request is split into
+ad_delivery_date_min/max windows whose cursor chains are paginated
+concurrently (at most `concurrency` at once, all accounted against the shared
+budget and throttle), and the pages are merged with ads deduped by id.
+
+Shards claim one page at a time from the ads still wanted, so together they
+request no more than `limit` ads (about as many calls as one cursor chain).
+Ads a shard didn't get (short pages, exhausted windows) and duplicates
+dropped while merging go back to be claimed by any shard.
+
+Each shard keeps a checkpoint (its cursor and progress). A shard that fails
+is retried from its checkpoint rather than from its first page; shards that
+still fail are reported in ShardFetchError along with their checkpoints, which
+can be passed back in to resume just those shards.
+"""
+
+import asyncio
+from contextlib import suppress
+from datetime import date, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+
+from app.services.api_budget import BudgetExceeded
+from app.services.graph_pager import GraphCursorPager, MAX_PAGE_SIZE
+
+_DONE = object()
+
+
+def date_windows(lookback_days: int, shards: int, today: date = None) -> List[Tuple[Optional[str], str]]:
+    """
+    Split the last `lookback_days` into `shards` (min, max) date windows, newest first.
+
+    The oldest window has no lower bound, so older ads are still covered.
+    """
+    today = today or date.today()
+    shards = max(1, min(shards, lookback_days))
+    span = lookback_days / shards
+
+    windows = []
+    for i in range(shards):
+        window_max = today - timedelta(days=round(i * span))
+        window_min = today - timedelta(days=round((i + 1) * span) - 1)
+        is_oldest = i == shards - 1
+        windows.append((None if is_oldest else window_min.isoformat(), window_max.isoformat()))
+    return windows
+
+
+class ShardCheckpoint:
+    """Resumable progress of one date window."""
+
+    def __init__(self, date_min: Optional[str], date_max: str, after: Optional[str] = None, fetched: int = 0, done: bool = False):
+        self.date_min = date_min
+        self.date_max = date_max
+        self.after = after  # Cursor after the last page delivered
+        self.fetched = fetched  # Ads delivered from this window
+        self.done = done
+        self.attempts = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "date_min": self.date_min,
+            "date_max": self.date_max,
+            "after": self.after,
+            "fetched": self.fetched,
+            "done": self.done,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ShardCheckpoint":
+        return cls(data.get("date_min"), data["date_max"], data.get("after"), data.get("fetched", 0), data.get("done", False))
+
+
+class ShardFetchError(Exception):
+    """Some shards failed after their retries."""
+
+    def __init__(self, failed: List[ShardCheckpoint]):
+        super().__init__(f"{len(failed)} date shard(s) failed: " + "; ".join(
+            f"{cp.date_min or 'start'}..{cp.date_max}: {cp.error}" for cp in failed
+        ))
+        self.failed = failed
+
+
+class ShardedGraphFetcher:
+    """Concurrent pagination of one Graph query across date windows."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        params: dict,
+        limit: int,
+        checkpoints: List[ShardCheckpoint],
+        concurrency: int = 4,
+        page_size: int = MAX_PAGE_SIZE,
+        max_attempts: int = 3,
+        budget=None,
+        reservation=None,
+        throttle=None,
+    ):
+        """
+        Args:
+            client: Shared HTTP client to fetch with
+            url: Graph API endpoint (e.g. .../ads_archive)
+            params: Query params for every page (without limit/after/dates)
+            limit: Total number of unique ads wanted across shards
+            checkpoints: One per date window (see date_windows / ShardCheckpoint)
+            concurrency: Shards paginated at once
+            page_size: Ads requested per page (max 300)
+            max_attempts: Tries per shard, each resuming from its checkpoint
+            budget, reservation, throttle: Passed to each shard's GraphCursorPager
+        """
+        self.client = client
+        self.url = url
+        self.params = params
+        self.limit = limit
+        self.checkpoints = checkpoints
+        self.concurrency = max(1, concurrency)
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.reservation = reservation
+        self.throttle = throttle
+
+        # Same accounting attributes as GraphCursorPager
+        self.api_calls = 0
+        self.ads_returned = 0
+        self.next_cursor = None  # No single cursor; see checkpoints
+        self.exhausted = False
+        self.duplicates = 0
+
+        # Ads wanted but not yet claimed by a shard's next page
+        self._unclaimed = 0
+        self._refilled: Optional[asyncio.Event] = None
+
+    async def pages(self) -> AsyncIterator[dict]:
+        """Yield pages from all shards as they arrive, with already-seen ads removed."""
+        queue = asyncio.Queue(maxsize=self.concurrency)
+        self._unclaimed = self.limit
+        self._refilled = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        shards = [asyncio.create_task(self._run_shard(cp, queue, semaphore)) for cp in self.checkpoints if not cp.done]
+
+        async def supervise():
+            await asyncio.gather(*shards, return_exceptions=True)
+            await queue.put(_DONE)
+
+        supervisor = asyncio.create_task(supervise())
+        seen_ids = set()
+        returned = 0
+        try:
+            while returned < self.limit:
+                page = await queue.get()
+                if page is _DONE:
+                    break
+
+                ads = []
+                duplicates = 0
+                for ad in page.get("data") or []:
+                    ad_id = ad.get("id")
+                    if ad_id in seen_ids:
+                        duplicates += 1
+                        continue
+                    if ad_id:
+                        seen_ids.add(ad_id)
+                    ads.append(ad)
+                ads = ads[:self.limit - returned]
+
+                # Duplicates still have to be made up by another page
+                self.duplicates += duplicates
+                self._unclaim(duplicates)
+                self.ads_returned += len(ads)
+                returned += len(ads)
+                if ads:
+                    yield dict(page, data=ads)
+        finally:
+            for task in shards + [supervisor]:
+                task.cancel()
+            with suppress(asyncio.CancelledError):
+                await asyncio.gather(*shards, supervisor, return_exceptions=True)
+
+        self.exhausted = all(cp.done for cp in self.checkpoints)
+        failed = [cp for cp in self.checkpoints if not cp.done and cp.error]
+        if failed and returned < self.limit:
+            raise ShardFetchError(failed)
+
+    async def _run_shard(self, checkpoint: ShardCheckpoint, queue: asyncio.Queue, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            while not checkpoint.done and checkpoint.attempts < self.max_attempts:
+                checkpoint.attempts += 1
+                try:
+                    await self._page_through(checkpoint, queue)
+                    checkpoint.error = None
+                except BudgetExceeded as e:
+                    # Retrying can't help until the window moves on
+                    checkpoint.error = str(e)
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    checkpoint.error = str(e)
+                    print(f"Shard {checkpoint.date_min or 'start'}..{checkpoint.date_max} failed (attempt {checkpoint.attempts}): {e}")
+
+    async def _page_through(self, checkpoint: ShardCheckpoint, queue: asyncio.Queue):
+        """Fetch a window page by page from its checkpoint, each page claimed from the ads still wanted."""
+        params = dict(self.params, ad_delivery_date_max=checkpoint.date_max)
+        if checkpoint.date_min:
+            params["ad_delivery_date_min"] = checkpoint.date_min
+
+        while not checkpoint.done:
+            batch = await self._claim()
+            pager = GraphCursorPager(
+                self.client,
+                self.url,
+                params,
+                limit=batch,
+                after=checkpoint.after,
+                page_size=self.page_size,
+                budget=self.budget,
+                reservation=self.reservation,
+                throttle=self.throttle,
+            )
+            delivered = 0
+            try:
+                async for page in pager.pages():
+                    count = len(page.get("data") or [])
+                    delivered += count
+                    checkpoint.after = pager.next_cursor
+                    checkpoint.fetched += count
+                    await queue.put(page)
+                checkpoint.done = pager.exhausted
+            finally:
+                self.api_calls += pager.api_calls
+                self._unclaim(batch - delivered)
+
+    async def _claim(self) -> int:
+        """Ads to request in a shard's next page; waits while other shards' pages cover the rest."""
+        while self._unclaimed <= 0:
+            await self._refilled.wait()
+        batch = min(self.page_size, self._unclaimed)
+        self._unclaimed -= batch
+        return batch
+
+    def _unclaim(self, ads: int):
+        """Hand ads back to be claimed (and wake shards waiting for them)."""
+        if ads <= 0:
+            return
+        self._unclaimed += ads
+        refilled, self._refilled = self._refilled, asyncio.Event()
+        refilled.set()
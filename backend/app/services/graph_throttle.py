@@ -0,0 +1,255 @@
+"""
+Graph API Adaptive Throttle
+
+Reads the usage headers Facebook returns on every Graph API response and
+spaces out this process's requests before the limits are hit:
+
+- x-app-usage: {"call_count": %, "total_cputime": %, "total_time": %}
+- x-business-use-case-usage: {business_id: [{"type", "call_count",
+  "total_cputime", "total_time", "estimated_time_to_regain_access"}]}
+- x-ad-account-usage: {"acc_id_util_pct": %}
+
+Pressure is the highest of those percentages (as 0.0-1.0). Below
+GRAPH_THROTTLE_START_PCT requests go out immediately; above it they are
+spaced by an interval that grows smoothly to GRAPH_THROTTLE_MAX_DELAY_SECONDS
+at 100%, instead of running into a hard block.
+
+request() also retries transient failures (5xx, network errors, Graph error
+codes 1/2 and the rate-limit codes) with full-jitter exponential backoff. When
+Facebook says access won't be regained within the backoff cap, the error is
+returned at once so callers can fall back instead of stalling. Callers pass
+`spend` to have every attempt (retries included) accounted against the call
+budget; nothing is held while backing off.
+"""
+
+import asyncio
+import json
+import random
+import time
+from contextlib import nullcontext
+from typing import AsyncContextManager, Callable, Optional
+
+import httpx
+
+from app.core.config import settings
+
+# Graph error codes worth retrying
+TRANSIENT_ERROR_CODES = {1, 2}
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 341, 613}
+BUC_RATE_LIMIT_CODES = range(80000, 80015)  # Business use case limits
+
+# Usage readings older than this are ignored
+PRESSURE_TTL_SECONDS = 300
+
+
+def parse_usage_headers(headers) -> Optional[dict]:
+    """
+    Read the Graph usage headers.
+
+    Returns {"pressure": 0.0-1.0+, "regain_seconds": int, "usage": {...}},
+    or None if the response carried no usage headers.
+    """
+    usage = {}
+    regain_minutes = 0
+
+    def load(name):
+        value = headers.get(name)
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    app_usage = load("x-app-usage")
+    if isinstance(app_usage, dict):
+        for key in ("call_count", "total_cputime", "total_time"):
+            if key in app_usage:
+                usage[f"app.{key}"] = float(app_usage[key])
+
+    buc_usage = load("x-business-use-case-usage")
+    if isinstance(buc_usage, dict):
+        for business_id, entries in buc_usage.items():
+            for entry in entries if isinstance(entries, list) else []:
+                prefix = f"buc.{business_id}.{entry.get('type', 'unknown')}"
+                for key in ("call_count", "total_cputime", "total_time"):
+                    if key in entry:
+                        usage[f"{prefix}.{key}"] = float(entry[key])
+                regain_minutes = max(regain_minutes, int(entry.get("estimated_time_to_regain_access") or 0))
+
+    account_usage = load("x-ad-account-usage")
+    if isinstance(account_usage, dict) and "acc_id_util_pct" in account_usage:
+        usage["ad_account.util_pct"] = float(account_usage["acc_id_util_pct"])
+
+    if not usage and not regain_minutes:
+        return None
+
+    return {
+        "pressure": max(usage.values(), default=0.0) / 100.0,
+        "regain_seconds": regain_minutes * 60,
+        "usage": usage,
+    }
+
+
+def graph_error_code(response: httpx.Response) -> Optional[int]:
+    """Graph API error code from a JSON error body, if any."""
+    if response.status_code < 400:
+        return None
+    try:
+        error = response.json().get("error") or {}
+        return int(error.get("code")) if error.get("code") is not None else None
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def is_rate_limit_code(code: Optional[int]) -> bool:
+    return code is not None and (code in RATE_LIMIT_ERROR_CODES or code in BUC_RATE_LIMIT_CODES)
+
+
+class GraphThrottle:
+    """Process-wide request spacing and retry policy for the Graph API."""
+
+    def __init__(
+        self,
+        start_pct: float = None,
+        max_delay_seconds: float = None,
+        retry_attempts: int = None,
+        retry_base_seconds: float = None,
+        retry_max_seconds: float = None,
+        sleep=asyncio.sleep
+    ):
+        self.start = (settings.GRAPH_THROTTLE_START_PCT if start_pct is None else start_pct) / 100.0
+        self.max_delay_seconds = settings.GRAPH_THROTTLE_MAX_DELAY_SECONDS if max_delay_seconds is None else max_delay_seconds
+        self.retry_attempts = settings.GRAPH_RETRY_ATTEMPTS if retry_attempts is None else retry_attempts
+        self.retry_base_seconds = settings.GRAPH_RETRY_BASE_SECONDS if retry_base_seconds is None else retry_base_seconds
+        self.retry_max_seconds = settings.GRAPH_RETRY_MAX_SECONDS if retry_max_seconds is None else retry_max_seconds
+        self._sleep = sleep
+
+        self.pressure = 0.0
+        self.usage = {}
+        self._observed_at = 0.0
+        self._blocked_until = 0.0
+        self._next_slot = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+
+    def observe(self, response: httpx.Response):
+        """Update pressure from a response's usage headers (and rate-limit errors)."""
+        reading = parse_usage_headers(response.headers)
+        now = time.monotonic()
+        if reading:
+            self.pressure = reading["pressure"]
+            self.usage = reading["usage"]
+            self._observed_at = now
+            if reading["regain_seconds"]:
+                self._blocked_until = now + reading["regain_seconds"]
+
+        if is_rate_limit_code(graph_error_code(response)):
+            # Limited even if the headers didn't say so
+            self.pressure = max(self.pressure, 1.0)
+            self._observed_at = now
+
+    def current_pressure(self) -> float:
+        if time.monotonic() - self._observed_at > PRESSURE_TTL_SECONDS:
+            return 0.0
+        return self.pressure
+
+    def interval(self) -> float:
+        """Minimum spacing between requests at the current pressure."""
+        pressure = self.current_pressure()
+        if pressure <= self.start:
+            return 0.0
+        # Quadratic ramp: barely noticeable just above the start, max delay at 100%
+        ramp = min(1.0, (pressure - self.start) / max(1e-6, 1.0 - self.start))
+        return self.max_delay_seconds * ramp * ramp
+
+    def blocked_for(self) -> float:
+        """Seconds until Facebook said access would be regained (0 if not blocked)."""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    async def wait_turn(self):
+        """Wait for this request's slot; concurrent requests queue up one interval apart."""
+        interval = self.interval()
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + interval
+        wait = slot - now
+        if wait > 0:
+            self.throttled_requests += 1
+            self.throttled_seconds += wait
+            await self._sleep(wait)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        spend: Callable[[], AsyncContextManager] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a Graph API request, throttled and retried.
+
+        Returns the final response (callers still check its status); raises the
+        last network error if every attempt failed to connect. With `spend`
+        (e.g. lambda: budget.spend(1, reservation)), each attempt is sent
+        inside a fresh spend() context, so retries are paid for like any other
+        call and a BudgetExceeded stops them.
+        """
+        attempt = 0
+        while True:
+            await self.wait_turn()
+            self.requests += 1
+            try:
+                async with spend() if spend else nullcontext():
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= self.retry_attempts:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Graph API network error: {e}, retrying in {delay:.1f}s")
+            else:
+                self.observe(response)
+                code = graph_error_code(response)
+                retryable = (
+                    response.status_code >= 500
+                    or code in TRANSIENT_ERROR_CODES
+                    or is_rate_limit_code(code)
+                )
+                if not retryable or attempt >= self.retry_attempts:
+                    return response
+                if self.blocked_for() > self.retry_max_seconds:
+                    print(f"Graph API rate limited for {self.blocked_for():.0f}s, not retrying")
+                    return response
+                delay = max(self._backoff(attempt), self.blocked_for())
+                print(f"Graph API error (status {response.status_code}, code {code}), retrying in {delay:.1f}s")
+
+            attempt += 1
+            self.retries += 1
+            await self._sleep(delay)
+
+    async def get(self, client: httpx.AsyncClient, url: str, spend: Callable[[], AsyncContextManager] = None, **kwargs) -> httpx.Response:
+        return await self.request(client, "GET", url, spend=spend, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "pressure": round(self.current_pressure(), 3),
+            "usage": self.usage,
+            "interval_seconds": round(self.interval(), 2),
+            "blocked_for_seconds": round(self.blocked_for()),
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_requests": self.throttled_requests,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt)))
+
+
+# Singleton instance
+graph_throttle = GraphThrottle()
@@ -0,0 +1,209 @@
+"""
+Ads Library GraphQL Capture
+
+The Ads Library page loads its results as JSON: the first batch embedded in
+the HTML document (<script type="application/json"> blocks) and every
+further batch from /api/graphql/ as the feed scrolls. AdsLibraryCapture
+listens to the page's responses (page.on('response'), like the media capture
+hooks) and keeps every ad node found in them, so the Playwright scrapers read
+ads straight from JSON, with their media URLs and media type, instead of
+inferring them from rendered text. The DOM extractor (ad_extractor) is only
+used when nothing was captured.
+
+Ad nodes look like:
+
+    {"ad_archive_id", "page_id", "page_name", "publisher_platform": [...],
+     "start_date": <unix>, "snapshot": {"title", "body": {"text"}, "cta_text",
+     "link_url", "display_format", "images": [...], "videos": [...], "cards": [...]}}
+
+The parse_* functions below turn them into the shapes each scraper expects.
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+
+GRAPHQL_PATH = "/api/graphql"
+ADS_LIBRARY_PATH = "/ads/library"
+
+# Facebook prefixes some JSON responses to stop them being run as scripts
+_JSON_GUARD = "for (;;);"
+_SCRIPT_JSON_RE = re.compile(r'<script type="application/json"[^>]*>(.*?)</script>', re.DOTALL)
+
+
+class AdsLibraryCapture:
+    """Collects ad nodes from the Ads Library's own JSON responses."""
+
+    def __init__(self):
+        self._ads: Dict[str, dict] = {}  # ad_archive_id -> node, in load order
+        self._media_keys: Set[str] = set()  # grows as ads are collected
+        self.responses = 0
+        self.parse_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._ads)
+
+    def count(self) -> int:
+        """Ads captured so far (for scroll_until_settled)."""
+        return len(self._ads)
+
+    def attach(self, page):
+        """Start capturing from a page's responses; call before navigating."""
+        page.on("response", self._on_response)
+
+    def records(self) -> List[dict]:
+        """Raw ad nodes captured, in the order they loaded."""
+        return list(self._ads.values())
+
+    def media_keys(self) -> Set[str]:
+        """media_key of every image and video URL the captured ads refer to.
+
+        This is the live set, updated as ads are collected, not a copy.
+        """
+        return self._media_keys
+
+    async def _on_response(self, response):
+        url = response.url
+        try:
+            if GRAPHQL_PATH in url:
+                self.feed_json(await response.text())
+            elif ADS_LIBRARY_PATH in url and response.request.resource_type == "document":
+                self.feed_html(await response.text())
+        except Exception:
+            # Redirects, aborted loads and unexpected payloads: the DOM path still works
+            self.parse_errors += 1
+
+    def feed_json(self, text: str):
+        """Collect ads from a GraphQL response (one or more JSON documents, one per line)."""
+        if text.startswith(_JSON_GUARD):
+            text = text[len(_JSON_GUARD):]
+        self.responses += 1
+        for line in text.splitlines():
+            line = line.strip()
+            if line and "ad_archive_id" in line:
+                self._collect(json.loads(line))
+
+    def feed_html(self, html: str):
+        """Collect ads from the JSON blocks embedded in the results page."""
+        self.responses += 1
+        for match in _SCRIPT_JSON_RE.finditer(html):
+            block = match.group(1)
+            if "ad_archive_id" in block:
+                self._collect(json.loads(block))
+
+    def _collect(self, document):
+        stack = [document]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if value.get("ad_archive_id") and isinstance(value.get("snapshot"), dict):
+                    ad_archive_id = str(value["ad_archive_id"])
+                    if ad_archive_id not in self._ads:
+                        self._ads[ad_archive_id] = value
+                        ad = parse_graphql_ad(value)
+                        self._media_keys.update(media_key(url) for url in ad["image_urls"] + ad["video_urls"])
+                    continue
+                stack.extend(reversed(list(value.values())))
+            elif isinstance(value, list):
+                stack.extend(reversed(value))
+
+
+def _text(value) -> Optional[str]:
+    """Body text, which is either a string or {"text": ...} / {"markup": {"__html": ...}}."""
+    if isinstance(value, dict):
+        value = value.get("text") or (value.get("markup") or {}).get("__html")
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    # Dynamic creative templates ("{{product.name}}") have no real text
+    return value if value and not value.startswith("{{") else None
+
+
+def _unique(urls: Iterable[Optional[str]]) -> List[str]:
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def _start_date(value) -> Optional[str]:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%d")
+    return value or None
+
+
+def parse_graphql_ad(node: dict) -> dict:
+    """Normalise one captured ad node."""
+    snapshot = node.get("snapshot") or {}
+    cards = [card for card in snapshot.get("cards") or [] if isinstance(card, dict)]
+    first_card = cards[0] if cards else {}
+
+    image_urls = _unique(
+        item.get("original_image_url") or item.get("resized_image_url")
+        for item in (snapshot.get("images") or []) + cards
+    )
+    video_urls = _unique(
+        item.get("video_hd_url") or item.get("video_sd_url")
+        for item in (snapshot.get("videos") or []) + cards
+    )
+
+    if video_urls:
+        media_type = "video"
+    elif len(cards) > 1 or (snapshot.get("display_format") or "").upper() == "CAROUSEL":
+        media_type = "carousel"
+    else:
+        media_type = "image"
+
+    return {
+        "id": str(node["ad_archive_id"]),
+        "page_id": str(node.get("page_id") or snapshot.get("page_id") or "") or None,
+        "page_name": node.get("page_name") or snapshot.get("page_name"),
+        "headline": _text(snapshot.get("title")) or _text(first_card.get("title")),
+        "ad_copy": _text(snapshot.get("body")) or _text(first_card.get("body")),
+        "cta_text": snapshot.get("cta_text") or first_card.get("cta_text"),
+        "link_url": snapshot.get("link_url") or first_card.get("link_url"),
+        "image_urls": image_urls,
+        "video_urls": video_urls,
+        "media_type": media_type,
+        "platforms": [p.lower() for p in node.get("publisher_platform") or []] or None,
+        "start_date": _start_date(node.get("start_date")),
+    }
+
+
+def parse_search_node(node: dict) -> dict:
+    """Captured ad in the shape of ad_extractor.parse_search_record (plus media_type)."""
+    ad = parse_graphql_ad(node)
+    return {
+        "external_id": ad["id"],
+        "brand_name": ad["page_name"] or "Unknown Brand",
+        "headline": ad["headline"],
+        "ad_copy": (ad["ad_copy"] or "")[:500],
+        "cta_text": ad["cta_text"],
+        "platforms": ad["platforms"],
+        "start_date": ad["start_date"],
+        "media_type": ad["media_type"],
+    }
+
+
+def parse_library_node(node: dict) -> dict:
+    """Captured ad as a Graph API-shaped dict for brand scrapes (like parse_library_record)."""
+    ad = parse_graphql_ad(node)
+    return {
+        "id": ad["id"],
+        "page_name": ad["page_name"],
+        "page_id": ad["page_id"],
+        "ad_creative_link_titles": [ad["headline"]] if ad["headline"] else None,
+        "ad_creative_bodies": [ad["ad_copy"]] if ad["ad_copy"] else None,
+        "ad_creative_link_captions": [ad["cta_text"]] if ad["cta_text"] else None,
+        "publisher_platforms": ad["platforms"],
+        "ad_delivery_start_time": ad["start_date"],
+        "_media_urls": ad["video_urls"] + ad["image_urls"],
+        "_image_urls": ad["image_urls"],
+        "_video_urls": ad["video_urls"],
+        "_has_video": bool(ad["video_urls"]),
+    }
+
+
+def media_key(url: str) -> str:
+    """fbcdn URL without its signed query string, for matching captured media to ads."""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path}"
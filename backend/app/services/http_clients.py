@@ -0,0 +1,116 @@
+"""
+Shared HTTP Clients
+
+App-lifetime httpx clients for all outbound HTTP traffic. Opening an
+AsyncClient per call costs a fresh TCP + TLS handshake for every Graph API
+page and every media file; these pooled clients keep connections alive and
+reuse them (multiplexed over HTTP/2 when h2 is installed).
+
+Each profile gets its own client, so connection limits apply per upstream:
+- graph: graph.facebook.com (Ads Library API), metered by graph_metering
+- media: fbcdn/scontent media downloads and ad snapshot pages
+- default: anything else (e.g. generated image downloads)
+
+Clients are started in the FastAPI lifespan (see app.main) and created lazily
+on first use everywhere else, e.g. in run_scheduled_searches.py.
+"""
+
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.services.graph_metering import graph_meter
+
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+GRAPH = "graph"
+MEDIA = "media"
+DEFAULT = "default"
+
+
+def _client_profiles() -> Dict[str, dict]:
+    """Client options per upstream profile."""
+    return {
+        GRAPH: {
+            "timeout": httpx.Timeout(60.0, connect=10.0),
+            # Every Graph API response counts against the shared call budget
+            "event_hooks": {"response": [graph_meter.on_httpx_response]},
+            "limits": httpx.Limits(
+                max_connections=settings.GRAPH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GRAPH_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60.0,
+            ),
+        },
+        MEDIA: {
+            "timeout": httpx.Timeout(60.0, connect=10.0),
+            "limits": httpx.Limits(
+                max_connections=settings.MEDIA_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MEDIA_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            "follow_redirects": True,
+        },
+        DEFAULT: {
+            "timeout": httpx.Timeout(30.0, connect=10.0),
+            "limits": httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        },
+    }
+
+
+class HttpClientRegistry:
+    """Registry of long-lived AsyncClients, one per upstream profile."""
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, Optional[asyncio.AbstractEventLoop]]] = {}
+
+    def start(self):
+        """Create all clients up front (called from the app lifespan)."""
+        for name in _client_profiles():
+            self.get(name)
+
+    def get(self, name: str = DEFAULT) -> httpx.AsyncClient:
+        """Borrow the shared client for a profile, creating it if needed."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        entry = self._clients.get(name)
+        if entry:
+            client, client_loop = entry
+            # Pooled connections are bound to the loop that opened them
+            if not client.is_closed and (client_loop is None or loop is None or client_loop is loop):
+                return client
+
+        profiles = _client_profiles()
+        if name not in profiles:
+            raise ValueError(f"Unknown HTTP client profile: {name}")
+
+        client = httpx.AsyncClient(http2=HTTP2_ENABLED, **profiles[name])
+        self._clients[name] = (client, loop)
+        return client
+
+    async def aclose(self):
+        """Close every client (called on app shutdown)."""
+        clients = [client for client, _ in self._clients.values()]
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Error closing HTTP client: {e}")
+
+
+# Singleton instance
+http_clients = HttpClientRegistry()
+
+
+def get_http_client(name: str = DEFAULT) -> httpx.AsyncClient:
+    """Shortcut for http_clients.get(name)."""
+    return http_clients.get(name)
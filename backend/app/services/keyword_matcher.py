@@ -0,0 +1,91 @@
+"""
+Negative Keyword Matcher
+
+Compiles request negative keywords and the persistent keyword blacklist into a
+single whole-word regex, so each ad is checked with one scan instead of one
+re.search per keyword.
+
+The keywords are folded into a character trie before compiling, which keeps the
+regex engine from trying every keyword at every position of the ad text.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+# Compiled matchers are cached by their normalized keyword tuple, which changes
+# whenever the blacklist does.
+MATCHER_CACHE_SIZE = 64
+
+
+def normalize_keywords(keywords: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Lowercase, strip and dedupe keywords into a stable, hashable tuple."""
+    return tuple(sorted({kw.strip().lower() for kw in (keywords or []) if kw and kw.strip()}))
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex alternation from keywords, sharing common prefixes."""
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for char in kw:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End-of-keyword marker
+
+    def render(node: dict) -> str:
+        is_end = '' in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if is_end:
+            # Keyword may stop here or continue into a longer keyword
+            return body + '?' if len(branches) == 1 and len(branches[0]) == 1 else '(?:' + body + ')?'
+        return body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Whole-word matcher for a fixed set of keywords."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = normalize_keywords(keywords)
+        self._pattern = None
+        if self.keywords:
+            self._pattern = re.compile(r'\b(?:' + _trie_pattern(self.keywords) + r')\b')
+
+    def __bool__(self) -> bool:
+        return self._pattern is not None
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def matches(self, text: Optional[str]) -> bool:
+        """Return True if any keyword appears in text as a whole word."""
+        if self._pattern is None or not text:
+            return False
+        return self._pattern.search(text.lower()) is not None
+
+    def matches_ad(self, *fields: Optional[str]) -> bool:
+        """Check the joined text fields of an ad (brand, headline, copy, CTA)."""
+        return self.matches(' '.join(field or '' for field in fields))
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _cached_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def get_keyword_matcher(
+    negative_keywords: Optional[Iterable[str]] = None,
+    blacklisted_keywords: Optional[Iterable[str]] = None
+) -> KeywordMatcher:
+    """
+    Get a compiled matcher for request negative keywords plus the blacklist.
+
+    Matchers are cached, so repeated searches against an unchanged blacklist
+    reuse the same compiled pattern.
+    """
+    combined = list(negative_keywords or []) + list(blacklisted_keywords or [])
+    return _cached_matcher(normalize_keywords(combined))
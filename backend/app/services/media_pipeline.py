@@ -0,0 +1,61 @@
+"""
+Brand Scrape Media Pipeline Limits
+
+A brand scrape processes its ads concurrently, each going through the stages
+snapshot fetch -> media download -> R2 upload -> persist. MediaLimits holds
+one semaphore per stage (plus one per media host for downloads), shared by all
+of a scrape's ads, so scrape time scales with the configured concurrency
+rather than with the number of ads, without flooding fbcdn or R2.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+
+class HostLimiter:
+    """At most `per_host` concurrent requests to any one host."""
+
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def slot(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[host]
+
+
+class MediaLimits:
+    """Per-stage concurrency limits and counters for one brand scrape."""
+
+    def __init__(self, snapshots: int = None, downloads: int = None, per_host: int = None, uploads: int = None):
+        self.snapshots = asyncio.Semaphore(snapshots or settings.BRAND_SNAPSHOT_CONCURRENCY)
+        self.downloads = asyncio.Semaphore(downloads or settings.BRAND_DOWNLOAD_CONCURRENCY)
+        self.hosts = HostLimiter(per_host or settings.BRAND_DOWNLOAD_PER_HOST)
+        self.uploads = asyncio.Semaphore(uploads or settings.BRAND_UPLOAD_CONCURRENCY)
+
+        self.snapshots_fetched = 0
+        self.downloaded = 0
+        self.downloaded_bytes = 0
+        self.uploaded = 0
+        self.failed = 0
+
+    @asynccontextmanager
+    async def download_slot(self, url: str):
+        """A download slot, within both the stage limit and the host's limit."""
+        async with self.downloads, self.hosts.slot(url):
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "snapshots_fetched": self.snapshots_fetched,
+            "downloaded": self.downloaded,
+            "downloaded_bytes": self.downloaded_bytes,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+        }
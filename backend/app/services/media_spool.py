@@ -0,0 +1,235 @@
+"""
+Media Spool
+
+Holds media bodies captured from Playwright responses until a brand scrape
+uploads them. Small items stay in memory up to MEDIA_SPOOL_MEMORY_BYTES;
+larger items, and anything past the memory budget, are written to temp files.
+Memory and disk together are capped at MEDIA_SPOOL_MAX_BYTES: when a new item
+does not fit, items no captured ad refers to are evicted first, then the
+oldest unclaimed ones, so a large scrape cannot grow the worker's heap (or
+disk) without bound.
+
+Items are handed to the upload stage as SpooledMedia, which reads the body
+from memory or streams it from its file handle.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from typing import AbstractSet, AsyncIterator, BinaryIO, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.graphql_capture import media_key
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class SpooledMedia:
+    """One captured media body, in memory or in a temp file."""
+
+    def __init__(self, url: str, content_type: str, size: int, data: bytes = None, path: str = None):
+        self.url = url
+        self.content_type = content_type
+        self.size = size
+        self.data = data
+        self.path = path
+        self.claims = 0  # ads this item is attached to
+
+    @property
+    def claimed(self) -> bool:
+        return self.claims > 0
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+    def open(self) -> BinaryIO:
+        """File handle for a spilled item."""
+        return open(self.path, "rb")
+
+    def read(self) -> bytes:
+        if self.in_memory:
+            return self.data
+        with self.open() as f:
+            return f.read()
+
+    async def chunks(self, chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """The body chunk by chunk, read off the event loop for spilled items."""
+        if self.in_memory:
+            yield self.data
+            return
+        with self.open() as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def release(self):
+        """Drop the body (memory or temp file)."""
+        self.data = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class MediaSpool:
+    """Captured media bodies by URL, within a memory budget and a total cap."""
+
+    def __init__(
+        self, memory_bytes: int = None, max_bytes: int = None, inline_max_bytes: int = None,
+        directory: str = None, wanted: AbstractSet[str] = None
+    ):
+        self.memory_bytes = memory_bytes or settings.MEDIA_SPOOL_MEMORY_BYTES
+        self.max_bytes = max_bytes or settings.MEDIA_SPOOL_MAX_BYTES
+        self.inline_max_bytes = inline_max_bytes or settings.MEDIA_SPOOL_INLINE_MAX_BYTES
+        self.directory = directory or settings.MEDIA_SPOOL_DIR or None
+        # Media keys of URLs that captured ads refer to (kept over other items when evicting);
+        # a live set the capture keeps up to date, so eviction never re-parses the ads
+        self.wanted = wanted
+
+        self._items: "OrderedDict[str, SpooledMedia]" = OrderedDict()  # media_key -> item, oldest first
+        self._writing: Dict[str, asyncio.Future] = {}  # media_key -> item being spilled
+        self._tempdir: Optional[str] = None
+        self._sequence = 0
+
+        self.memory_used = 0
+        self.disk_used = 0
+        self.spilled = 0
+        self.evicted = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def used(self) -> int:
+        return self.memory_used + self.disk_used
+
+    async def add(self, url: str, data: bytes, content_type: str) -> Optional[SpooledMedia]:
+        """Spool a captured body, writing spills off the event loop; returns None if it could not be kept."""
+        key = media_key(url)
+        if key in self._items:
+            return self._items[key]
+        if key in self._writing:
+            return await asyncio.shield(self._writing[key])
+        size = len(data)
+        if not self._make_room(size):
+            self.dropped += 1
+            return None
+
+        if size <= self.inline_max_bytes and self.memory_used + size <= self.memory_bytes:
+            item = SpooledMedia(url, content_type, size, data=data)
+            self.memory_used += size
+            self._items[key] = item
+            return item
+
+        # Count the bytes before the write so concurrent adds see them against the cap
+        self.disk_used += size
+        path = self._next_path()
+        written = self._writing[key] = asyncio.get_running_loop().create_future()
+        item = None
+        try:
+            await asyncio.to_thread(_write, path, data)
+            item = SpooledMedia(url, content_type, size, path=path)
+        except OSError as e:
+            self.dropped += 1
+            print(f"Media spool write failed: {e}")
+        finally:
+            del self._writing[key]
+            if item is None:
+                # Failed or cancelled: give the reserved bytes back
+                self.disk_used -= size
+            written.set_result(item)
+        if item is None:
+            return None
+        if self._tempdir is None:
+            # The spool was closed while the write ran
+            self.disk_used -= size
+            item.release()
+            return None
+        self.spilled += 1
+        self._items[key] = item
+        return item
+
+    def get(self, url: str) -> Optional[SpooledMedia]:
+        return self._items.get(media_key(url))
+
+    def items(self) -> List[SpooledMedia]:
+        return list(self._items.values())
+
+    def claim(self, item: SpooledMedia) -> SpooledMedia:
+        """Attach an item to an ad; claimed items are never evicted."""
+        item.claims += 1
+        return item
+
+    def done(self, item: SpooledMedia):
+        """One ad is finished with an item; it is released once no ad needs it."""
+        item.claims -= 1
+        if item.claims <= 0:
+            self.release(item)
+
+    def release(self, item: SpooledMedia):
+        """Free an item's memory or file (e.g. once it is uploaded)."""
+        if self._items.get(media_key(item.url)) is item:
+            del self._items[media_key(item.url)]
+        if item.in_memory:
+            self.memory_used -= item.size
+        elif item.path:
+            self.disk_used -= item.size
+        item.release()
+
+    def release_unclaimed(self):
+        """Free every item no ad was matched to."""
+        for item in [item for item in self._items.values() if not item.claimed]:
+            self.release(item)
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self._items),
+            "memory_bytes": self.memory_used,
+            "disk_bytes": self.disk_used,
+            "spilled": self.spilled,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        """Free everything and remove the temp directory."""
+        for item in list(self._items.values()):
+            self.release(item)
+        if self._tempdir:
+            shutil.rmtree(self._tempdir, ignore_errors=True)
+            self._tempdir = None
+
+    def _make_room(self, size: int) -> bool:
+        if size > self.max_bytes:
+            return False
+        if self.used + size <= self.max_bytes:
+            return True
+
+        wanted = self.wanted or frozenset()
+        candidates = [item for key, item in self._items.items() if not item.claimed and key not in wanted]
+        candidates += [item for key, item in self._items.items() if not item.claimed and key in wanted]
+        for item in candidates:
+            self.release(item)
+            self.evicted += 1
+            if self.used + size <= self.max_bytes:
+                return True
+        return False
+
+    def _next_path(self) -> str:
+        if self._tempdir is None:
+            self._tempdir = tempfile.mkdtemp(prefix="media-spool-", dir=self.directory)
+        self._sequence += 1
+        return os.path.join(self._tempdir, f"{self._sequence:06d}")
+
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
@@ -0,0 +1,262 @@
+"""
+Content-Addressed Media Store
+
+Brand scrape media is stored on R2 once per distinct file. The media_objects
+table records each object's SHA-256, R2 key, size and mime type, plus how many
+brand_scraped_ads media URLs point to it (ref_count). Re-scraping a brand, or
+several ads sharing one creative, reuses the stored object instead of
+uploading it again, and deleting a brand scrape only deletes objects that no
+other ad still refers to.
+
+Lookups happen before any transfer:
+- by source (media_key of the fbcdn URL): a creative stored by an earlier
+  scrape is reused without downloading it again
+- by content hash, for bytes already in hand: identical files are uploaded once,
+  under media/<sha256[:2]>/<sha256>-<nonce><ext>
+
+Streamed files (videos, spilled spool items) are hashed while they upload, to
+media/stream/<uuid><ext>; if the hash turns out to be known, the new object is
+deleted and the existing one reused.
+
+Every upload gets a key of its own. Deleting an unreferenced object (after
+its row is gone) can then never remove a later upload of the same file that
+a concurrent scrape stored in the meantime.
+
+Each lookup and ref-count change during a scrape commits in its own short
+transaction, on a worker thread, so row locks are never held across an
+upload and the event loop never waits on the database. The store remembers
+the references it took; settle() gives back those no saved ad ended up
+using (ads that failed to save, rolled-back commits, cancelled work).
+"""
+
+import asyncio
+import hashlib
+import threading
+import uuid
+from collections import Counter
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import MediaObject
+from app.services.graphql_capture import media_key
+from app.services.storage import r2_storage
+
+CONTENT_PREFIX = "media"
+
+MIME_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp', '.mp4': 'video/mp4'}
+
+T = TypeVar("T")
+
+
+def content_key(sha256: str, ext: str) -> str:
+    """A fresh key for one upload of this content (never reused by a later upload)."""
+    return f"{CONTENT_PREFIX}/{sha256[:2]}/{sha256}-{uuid.uuid4().hex[:16]}{ext}"
+
+
+def is_content_key(key: str) -> bool:
+    return key.startswith(f"{CONTENT_PREFIX}/")
+
+
+def media_kind(media: MediaObject) -> str:
+    """'video' or 'image', as stored in brand_scraped_ads.media_type."""
+    return "video" if (media.mime_type or "").startswith("video") else "image"
+
+
+class MediaStore:
+    """Deduplicated, reference-counted media uploads for one brand scrape."""
+
+    def __init__(self, db: Session, session_factory: Callable[[], Session] = None):
+        self.db = db
+        # Sessions for the scrape's own short transactions, on the same database as db
+        self.session_factory = session_factory or sessionmaker(bind=db.get_bind(), autoflush=False)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # R2 key -> references taken by this scrape (counted on the worker threads, once committed)
+        self._taken: Counter = Counter()
+        self._taken_lock = threading.Lock()
+
+        self.reused = 0
+        self.stored = 0
+        self.duplicates = 0  # streamed uploads that turned out to be stored already
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Serialise work on one source or hash, so concurrent ads share the first upload."""
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def url(self, media: MediaObject) -> str:
+        return r2_storage.public_url(media.r2_key)
+
+    async def find_source(self, url: str) -> Optional[MediaObject]:
+        """A stored object first downloaded from this URL, with one more reference counted."""
+        return await self._reuse_where(MediaObject.source_key == media_key(url))
+
+    async def put_bytes(self, data: bytes, ext: str, source_url: str = None) -> MediaObject:
+        """Store a file held in memory (skipping the upload if its content is known)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        async with self.lock(sha256):
+            media = await self._reuse_where(MediaObject.sha256 == sha256)
+            if media:
+                return media
+            key = content_key(sha256, ext)
+            await r2_storage.put(key, data, MIME_TYPES.get(ext, 'application/octet-stream'))
+            return await self._record(sha256, key, len(data), ext, source_url)
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], ext: str, source_url: str = None) -> MediaObject:
+        """Store a streamed file; a duplicate is detected once its hash is known."""
+        key = f"{CONTENT_PREFIX}/stream/{uuid.uuid4().hex}{ext}"
+        stored = await r2_storage.put_stream(key, chunks, MIME_TYPES.get(ext, 'application/octet-stream'))
+        async with self.lock(stored.sha256):
+            media = await self._reuse_where(MediaObject.sha256 == stored.sha256)
+            if media is None:
+                return await self._record(stored.sha256, key, stored.size, ext, source_url)
+            self.duplicates += 1
+            await r2_storage.delete([key])
+            return media
+
+    def release(self, urls: Iterable[str]) -> List[str]:
+        """
+        Drop one reference per media URL (caller commits).
+
+        Returns the R2 keys nothing refers to any more: unreferenced content
+        objects (whose rows are deleted) and media stored before the content
+        store existed.
+        """
+        keys = [r2_storage.key_from_url(url) for url in urls]
+        legacy = [key for key in keys if not is_content_key(key)]
+        counts = Counter(key for key in keys if is_content_key(key))
+        return legacy + _release_counts(self.db, counts)
+
+    async def settle(self, saved_urls: Iterable[str]) -> List[str]:
+        """
+        Give back the references this scrape took that no saved ad uses.
+
+        saved_urls are the media URLs of the ads that were committed. Objects
+        left with no references are deleted (row and R2 object); returns
+        their keys.
+        """
+        saved = Counter(r2_storage.key_from_url(url) for url in saved_urls)
+        with self._taken_lock:
+            unsaved = self._taken - saved
+            self._taken.clear()
+        if not unsaved:
+            return []
+        try:
+            orphaned = await asyncio.to_thread(self._run, lambda db: _release_counts(db, unsaved))
+        except SQLAlchemyError as e:
+            # Left counted: the objects are kept, never deleted too early
+            print(f"Error giving back unused media references: {e}")
+            return []
+        if orphaned:
+            for key in await r2_storage.delete(orphaned):
+                print(f"Error deleting unused media {key}")
+        print(f"Gave back {sum(unsaved.values())} unused media references, deleted {len(orphaned)} objects")
+        return orphaned
+
+    def stats(self) -> dict:
+        return {"reused": self.reused, "stored": self.stored, "duplicates": self.duplicates}
+
+    async def _record(self, sha256: str, key: str, size: int, ext: str, source_url: str = None) -> MediaObject:
+        """
+        The row for an object just uploaded under key.
+
+        If another worker stored the same content meanwhile, its object is
+        reused and this upload deleted.
+        """
+        while True:
+            media = await self._take(lambda db: self._create(db, sha256, key, size, ext, source_url))
+            if media is not None:
+                self.stored += 1
+                return media
+            # Stored by another worker at the same time (the hash is unique)
+            media = await self._reuse_where(MediaObject.sha256 == sha256)
+            if media is not None:
+                self.duplicates += 1
+                await r2_storage.delete([key])
+                return media
+            # That object was deleted before it could be reused: record this upload after all
+
+    async def _reuse_where(self, criterion) -> Optional[MediaObject]:
+        """The first object matching criterion, with one more reference counted."""
+        media = await self._take(lambda db: self._reuse(db, db.query(MediaObject).filter(criterion).first()))
+        if media is not None:
+            self.reused += 1
+        return media
+
+    async def _take(self, work: Callable[[Session], Optional[MediaObject]]) -> Optional[MediaObject]:
+        """Run a reference-taking change in its own transaction on a worker thread, committing straight away."""
+        return await asyncio.to_thread(self._run_take, work)
+
+    def _run_take(self, work: Callable[[Session], Optional[MediaObject]]) -> Optional[MediaObject]:
+        media = self._run(work)
+        if media is not None:
+            # Counted here rather than by the caller, so a cancelled caller can't lose the reference
+            with self._taken_lock:
+                self._taken[media.r2_key] += 1
+        return media
+
+    def _run(self, work: Callable[[Session], T]) -> T:
+        db = self.session_factory()
+        # Rows are handed back to the scrape after the session closes
+        db.expire_on_commit = False
+        try:
+            result = work(db)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _reuse(self, db: Session, media: Optional[MediaObject]) -> Optional[MediaObject]:
+        if media is None:
+            return None
+        updated = db.query(MediaObject).filter(MediaObject.id == media.id).update(
+            {MediaObject.ref_count: MediaObject.ref_count + 1}, synchronize_session=False
+        )
+        if not updated:
+            # Deleted by a brand scrape deletion in the meantime
+            return None
+        return media
+
+    def _create(
+        self, db: Session, sha256: str, key: str, size: int, ext: str, source_url: str = None
+    ) -> Optional[MediaObject]:
+        media = MediaObject(
+            sha256=sha256,
+            r2_key=key,
+            size=size,
+            mime_type=MIME_TYPES.get(ext),
+            source_key=media_key(source_url) if source_url else None,
+            ref_count=1,
+        )
+        db.add(media)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return None
+        return media
+
+
+def _release_counts(db: Session, counts: Counter) -> List[str]:
+    """Drop references by R2 key, deleting the rows left unreferenced; returns their keys."""
+    for key, count in counts.items():
+        db.query(MediaObject).filter(MediaObject.r2_key == key).update(
+            {MediaObject.ref_count: MediaObject.ref_count - count}, synchronize_session=False
+        )
+    orphaned = []
+    if counts:
+        unreferenced = (
+            db.query(MediaObject)
+            .filter(MediaObject.r2_key.in_(list(counts)), MediaObject.ref_count <= 0)
+            .with_for_update()
+            .all()
+        )
+        for media in unreferenced:
+            orphaned.append(media.r2_key)
+            db.delete(media)
+    return orphaned
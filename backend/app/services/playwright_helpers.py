@@ -0,0 +1,168 @@
+"""
+Playwright Helpers
+
+Shared page/context utilities for the Playwright-based Ads Library scrapers.
+"""
+
+from typing import Callable, Iterable, Optional
+
+# Request types aborted in text-only scrapes
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# Analytics and tracking endpoints aborted in text-only scrapes (URL substrings)
+BLOCKED_URL_PATTERNS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "pixel.facebook.com",
+    "facebook.com/tr",
+    "facebook.com/ajax/bz",
+    "facebook.com/ajax/bnzai",
+    "facebook.com/security/hsts-pixel",
+)
+
+
+class ResourceBlocker:
+    """
+    Route handler that aborts images, video, fonts and tracking requests.
+
+    Install it on a browser context for scrapes that only read ad text, so
+    scrolling the feed does not download every creative. Scrapers that need
+    the media (e.g. brand scrapes) simply don't install it.
+    """
+
+    def __init__(
+        self,
+        resource_types: Iterable[str] = BLOCKED_RESOURCE_TYPES,
+        url_patterns: Iterable[str] = BLOCKED_URL_PATTERNS
+    ):
+        self.resource_types = frozenset(resource_types)
+        self.url_patterns = tuple(url_patterns)
+        self.blocked = 0
+        self.allowed = 0
+
+    async def install(self, target):
+        """Route every request of a page or context through the blocker."""
+        await target.route("**/*", self._handle)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        return any(pattern in url for pattern in self.url_patterns)
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+
+# Adaptive scrolling defaults
+SCROLL_IDLE_LIMIT = 3          # Consecutive scrolls without new ads before stopping
+SCROLL_STEP_TIMEOUT_MS = 2500  # Max wait for new ads after each scroll
+SCROLL_POLL_MS = 250
+MAX_SCROLLS = 40
+
+# Counts distinct "Library ID: <n>" text nodes without reading innerText of containers
+COUNT_LIBRARY_IDS_JS = """
+() => {
+    const ids = new Set();
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    let node;
+    while ((node = walker.nextNode())) {
+        const match = node.nodeValue.match(/Library ID:\\s*(\\d+)/);
+        if (match) ids.add(match[1]);
+    }
+    return ids.size;
+}
+"""
+
+
+class ScrollStats:
+    """Outcome of one adaptive scroll run."""
+
+    def __init__(self):
+        self.scrolls = 0
+        self.wait_ms = 0
+        self.ads_seen = 0
+        self.stop_reason = None
+
+    def to_dict(self) -> dict:
+        return {
+            "scrolls": self.scrolls,
+            "wait_ms": self.wait_ms,
+            "ads_seen": self.ads_seen,
+            "stop_reason": self.stop_reason,
+        }
+
+    def __repr__(self) -> str:
+        return (f"{self.scrolls} scrolls, {self.wait_ms} ms waiting, "
+                f"{self.ads_seen} ads seen, stopped: {self.stop_reason}")
+
+
+async def scroll_until_settled(
+    page,
+    target_count: int,
+    max_scrolls: int = MAX_SCROLLS,
+    idle_limit: int = SCROLL_IDLE_LIMIT,
+    step_timeout_ms: int = SCROLL_STEP_TIMEOUT_MS,
+    poll_ms: int = SCROLL_POLL_MS,
+    count_js: str = COUNT_LIBRARY_IDS_JS,
+    count: Optional[Callable[[], int]] = None
+) -> ScrollStats:
+    """
+    Scroll the Ads Library feed until enough ads are loaded or it stops growing.
+
+    After each scroll the number of distinct ads is polled, moving on as soon
+    as it grows instead of sleeping a fixed time. Stops when target_count ads
+    are on the page, after idle_limit scrolls in a row add nothing, or after
+    max_scrolls.
+
+    Args:
+        page: Playwright page showing the feed
+        target_count: Number of distinct ads wanted on the page
+        count_js: JS function returning the current ad count
+        count: Python callable returning the ad count, used instead of count_js
+            (e.g. ads captured from network responses)
+    """
+    async def current_count() -> int:
+        return count() if count else await page.evaluate(count_js)
+
+    stats = ScrollStats()
+    ads = await current_count()
+    idle = 0
+
+    while True:
+        if ads >= target_count:
+            stats.stop_reason = "target"
+            break
+        if stats.scrolls >= max_scrolls:
+            stats.stop_reason = "max_scrolls"
+            break
+
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        stats.scrolls += 1
+
+        previous = ads
+        waited = 0
+        while waited < step_timeout_ms:
+            await page.wait_for_timeout(poll_ms)
+            waited += poll_ms
+            ads = await current_count()
+            if ads > previous:
+                break
+        stats.wait_ms += waited
+
+        if ads > previous:
+            idle = 0
+        else:
+            idle += 1
+            if idle >= idle_limit:
+                stats.stop_reason = "idle"
+                break
+
+    stats.ads_seen = ads
+    return stats
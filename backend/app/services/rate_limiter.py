@@ -1,72 +1,37 @@
-from datetime import datetime, timedelta
 from typing import Dict, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+
+from app.core.config import settings
+from app.services.graph_metering import GraphMeter, graph_meter
 
 
 class RateLimiter:
-    """Database-backed rolling window rate limiter for Facebook API calls"""
+    """Rolling window rate limiter for Facebook API calls, fed by the Graph API meter"""
 
-    def __init__(self, max_calls: int = 200, window_minutes: int = 59):
+    def __init__(self, max_calls: int = 200, window_minutes: int = 59, meter: GraphMeter = None):
         self.max_calls = max_calls
         self.window_minutes = window_minutes
+        self.meter = meter or graph_meter
 
-    def check_limit(self, db: Session) -> Tuple[bool, int, int]:
+    def check_limit(self, db: Session = None) -> Tuple[bool, int, int]:
         """
-        Check if rate limit allows another call by querying SearchLog.
+        Check if rate limit allows another call, from the meter's in-memory window count.
         Returns: (allowed, remaining, reset_seconds)
         """
-        from app.models import SearchLog
-
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=self.window_minutes)
-
-        # Count total API calls in the last 59 minutes from SearchLog
-        total_calls = db.query(func.sum(SearchLog.api_calls_made)).filter(
-            SearchLog.created_at >= window_start
-        ).scalar() or 0
-
+        total_calls = self.meter.calls_in_window()
         remaining = max(0, self.max_calls - total_calls)
 
-        # Calculate seconds until oldest call expires
-        reset_seconds = 0
-        if total_calls >= self.max_calls:
-            # Find the oldest call in the window
-            oldest_log = db.query(SearchLog).filter(
-                SearchLog.created_at >= window_start
-            ).order_by(SearchLog.created_at.asc()).first()
-
-            if oldest_log:
-                reset_time = oldest_log.created_at + timedelta(minutes=self.window_minutes)
-                reset_seconds = max(0, int((reset_time - now).total_seconds()))
+        # Seconds until the oldest call in the window expires
+        reset_seconds = self.meter.reset_in_seconds() if total_calls >= self.max_calls else 0
 
         allowed = total_calls < self.max_calls
         return allowed, remaining, reset_seconds
 
-    def get_usage_stats(self, db: Session) -> Dict:
-        """Get current usage statistics from SearchLog"""
-        from app.models import SearchLog
-
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=self.window_minutes)
-
-        # Count total API calls in the last 59 minutes
-        total_calls = db.query(func.sum(SearchLog.api_calls_made)).filter(
-            SearchLog.created_at >= window_start
-        ).scalar() or 0
-
+    def get_usage_stats(self, db: Session = None) -> Dict:
+        """Get current usage statistics from the meter"""
+        total_calls = self.meter.calls_in_window()
         remaining = max(0, self.max_calls - total_calls)
-
-        # Calculate reset time
-        reset_seconds = 0
-        if total_calls > 0:
-            oldest_log = db.query(SearchLog).filter(
-                SearchLog.created_at >= window_start
-            ).order_by(SearchLog.created_at.asc()).first()
-
-            if oldest_log:
-                reset_time = oldest_log.created_at + timedelta(minutes=self.window_minutes)
-                reset_seconds = max(0, int((reset_time - now).total_seconds()))
+        reset_seconds = self.meter.reset_in_seconds() if total_calls > 0 else 0
 
         return {
             "limit": self.max_calls,
@@ -78,4 +43,7 @@ class RateLimiter:
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter(max_calls=200, window_minutes=59)
+rate_limiter = RateLimiter(
+    max_calls=settings.GRAPH_RATE_LIMIT_CALLS,
+    window_minutes=settings.GRAPH_RATE_WINDOW_MINUTES
+)
@@ -0,0 +1,281 @@
+"""
+Raw Response Archive
+
+Keeps every raw Graph API ad and Playwright extraction record, so parser
+improvements can be applied to old data offline (see archive_reparse) instead
+of spending API budget re-fetching it.
+
+Records are NDJSON, one payload per line:
+
+    {"kind": "graph_search", "captured_at": "2026-10-17T14:30:12+00:00",
+     "context": {"query": "keto", "country": "US"}, "payload": {...}}
+
+zstd-compressed and partitioned by UTC day:
+
+    dt=2026-10-17/143012-web-1-4211-0003.ndjson.zst
+
+Records are buffered in memory and written by a background thread (like the
+Graph API meter), with RAW_ARCHIVE_BACKEND=local to RAW_ARCHIVE_DIR (an
+absolute path) or, with RAW_ARCHIVE_BACKEND=r2, to the R2 bucket under
+RAW_ARCHIVE_PREFIX. Archiving is off by default. While the store is failing,
+the buffer is capped at RAW_ARCHIVE_MAX_PENDING_BYTES and the oldest records
+are dropped.
+"""
+
+import io
+import json
+import os
+import socket
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+import zstandard
+
+from app.core.config import settings
+from app.services.storage import r2_storage
+
+# Record kinds
+GRAPH_SEARCH = "graph_search"  # ads_archive search results (FacebookAdsLibraryAPI)
+GRAPH_BRAND = "graph_brand"  # ads_archive page results (BrandScraperService)
+DOM_SEARCH = "dom_search"  # ad_extractor records from search scrapes
+DOM_LIBRARY = "dom_library"  # ad_extractor records from brand scrapes
+GRAPHQL_SEARCH = "graphql_search"  # Ads Library JSON ad nodes from search scrapes (graphql_capture)
+GRAPHQL_LIBRARY = "graphql_library"  # Ads Library JSON ad nodes from brand scrapes
+
+
+def partition(day: date) -> str:
+    return f"dt={day.isoformat()}"
+
+
+def days_between(since: date, until: date) -> List[date]:
+    return [since + timedelta(days=i) for i in range((until - since).days + 1)]
+
+
+def encode_records(lines: List[bytes], level: int = None) -> bytes:
+    """Compress NDJSON lines into one zstd frame."""
+    level = settings.RAW_ARCHIVE_ZSTD_LEVEL if level is None else level
+    return zstandard.ZstdCompressor(level=level).compress(b"".join(lines))
+
+
+def decode_records(data: bytes) -> Iterator[dict]:
+    """Read archive records back from zstd NDJSON (one or more frames)."""
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+    for line in io.TextIOWrapper(reader, encoding="utf-8"):
+        if line.strip():
+            yield json.loads(line)
+
+
+class LocalArchiveStore:
+    """Archive files under a local directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, key: str, data: bytes):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def list(self, prefix: str) -> List[str]:
+        directory = os.path.join(self.root, prefix)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(f"{prefix}/{name}" for name in os.listdir(directory) if name.endswith(".ndjson.zst"))
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+
+class R2ArchiveStore:
+    """Archive objects in the R2 bucket under a key prefix (through the shared R2 client)."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix.strip("/")
+
+    def put(self, key: str, data: bytes):
+        r2_storage.call(
+            "put_object",
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=f"{self.prefix}/{key}",
+            Body=data,
+            ContentType="application/zstd"
+        )
+
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        paginator = r2_storage.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=settings.R2_BUCKET_NAME, Prefix=f"{self.prefix}/{prefix}/"):
+            for obj in page.get("Contents") or []:
+                keys.append(obj["Key"][len(self.prefix) + 1:])
+        return sorted(keys)
+
+    def get(self, key: str) -> bytes:
+        return r2_storage.call("get_object", Bucket=settings.R2_BUCKET_NAME, Key=f"{self.prefix}/{key}")["Body"].read()
+
+
+def get_archive_store(backend: str = None):
+    """Store for RAW_ARCHIVE_BACKEND ("local" or "r2"); None when archiving is off."""
+    backend = (backend or settings.RAW_ARCHIVE_BACKEND).lower()
+    if backend == "r2":
+        if not r2_storage.enabled:
+            print("R2 not configured, raw archive disabled")
+            return None
+        return R2ArchiveStore(settings.RAW_ARCHIVE_PREFIX)
+    if backend == "local":
+        if not os.path.isabs(settings.RAW_ARCHIVE_DIR):
+            # Not relative to whatever directory the process happens to run in
+            print("RAW_ARCHIVE_DIR must be an absolute path, raw archive disabled")
+            return None
+        return LocalArchiveStore(settings.RAW_ARCHIVE_DIR)
+    return None
+
+
+class RawArchive:
+    """Buffers raw payloads and writes them as compressed daily partitions."""
+
+    def __init__(self, store=None, flush_seconds: float = None, flush_bytes: int = None, level: int = None, max_pending_bytes: int = None):
+        self.store = store
+        self.flush_seconds = flush_seconds or settings.RAW_ARCHIVE_FLUSH_SECONDS
+        self.flush_bytes = flush_bytes or settings.RAW_ARCHIVE_FLUSH_BYTES
+        self.max_pending_bytes = max_pending_bytes or settings.RAW_ARCHIVE_MAX_PENDING_BYTES
+        self.level = settings.RAW_ARCHIVE_ZSTD_LEVEL if level is None else level
+
+        self._pending: Dict[date, List[bytes]] = {}
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sequence = 0
+        self._file_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flush_stop = threading.Event()
+        self._flush_now = threading.Event()
+
+        self.recorded = 0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.flush_errors = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def record(self, kind: str, payloads: List[dict], **context):
+        """Archive raw payloads of one kind; context (query, page_id, ...) is stored with each."""
+        if not self.enabled or not payloads:
+            return
+        now = datetime.now(timezone.utc)
+        captured_at = now.isoformat()
+        lines = [
+            json.dumps({"kind": kind, "captured_at": captured_at, "context": context, "payload": payload}, default=str).encode("utf-8") + b"\n"
+            for payload in payloads
+        ]
+        size = sum(len(line) for line in lines)
+        with self._lock:
+            self._pending.setdefault(now.date(), []).extend(lines)
+            self._pending_bytes += size
+            self.recorded += len(lines)
+            self._trim()
+            full = self._pending_bytes >= self.flush_bytes
+        if full:
+            self._flush_now.set()
+
+    def flush(self):
+        """Write everything buffered, one file per day partition."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_bytes = 0
+
+            for day, lines in pending.items():
+                self._sequence += 1
+                key = f"{partition(day)}/{datetime.now(timezone.utc):%H%M%S}-{self._file_prefix}-{self._sequence:04d}.ndjson.zst"
+                try:
+                    data = encode_records(lines, self.level)
+                    self.store.put(key, data)
+                    self.files_written += 1
+                    self.bytes_written += len(data)
+                except Exception as e:
+                    self.flush_errors += 1
+                    print(f"Raw archive flush failed ({len(lines)} records): {e}")
+                    with self._lock:
+                        self._pending.setdefault(day, [])[:0] = lines
+                        self._pending_bytes += sum(len(line) for line in lines)
+                        self._trim()
+
+    def read(self, since: date, until: date) -> Iterator[dict]:
+        """Every archived record captured between two days (inclusive)."""
+        for day in days_between(since, until):
+            for key in self.store.list(partition(day)):
+                yield from decode_records(self.store.get(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(len(lines) for lines in self._pending.values())
+        return {
+            "enabled": self.enabled,
+            "pending_records": pending,
+            "recorded": self.recorded,
+            "files_written": self.files_written,
+            "bytes_written": self.bytes_written,
+            "flush_errors": self.flush_errors,
+            "dropped": self.dropped,
+        }
+
+    def start(self):
+        """Start the background flush thread."""
+        if not self.enabled or (self._flush_thread and self._flush_thread.is_alive()):
+            return
+        self._flush_stop.clear()
+        self._flush_thread = threading.Thread(target=self._run, name="raw-archive", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write anything still buffered."""
+        self._flush_stop.set()
+        self._flush_now.set()
+        if self._flush_thread:
+            self._flush_thread.join(timeout=self.flush_seconds + 5)
+            self._flush_thread = None
+        if self.enabled:
+            self.flush()
+
+    def _trim(self):
+        """Drop the oldest buffered records beyond max_pending_bytes (caller holds _lock)."""
+        excess = self._pending_bytes - self.max_pending_bytes
+        if excess <= 0:
+            return
+        dropped = 0
+        for day in sorted(self._pending):
+            lines = self._pending[day]
+            cut = 0
+            while cut < len(lines) and excess > 0:
+                excess -= len(lines[cut])
+                self._pending_bytes -= len(lines[cut])
+                cut += 1
+            del lines[:cut]
+            dropped += cut
+            if not lines:
+                del self._pending[day]
+            if excess <= 0:
+                break
+        self.dropped += dropped
+        print(f"Raw archive buffer full, dropped {dropped} oldest records")
+
+    def _run(self):
+        while not self._flush_stop.is_set():
+            self._flush_now.wait(self.flush_seconds)
+            self._flush_now.clear()
+            if self._flush_stop.is_set():
+                break
+            self.flush()
+
+
+# Singleton instance
+raw_archive = RawArchive(get_archive_store())
@@ -1,14 +1,21 @@
 from sqlalchemy.orm import Session
-from app.models import ScrapedAd, SavedSearch, FacebookPage
-from app.schemas.research import AdSearchRequest, ScrapedAdCreate
-from typing import Optional
+from app.models import ScrapedAd, SavedSearch, FacebookPage, SearchSession
+from app.schemas.research import AdSearchRequest, ScrapedAdCreate, SearchSessionCreate, SearchSessionPage, BatchSearchRequest
+from typing import AsyncIterator, List, Optional
+import asyncio
+import time
 import uuid
 import httpx
 import os
 import hashlib
-from datetime import datetime
+import weakref
+from datetime import datetime, timedelta, timezone
 from app.core.config import settings
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+# One in-flight page fetch per search session (per process)
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
 
 class ResearchService:
@@ -22,29 +29,17 @@ class ResearchService:
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
     async def search_and_save(self, request: AdSearchRequest):
-        """Execute search and save as SavedSearch with all ads"""
+        """Execute search and save as SavedSearch with all ads.
+
+        Ads are consumed page by page from the scraper, and each page is
+        deduped and flushed while the next one is still being fetched.
+        """
         from app.services.scraper import FacebookAdsLibraryAPI
 
         # Create scraper with db session for logging
         scraper = FacebookAdsLibraryAPI(db=self.db)
 
-        # Execute search
-        ads = await scraper.search_ads(
-            request.query,
-            request.limit,
-            request.country,
-            request.offset,
-            request.exclude_ids,
-            request.negative_keywords
-        )
-
-        # Track statistics
-        ads_requested = request.limit
-        ads_returned = len(ads)
-        ads_new = 0
-        ads_duplicate = 0
-
-        # Create SavedSearch
+        # Create SavedSearch up front so each page can be linked as it arrives
         saved_search = SavedSearch(
             query=request.query,
             country=request.country,
@@ -53,58 +48,108 @@ class ResearchService:
             search_type=request.search_type,
             schedule_config=request.schedule_config,
             is_active=True if request.search_type != 'one_time' else None,
-            ads_requested=ads_requested,
-            ads_returned=ads_returned
+            ads_requested=request.limit,
+            ads_returned=0
         )
         self.db.add(saved_search)
         self.db.flush()  # Get ID
 
-        # Save all ads linked to this search
-        saved_ads = []
-        seen_hashes = set()  # Track hashes in current batch to avoid duplicates
+        # Dedup state shared across pages
+        state = {
+            "saved_ads": [],
+            "seen_hashes": set(),  # Hashes in this search, to avoid duplicates
+            "existing_ads_by_hash": {},
+            "pages_by_name": {},
+            "ads_new": 0,
+            "ads_duplicate": 0,
+        }
+
+        # Execute search, upserting each page as it arrives
+        async for page in scraper.iter_ads(
+            request.query,
+            request.limit,
+            request.country,
+            request.offset,
+            request.exclude_ids,
+            request.negative_keywords,
+            id_first=request.id_first
+        ):
+            saved_search.ads_returned += len(page)
+            self._upsert_page(page, saved_search, state)
+
+        saved_ads = state["saved_ads"]
+
+        # Update total_ads count for all affected FacebookPages
+        page_ids = {ad.facebook_page_id for ad in saved_ads if ad.facebook_page_id}
+        for page_id in page_ids:
+            total = self.db.query(func.count(ScrapedAd.id)).filter(
+                ScrapedAd.facebook_page_id == page_id
+            ).scalar()
+            fb_page = self.db.query(FacebookPage).filter(FacebookPage.id == page_id).first()
+            if fb_page:
+                fb_page.total_ads = total
+
+        # Update saved_search with final statistics
+        saved_search.ads_new = state["ads_new"]
+        saved_search.ads_duplicate = state["ads_duplicate"]
 
-        # Pre-load all existing ads by content_hash to avoid repeated queries
-        all_hashes = [self.compute_content_hash(ad) for ad in ads if self.compute_content_hash(ad)]
-        existing_ads_by_hash = {}
-        if all_hashes:
-            existing_ads = self.db.query(ScrapedAd).filter(
-                ScrapedAd.content_hash.in_(all_hashes)
-            ).all()
-            existing_ads_by_hash = {ad.content_hash: ad for ad in existing_ads}
+        self.db.commit()
+        self.db.refresh(saved_search)
 
-        for ad_data in ads:
-            # Compute content hash
-            content_hash = self.compute_content_hash(ad_data)
+        return saved_search, saved_ads
 
-            # Skip if we've already seen this hash in this batch
+    def _upsert_page(self, ads: List[ScrapedAdCreate], saved_search: SavedSearch, state: dict):
+        """Dedupe one page of ads against the DB and earlier pages, then flush it."""
+        seen_hashes = state["seen_hashes"]
+        existing_ads_by_hash = state["existing_ads_by_hash"]
+        pages_by_name = state["pages_by_name"]
+
+        # Pre-load existing ads for this page by content_hash and external_id
+        page_hashes = [self.compute_content_hash(ad) for ad in ads]
+        new_hashes = [h for h in page_hashes if h and h not in existing_ads_by_hash]
+        if new_hashes:
+            for ad in self.db.query(ScrapedAd).filter(ScrapedAd.content_hash.in_(new_hashes)).all():
+                existing_ads_by_hash[ad.content_hash] = ad
+
+        external_ids = [ad.external_id for ad in ads if ad.external_id]
+        existing_ads_by_external_id = {}
+        if external_ids:
+            existing_ads_by_external_id = {
+                ad.external_id: ad
+                for ad in self.db.query(ScrapedAd).filter(ScrapedAd.external_id.in_(external_ids)).all()
+            }
+
+        page_saved = []
+        page_new = []
+        savepoint = self.db.begin_nested()
+        for ad_data, content_hash in zip(ads, page_hashes):
+            # Skip if we've already seen this hash in this search
             if content_hash and content_hash in seen_hashes:
-                ads_duplicate += 1
+                state["ads_duplicate"] += 1
                 continue
 
-            # Mark this hash as seen in this batch (do this early to prevent duplicates)
+            # Mark this hash as seen (do this early to prevent duplicates)
             if content_hash:
                 seen_hashes.add(content_hash)
 
-            # Check if ad exists by content_hash (from pre-loaded dict)
+            # Check if ad exists by content_hash, falling back to external_id
             existing = existing_ads_by_hash.get(content_hash) if content_hash else None
-
-            # Fallback: check by external_id if not found by hash
             if not existing and ad_data.external_id:
-                existing = self.db.query(ScrapedAd).filter(
-                    ScrapedAd.external_id == ad_data.external_id
-                ).first()
+                existing = existing_ads_by_external_id.get(ad_data.external_id)
 
             if existing:
                 # Update last_seen timestamp and increment seen_count
                 existing.last_seen = datetime.utcnow()
                 existing.seen_count = (existing.seen_count or 0) + 1
-                saved_ads.append(existing)
-                ads_duplicate += 1
-            else:
-                ads_new += 1
-                # Get or create FacebookPage
-                fb_page = None
-                if ad_data.brand_name:
+                page_saved.append(existing)
+                state["ads_duplicate"] += 1
+                continue
+
+            # Get or create FacebookPage
+            fb_page = None
+            if ad_data.brand_name:
+                fb_page = pages_by_name.get(ad_data.brand_name)
+                if not fb_page:
                     fb_page = self.db.query(FacebookPage).filter(
                         FacebookPage.page_name == ad_data.brand_name
                     ).first()
@@ -113,81 +158,237 @@ class ResearchService:
                         fb_page = FacebookPage(page_name=ad_data.brand_name, total_ads=0)
                         self.db.add(fb_page)
                         self.db.flush()
+                    pages_by_name[ad_data.brand_name] = fb_page
 
-                # Create ad with FacebookPage link and content_hash
-                ad_dict = ad_data.dict()
-                ad_dict['content_hash'] = content_hash
-                if fb_page:
-                    ad_dict['facebook_page_id'] = fb_page.id
+            # Create ad with FacebookPage link and content_hash
+            ad_dict = ad_data.dict()
+            ad_dict['content_hash'] = content_hash
+            if fb_page:
+                ad_dict['facebook_page_id'] = fb_page.id
 
-                db_ad = ScrapedAd(**ad_dict, search_id=saved_search.id)
-                self.db.add(db_ad)
-                saved_ads.append(db_ad)
+            db_ad = ScrapedAd(**ad_dict, search_id=saved_search.id)
+            self.db.add(db_ad)
+            page_saved.append(db_ad)
+            page_new.append(db_ad)
 
-                # Add to existing_ads_by_hash to prevent duplicates within this batch
-                if content_hash:
-                    existing_ads_by_hash[content_hash] = db_ad
+            # Add to existing_ads_by_hash to prevent duplicates within this search
+            if content_hash:
+                existing_ads_by_hash[content_hash] = db_ad
 
-        # Update total_ads count for all affected FacebookPages
         try:
-            self.db.flush()
-        except Exception as e:
-            # Handle duplicate content_hash errors gracefully
-            if 'duplicate key value violates unique constraint' in str(e) and 'content_hash' in str(e):
-                print(f"Duplicate content_hash error during flush, rolling back and retrying with existing ads")
-                self.db.rollback()
-
-                # Retry: for each ad in saved_ads that's new (not yet in DB),
-                # check if it now exists and update instead
-                saved_ads_clean = []
-                for ad in saved_ads:
-                    if ad.id and self.db.query(ScrapedAd).filter(ScrapedAd.id == ad.id).first():
-                        # Ad already exists in session/DB
-                        saved_ads_clean.append(ad)
-                    else:
-                        # Try to find existing by content_hash
-                        existing = self.db.query(ScrapedAd).filter(
-                            ScrapedAd.content_hash == ad.content_hash
-                        ).first()
-                        if existing:
-                            existing.last_seen = datetime.utcnow()
-                            existing.seen_count = (existing.seen_count or 0) + 1
-                            saved_ads_clean.append(existing)
-
-                saved_ads = saved_ads_clean
-                self.db.flush()
-            else:
+            savepoint.commit()
+            state["ads_new"] += len(page_new)
+        except IntegrityError as e:
+            # Handle duplicate content_hash errors gracefully (e.g. a concurrent search saved it first)
+            if 'content_hash' not in str(e):
                 raise
+            print(f"Duplicate content_hash error during flush, rolling back page and retrying with existing ads")
+            savepoint.rollback()
+            for db_ad in page_new:
+                existing_ads_by_hash.pop(db_ad.content_hash, None)
+            for fb_page in list(pages_by_name.values()):
+                if fb_page not in self.db:
+                    pages_by_name.pop(fb_page.page_name, None)
+
+            new_ids = {id(db_ad) for db_ad in page_new}
+            page_saved = [ad for ad in page_saved if id(ad) not in new_ids]
+            for existing in page_saved:
+                # Re-apply seen bumps that the rollback discarded
+                existing.last_seen = datetime.utcnow()
+                existing.seen_count = (existing.seen_count or 0) + 1
+            for db_ad in page_new:
+                existing = self.db.query(ScrapedAd).filter(
+                    ScrapedAd.content_hash == db_ad.content_hash
+                ).first()
+                if existing:
+                    existing.last_seen = datetime.utcnow()
+                    existing.seen_count = (existing.seen_count or 0) + 1
+                    existing_ads_by_hash[existing.content_hash] = existing
+                    page_saved.append(existing)
+                    state["ads_duplicate"] += 1
+            self.db.flush()
 
-        page_ids = {ad.facebook_page_id for ad in saved_ads if ad.facebook_page_id}
-        for page_id in page_ids:
-            total = self.db.query(func.count(ScrapedAd.id)).filter(
-                ScrapedAd.facebook_page_id == page_id
-            ).scalar()
-            fb_page = self.db.query(FacebookPage).filter(FacebookPage.id == page_id).first()
-            if fb_page:
-                fb_page.total_ads = total
-
-        # Update saved_search with final statistics
-        saved_search.ads_new = ads_new
-        saved_search.ads_duplicate = ads_duplicate
-
-        self.db.commit()
-        self.db.refresh(saved_search)
-
-        return saved_search, saved_ads
+        state["saved_ads"].extend(page_saved)
 
     async def search_ads_async(self, request: AdSearchRequest):
-        """Search without saving"""
+        """Search without saving (served from the search cache when possible)"""
         from app.services.scraper import scraper
-        return await scraper.search_ads(
+        from app.services.search_cache import search_cache, make_search_key
+
+        key = make_search_key(
+            request.query,
+            request.country,
+            request.offset,
+            request.negative_keywords,
+            request.limit,
+            request.exclude_ids
+        )
+        return await search_cache.get_or_fetch(key, lambda: scraper.search_ads(
             request.query,
             request.limit,
             request.country,
             request.offset,
             request.exclude_ids,
             request.negative_keywords
+        ))
+
+    @staticmethod
+    def batch_searches(request: BatchSearchRequest) -> List[tuple]:
+        """Distinct (query, country) pairs a batch request expands to."""
+        queries = dict.fromkeys(q.strip() for q in request.queries if q.strip())
+        countries = dict.fromkeys(c.strip().upper() for c in request.countries if c.strip())
+        return [(query, country) for query in queries for country in countries]
+
+    async def iter_batch_search(self, request: BatchSearchRequest) -> AsyncIterator[dict]:
+        """
+        Run every query x country search concurrently, yielding each result as it completes.
+
+        At most BATCH_SEARCH_CONCURRENCY searches run at once; each goes through
+        the search cache like /search. Ads already returned by an earlier
+        sub-result (same external_id or content hash) are dropped, so the
+        merged stream holds every unique ad once. Ends with a summary event.
+        """
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(max(1, settings.BATCH_SEARCH_CONCURRENCY))
+        combos = self.batch_searches(request)
+
+        async def run_search(query: str, country: str):
+            async with semaphore:
+                search_started = time.monotonic()
+                try:
+                    ads = await self.search_ads_async(AdSearchRequest(
+                        query=query,
+                        country=country,
+                        limit=request.limit,
+                        negative_keywords=request.negative_keywords
+                    ))
+                    return query, country, ads, None, time.monotonic() - search_started
+                except Exception as e:
+                    print(f"Batch search failed for '{query}' in {country}: {e}")
+                    return query, country, [], str(e), time.monotonic() - search_started
+
+        seen_ids = set()
+        seen_hashes = set()
+        unique_count = 0
+        failed_count = 0
+        tasks = [asyncio.ensure_future(run_search(query, country)) for query, country in combos]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                query, country, ads, error, elapsed = await next_done
+                if error:
+                    failed_count += 1
+                    yield {"type": "error", "query": query, "country": country, "error": error}
+                    continue
+
+                new_ads = []
+                for ad in ads:
+                    content_hash = self.compute_content_hash(ad)
+                    if (ad.external_id and ad.external_id in seen_ids) or content_hash in seen_hashes:
+                        continue
+                    if ad.external_id:
+                        seen_ids.add(ad.external_id)
+                    seen_hashes.add(content_hash)
+                    new_ads.append(ad.model_dump())
+
+                unique_count += len(new_ads)
+                yield {
+                    "type": "result",
+                    "query": query,
+                    "country": country,
+                    "ads": new_ads,
+                    "ads_returned": len(ads),
+                    "duplicates": len(ads) - len(new_ads),
+                    "elapsed_ms": round(elapsed * 1000)
+                }
+        finally:
+            # Client went away: stop searches that haven't finished
+            for task in tasks:
+                task.cancel()
+
+        yield {
+            "type": "summary",
+            "searches": len(combos),
+            "failed": failed_count,
+            "unique_ads": unique_count,
+            "elapsed_ms": round((time.monotonic() - started) * 1000)
+        }
+
+    def create_search_session(self, request: SearchSessionCreate) -> SearchSession:
+        """Start a server-side paginated search (expired sessions are cleaned up first)"""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.SEARCH_SESSION_TTL_HOURS)
+        self.db.query(SearchSession).filter(SearchSession.updated_at < cutoff).delete(synchronize_session=False)
+
+        session = SearchSession(
+            query=request.query,
+            country=request.country,
+            negative_keywords=request.negative_keywords if request.negative_keywords else None,
+            page_size=request.limit,
+            seen_ids=[]
         )
+        self.db.add(session)
+        self.db.commit()
+        self.db.refresh(session)
+        return session
+
+    async def next_search_session_page(self, session_id: str) -> Optional[SearchSessionPage]:
+        """
+        Fetch the next page of a search session.
+
+        Resumes from the stored Graph cursor and skips every ad the session
+        already served. Session state is only saved once the page is complete,
+        so a failed fetch can be retried from the same cursor.
+        """
+        from app.services.scraper import FacebookAdsLibraryAPI, PagingState
+
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = asyncio.Lock()
+
+        async with lock:
+            session = self.db.query(SearchSession).filter(SearchSession.id == session_id).first()
+            if not session:
+                return None
+
+            paging = PagingState(session.after_cursor, bool(session.exhausted), session.source)
+            seen_ids = set(session.seen_ids or [])
+            ads = []
+            if not paging.exhausted:
+                scraper = FacebookAdsLibraryAPI(db=self.db)
+                async for page in scraper.iter_ads(
+                    session.query,
+                    session.page_size,
+                    session.country,
+                    exclude_ids=seen_ids,
+                    negative_keywords=session.negative_keywords or [],
+                    paging=paging
+                ):
+                    ads.extend(page)
+
+            new_ids = [ad.external_id for ad in ads if ad.external_id and ad.external_id not in seen_ids]
+            session.seen_ids = (session.seen_ids or []) + new_ids
+            session.after_cursor = paging.after_cursor
+            session.exhausted = paging.exhausted
+            session.source = paging.source
+            session.pages_served = (session.pages_served or 0) + 1
+            session.ads_served = (session.ads_served or 0) + len(ads)
+            self.db.commit()
+
+            return SearchSessionPage(
+                session_id=session.id,
+                page=session.pages_served,
+                ads=[ad.model_dump() for ad in ads],
+                has_more=not session.exhausted,
+                ads_served=session.ads_served
+            )
+
+    def delete_search_session(self, session_id: str) -> bool:
+        """Delete a search session"""
+        session = self.db.query(SearchSession).filter(SearchSession.id == session_id).first()
+        if session:
+            self.db.delete(session)
+            self.db.commit()
+            return True
+        return False
 
     def get_saved_searches(self):
         """Get all saved searches"""
@@ -60,7 +60,8 @@ class SchedulerService:
                 negative_keywords=search.negative_keywords or [],
                 vertical_id=search.vertical_id,
                 limit=100,  # Default limit for scheduled searches
-                search_type=search.search_type
+                search_type=search.search_type,
+                id_first=True  # Re-runs mostly find ads already saved
             )
 
             # Execute search (this will create a new SavedSearch entry with ads)
@@ -10,13 +10,48 @@ Note: The API has limitations:
 - Access token required (from Facebook App)
 """
 
-import httpx
+import asyncio
+import math
 import os
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 from app.schemas.research import ScrapedAdCreate
+from app.core.config import settings
+from app.services.api_budget import api_budget
+from app.services.graph_pager import GraphCursorPager, MAX_PAGE_SIZE, fetch_ads_by_id
+from app.services.graph_shards import ShardedGraphFetcher, ShardCheckpoint, date_windows
+from app.services.graph_throttle import graph_throttle
+from app.services.http_clients import get_http_client, GRAPH
+from app.services.keyword_matcher import get_keyword_matcher
+from app.services.raw_archive import raw_archive, DOM_SEARCH, GRAPH_SEARCH, GRAPHQL_SEARCH
+from app.services.search_yield import search_yield
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+# Ads yielded per page by the Playwright fallback (the API yields one page per Graph call)
+PLAYWRIGHT_PAGE_SIZE = 50
+
+# Graph fields for a full ad, and the minimal fields for an ID-first listing
+API_AD_FIELDS = "id,ad_creative_bodies,ad_creative_link_titles,ad_creative_link_captions,ad_snapshot_url,page_name,impressions,spend,currency,publisher_platforms,ad_delivery_start_time,ad_delivery_stop_time"
+ID_FIRST_FIELDS = "id,page_name"
+
+API_SOURCE = "api"
+PLAYWRIGHT_SOURCE = "playwright"
+
+
+class PagingState:
+    """
+    Resumable position in an Ads Library result set (stored on a SearchSession).
+
+    The API path resumes from the Graph `after` cursor, so no upstream page is
+    fetched twice. The Playwright fallback has no cursor and relies on the
+    caller's excluded IDs instead.
+    """
+
+    def __init__(self, after_cursor: Optional[str] = None, exhausted: bool = False, source: Optional[str] = None):
+        self.after_cursor = after_cursor
+        self.exhausted = exhausted
+        self.source = source
+
 
 class FacebookAdsLibraryAPI:
     """Official Facebook Ads Library API client."""
@@ -26,10 +61,12 @@ class FacebookAdsLibraryAPI:
         self.access_token = os.getenv("FACEBOOK_ADS_LIBRARY_TOKEN") or os.getenv("VITE_FACEBOOK_ACCESS_TOKEN")
         self.db = db
 
-    async def search_ads(self, query: str, limit: int = 10, country: str = "US", offset: int = 0, exclude_ids: List[str] = None, negative_keywords: List[str] = None):
+    async def search_ads(self, query: str, limit: int = 10, country: str = "US", offset: int = 0, exclude_ids: List[str] = None, negative_keywords: List[str] = None, id_first: bool = False) -> List[ScrapedAdCreate]:
         """
         Search Facebook Ads Library using API or fallback to scraper.
 
+        Collects every page from iter_ads() into a single list.
+
         Args:
             query: Search term (brand name, keyword, etc.)
             limit: Maximum number of ads to return
@@ -37,45 +74,180 @@ class FacebookAdsLibraryAPI:
             offset: Number of "pages" to skip (controls scroll depth)
             exclude_ids: List of ad IDs to exclude (already fetched)
             negative_keywords: List of keywords to filter out from results
+            id_first: Fetch full fields only for ads not already saved
 
         Returns:
-            Tuple of (ads, metrics) where metrics is a dict with:
-            - total_ads_found: Total ads returned from API
-            - filtered_by_page_blacklist: Count filtered by page blacklist
-            - filtered_by_keyword_blacklist: Count filtered by keywords
-            - api_calls_made: Number of API calls
+            List of filtered ads, at most `limit` long
+        """
+        ads = []
+        async for page in self.iter_ads(query, limit, country, offset, exclude_ids, negative_keywords, id_first=id_first):
+            ads.extend(page)
+        return ads
+
+    async def iter_ads(self, query: str, limit: int = 10, country: str = "US", offset: int = 0, exclude_ids: List[str] = None, negative_keywords: List[str] = None, paging: PagingState = None, id_first: bool = False) -> AsyncIterator[List[ScrapedAdCreate]]:
+        """
+        Search Facebook Ads Library, yielding filtered ads page by page.
+
+        Uses the Graph API cursor when a token is available and falls back to
+        the Playwright scraper for the rest of the limit when the API fails or
+        comes back short. Ads already yielded are never yielded again.
+
+        Queries whose API yield has been low run both searches at once, and
+        queries the API keeps returning nothing for skip it (see search_yield).
+
+        Args are the same as search_ads(), plus:
+            paging: Resume from (and advance) this state instead of `offset`;
+                used by search sessions
+            id_first: List only ad IDs from the API and fetch full fields just
+                for ads not already saved (see _iter_api_search)
         """
         print(f"Searching Facebook Ads Library for '{query}' in {country} (offset={offset}, negative_keywords={negative_keywords})")
 
+        exclude_ids = set(exclude_ids or [])
+        negative_keywords = negative_keywords or []
+
+        if paging is not None:
+            async for page in self._iter_paged(query, limit, country, exclude_ids, negative_keywords, paging):
+                yield page
+            return
+
+        yielded_ids = set()
+        yielded_count = 0
+
+        use_api = bool(self.access_token)
+        if use_api and search_yield.is_blocked(query, country):
+            print(f"API has recently returned 0 ads for '{query}', going straight to Chromium scraper")
+            use_api = False
+        elif use_api and limit >= 100 and search_yield.predicts_low(query, country):
+            # Low-yield keyword: don't make the user wait for the API before starting Chromium
+            async for page in self._iter_hedged(query, limit, country, offset, exclude_ids, negative_keywords, id_first):
+                yield page
+            return
+
         # Try API first if token available
-        if self.access_token:
+        if use_api:
             try:
-                ads = await self._api_search(query, limit, country, offset, exclude_ids or [], negative_keywords or [])
+                async for page in self._iter_api_search(query, limit, country, offset, exclude_ids, negative_keywords, id_first=id_first):
+                    yielded_ids.update(ad.external_id for ad in page if ad.external_id)
+                    yielded_count += len(page)
+                    yield page
+                search_yield.record(query, country, yielded_count, limit)
 
                 # Fall back to Chromium if:
                 # 1. API returns 0 ads (completely blocked keyword)
                 # 2. API returns significantly fewer than requested (< 50% when limit >= 100)
                 #    This catches keywords like "semaglutide" that are severely limited
-                should_fallback = False
-                if len(ads) == 0:
+                if yielded_count == 0:
                     print(f"API returned 0 ads for '{query}', falling back to Chromium scraper")
-                    should_fallback = True
-                elif limit >= 100 and len(ads) < limit * 0.5:
-                    print(f"API returned only {len(ads)} ads (requested {limit}), falling back to Chromium for full results")
-                    should_fallback = True
+                elif limit >= 100 and yielded_count < limit * 0.5:
+                    print(f"API returned only {yielded_count} ads (requested {limit}), falling back to Chromium for full results")
+                else:
+                    return
+            except Exception as e:
+                print(f"API search failed: {e}, falling back to scraper")
 
-                if should_fallback:
-                    return await self._fallback_search(query, limit, country, offset, exclude_ids or [], negative_keywords or [])
+        # Fallback to scraper for whatever the API didn't cover
+        remaining = limit - yielded_count
+        if remaining <= 0:
+            return
+        async for page in self._iter_fallback_search(query, remaining, country, offset, exclude_ids | yielded_ids, negative_keywords):
+            yield page
+
+    async def _iter_hedged(self, query: str, limit: int, country: str, offset: int, exclude_ids: Set[str], negative_keywords: List[str], id_first: bool = False) -> AsyncIterator[List[ScrapedAdCreate]]:
+        """
+        Run the API and Chromium searches concurrently, streaming both.
 
-                return ads
+        Pages are yielded as either search produces them, deduped by ad ID,
+        until the limit is reached; then the other search is cancelled. The
+        API's yield is recorded however its search ended: the ads it returned
+        before being cancelled, or none if it failed.
+        """
+        print(f"API yield for '{query}' has been low, running API and Chromium searches together")
+
+        pages: asyncio.Queue = asyncio.Queue()
+        returned = {"API": 0, "Chromium": 0}
+        failed = set()
+
+        async def produce(name: str, source: AsyncIterator[List[ScrapedAdCreate]]):
+            try:
+                async for page in source:
+                    returned[name] += len(page)
+                    pages.put_nowait(page)
             except Exception as e:
-                print(f"API search failed: {e}, falling back to scraper")
+                print(f"Hedged {name} search failed: {e}")
+                failed.add(name)
+            finally:
+                await source.aclose()
+                pages.put_nowait(None)  # This search is finished
+
+        tasks = [
+            asyncio.ensure_future(produce("API", self._iter_api_search(query, limit, country, offset, exclude_ids, negative_keywords, id_first=id_first))),
+            asyncio.ensure_future(produce("Chromium", self._iter_fallback_search(query, limit, country, offset, exclude_ids, negative_keywords))),
+        ]
+
+        seen_ids = set()
+        yielded_count = 0
+        running = len(tasks)
+        try:
+            while running and yielded_count < limit:
+                page = await pages.get()
+                if page is None:
+                    running -= 1
+                    continue
+                fresh = []
+                for ad in page:
+                    if ad.external_id and ad.external_id in seen_ids:
+                        continue
+                    seen_ids.add(ad.external_id)
+                    fresh.append(ad)
+                fresh = fresh[:limit - yielded_count]
+                if fresh:
+                    yielded_count += len(fresh)
+                    yield fresh
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            search_yield.record(query, country, 0 if "API" in failed else returned["API"], limit)
+            print(f"Hedged search for '{query}': {yielded_count} ads ({returned['API']} returned by the API, {returned['Chromium']} by Chromium)")
+
+    async def _iter_paged(self, query: str, limit: int, country: str, exclude_ids: Set[str], negative_keywords: List[str], paging: PagingState) -> AsyncIterator[List[ScrapedAdCreate]]:
+        """Fetch the next page of a resumable search, advancing `paging`."""
+        if paging.exhausted:
+            return
 
-        # Fallback to scraper
-        return await self._fallback_search(query, limit, country, offset, exclude_ids or [], negative_keywords or [])
+        if paging.source is None and search_yield.is_blocked(query, country):
+            print(f"API has recently returned 0 ads for '{query}', starting session with Chromium scraper")
+        elif self.access_token and paging.source != PLAYWRIGHT_SOURCE:
+            first_page = paging.source is None
+            yielded_count = 0
+            try:
+                async for page in self._iter_api_search(query, limit, country, 0, exclude_ids, negative_keywords, paging=paging):
+                    yielded_count += len(page)
+                    yield page
+                paging.source = API_SOURCE
+                # Only a keyword the API blocks outright moves the session to Chromium
+                if yielded_count or not first_page or not paging.exhausted:
+                    return
+                print(f"API returned 0 ads for '{query}', continuing session with Chromium scraper")
+                paging.exhausted = False
+            except Exception as e:
+                if not first_page:
+                    # Cursor was not advanced past the failed page, so the client can retry
+                    raise
+                print(f"API search failed: {e}, continuing session with Chromium scraper")
+
+        paging.source = PLAYWRIGHT_SOURCE
+        paging.after_cursor = None
+        yielded_count = 0
+        async for page in self._iter_fallback_search(query, limit, country, 0, exclude_ids, negative_keywords):
+            yielded_count += len(page)
+            yield page
+        if yielded_count == 0:
+            paging.exhausted = True
 
     def _log_api_usage(self, query: str, api_calls: int, ads_returned: int, ads_saved: int):
-        """Log API usage to database"""
+        """Log API usage to database (saved with the caller's commit, once its search is complete)"""
         if not self.db:
             return
 
@@ -91,79 +263,111 @@ class FacebookAdsLibraryAPI:
             date=str(date.today())
         )
         self.db.add(log)
-        self.db.commit()
-
-    async def _api_search(self, query: str, limit: int, country: str, offset: int, exclude_ids: List[str], negative_keywords: List[str]) -> List[ScrapedAdCreate]:
-        """Search using official Facebook Ads Library API."""
-        ads = []
-        negative_keywords_lower = [kw.lower() for kw in negative_keywords]
-        total_api_calls = 0
-        total_ads_returned = 0
-        filtered_count = 0
-        parse_failed_count = 0
-        blacklist_filtered = 0
 
-        # Get blacklisted pages and keywords
+    def _load_blacklists(self) -> Tuple[Set[str], List[str]]:
+        """Get lowercased blacklisted page names and keywords from the blacklist snapshot."""
         blacklisted_pages = set()
         blacklisted_keywords = []
         if self.db:
-            from app.models import PageBlacklist, KeywordBlacklist
-            page_blacklist = self.db.query(PageBlacklist).all()
-            blacklisted_pages = {p.page_name.lower() for p in page_blacklist}
-
-            keyword_blacklist = self.db.query(KeywordBlacklist).all()
-            blacklisted_keywords = [k.keyword.lower() for k in keyword_blacklist]
+            from app.services.blacklist_snapshot import blacklists
+            snapshot = blacklists.get(self.db)
+            blacklisted_pages = snapshot.pages
+            blacklisted_keywords = list(snapshot.keywords)
 
             if blacklisted_pages:
                 print(f"Filtering {len(blacklisted_pages)} blacklisted pages")
             if blacklisted_keywords:
                 print(f"Filtering {len(blacklisted_keywords)} blacklisted keywords")
 
-        # Combine negative keywords from request with persistent blacklisted keywords
-        all_negative_keywords = negative_keywords_lower + blacklisted_keywords
-
-        async with httpx.AsyncClient() as client:
-            # Make multiple API calls if limit > 300
-            remaining = limit
-            after_cursor = str(offset) if offset > 0 else None
-
-            while remaining > 0:
-                batch_size = min(remaining, 300)  # API max is 300 per request
-                params = {
-                    "access_token": self.access_token,
-                    "ad_reached_countries": country,
-                    "search_terms": query,
-                    "ad_active_status": "ACTIVE",
-                    "limit": batch_size,
-                    "fields": "id,ad_creative_bodies,ad_creative_link_titles,ad_creative_link_captions,ad_snapshot_url,page_name,impressions,spend,currency,publisher_platforms,ad_delivery_start_time,ad_delivery_stop_time"
-                }
+        return blacklisted_pages, blacklisted_keywords
 
-                if after_cursor:
-                    params["after"] = after_cursor
+    async def _iter_api_search(self, query: str, limit: int, country: str, offset: int, exclude_ids: Set[str], negative_keywords: List[str], paging: PagingState = None, id_first: bool = False) -> AsyncIterator[List[ScrapedAdCreate]]:
+        """
+        Search using official Facebook Ads Library API, yielding one list per API page.
 
-                print(f"Calling API: {self.base_url} (batch {total_api_calls + 1}, requesting {batch_size} ads)")
-                response = await client.get(self.base_url, params=params)
-                response.raise_for_status()
+        With `paging`, starts from its cursor and keeps whole pages (the pager
+        requests at most `limit` ads upstream), recording the cursor after each
+        page so the next call resumes exactly where this one stopped.
 
-                data = response.json()
-                total_api_calls += 1
+        With `id_first` (and a database), pages list only ad IDs and page names;
+        ads already in scraped_ads are rebuilt from their rows and full fields
+        are fetched only for the rest, MAX_IDS_PER_REQUEST IDs per call.
+        """
+        kept_count = 0
+        filtered_count = 0
+        parse_failed_count = 0
+        blacklist_filtered = 0
+        known_count = 0
+        hydrated_count = 0
+        id_first = id_first and self.db is not None and paging is None
 
-                if not data.get("data"):
-                    print("No more ads returned from API")
-                    break
+        # Combine negative keywords from request with persistent blacklisted keywords
+        blacklisted_pages, blacklisted_keywords = self._load_blacklists()
+        keyword_matcher = get_keyword_matcher(negative_keywords, blacklisted_keywords)
+
+        # Claim the calls this search should need up front; pages beyond them
+        # (e.g. after heavy filtering) are reserved one at a time
+        reservation = await api_budget.reserve(max(1, math.ceil(limit / MAX_PAGE_SIZE)), owner="ads_library_search")
+
+        params = {
+            "access_token": self.access_token,
+            "ad_reached_countries": country,
+            "search_terms": query,
+            "ad_active_status": "ACTIVE",
+            "fields": ID_FIRST_FIELDS if id_first else API_AD_FIELDS
+        }
+        if paging is None and offset == 0 and limit >= settings.GRAPH_SHARD_MIN_LIMIT:
+            # Large pull: paginate date windows concurrently instead of one long cursor chain
+            pager = ShardedGraphFetcher(
+                get_http_client(GRAPH),
+                self.base_url,
+                params,
+                limit=limit,
+                checkpoints=[ShardCheckpoint(*window) for window in date_windows(settings.GRAPH_SHARD_LOOKBACK_DAYS, settings.GRAPH_SHARD_COUNT)],
+                concurrency=settings.GRAPH_SHARD_CONCURRENCY,
+                budget=api_budget,
+                reservation=reservation,
+                throttle=graph_throttle,
+            )
+        else:
+            # Pages are fetched ahead (via paging.cursors.after) while this loop
+            # parses and filters the previous page
+            pager = GraphCursorPager(
+                get_http_client(GRAPH),
+                self.base_url,
+                params=params,
+                limit=limit,
+                after=paging.after_cursor if paging else (str(offset) if offset > 0 else None),
+                lookahead=settings.GRAPH_PAGER_LOOKAHEAD,
+                budget=api_budget,
+                reservation=reservation,
+                throttle=graph_throttle,
+            )
 
+        try:
+            async for data in pager.pages():
                 batch_ads = data["data"]
-                total_ads_returned += len(batch_ads)
                 print(f"API returned {len(batch_ads)} ads in this batch")
 
+                if id_first:
+                    batch_ads, known, hydrated, blacklisted = await self._resolve_ids(batch_ads, exclude_ids, blacklisted_pages, reservation)
+                    known_count += known
+                    hydrated_count += hydrated
+                    blacklist_filtered += blacklisted
+
+                # Raw API ads (not rows rebuilt from the database), for offline re-parsing
+                raw_archive.record(GRAPH_SEARCH, [ad for ad in batch_ads if isinstance(ad, dict)], query=query, country=country)
+
+                page_ads = []
                 for ad_data in batch_ads:
-                    ad_id = ad_data.get("id")
+                    is_known = isinstance(ad_data, ScrapedAdCreate)
+                    ad_id = ad_data.external_id if is_known else ad_data.get("id")
 
                     # Skip excluded IDs
                     if ad_id in exclude_ids:
                         continue
 
-                    parsed_ad = self._parse_api_ad(ad_data)
+                    parsed_ad = ad_data if is_known else self._parse_api_ad(ad_data)
                     if not parsed_ad:
                         parse_failed_count += 1
                         continue
@@ -175,54 +379,107 @@ class FacebookAdsLibraryAPI:
                             continue
 
                     # Filter negative keywords (whole word matching)
-                    if all_negative_keywords:
-                        text_to_check = ' '.join([
-                            parsed_ad.brand_name or '',
-                            parsed_ad.headline or '',
-                            parsed_ad.ad_copy or '',
-                            parsed_ad.cta_text or ''
-                        ]).lower()
-
-                        # Use whole word matching with word boundaries
-                        import re
-                        should_filter = False
-                        for kw in all_negative_keywords:
-                            # Match whole word only (surrounded by word boundaries)
-                            pattern = r'\b' + re.escape(kw) + r'\b'
-                            if re.search(pattern, text_to_check):
-                                should_filter = True
-                                break
-
-                        if should_filter:
-                            filtered_count += 1
-                            continue
+                    if keyword_matcher and keyword_matcher.matches_ad(
+                        parsed_ad.brand_name, parsed_ad.headline, parsed_ad.ad_copy, parsed_ad.cta_text
+                    ):
+                        filtered_count += 1
+                        continue
 
-                    ads.append(parsed_ad)
+                    page_ads.append(parsed_ad)
 
-                    if len(ads) >= limit:
+                    if not paging and kept_count + len(page_ads) >= limit:
                         break
 
-                # Check if we have pagination cursor for next batch
-                if data.get("paging", {}).get("next"):
-                    after_cursor = data["paging"].get("cursors", {}).get("after")
-                else:
-                    print("No more pages available")
-                    break
+                if paging:
+                    # Recorded before yielding, in case the consumer stops here
+                    paging.after_cursor = pager.next_cursor
+                    paging.exhausted = pager.exhausted
 
-                remaining -= batch_size
+                if page_ads:
+                    kept_count += len(page_ads)
+                    yield page_ads
 
                 # Stop if we've collected enough ads
-                if len(ads) >= limit:
+                if kept_count >= limit:
                     break
+        finally:
+            await api_budget.settle(reservation)
 
-            print(f"Total: {total_api_calls} API calls, {total_ads_returned} ads returned, {blacklist_filtered} blacklisted, {filtered_count} filtered, {parse_failed_count} failed, kept {len(ads)} ads")
+            if paging:
+                paging.after_cursor = pager.next_cursor
+                paging.exhausted = pager.exhausted
 
-        # Log API usage
-        self._log_api_usage(query, total_api_calls, total_ads_returned, len(ads))
+            total_api_calls = pager.api_calls
+            total_ads_returned = pager.ads_returned
+            print(f"Total: {total_api_calls} API calls, {total_ads_returned} ads returned, {blacklist_filtered} blacklisted, {filtered_count} filtered, {parse_failed_count} failed, kept {kept_count} ads")
+            if id_first:
+                print(f"ID-first: {known_count} ads already saved, {hydrated_count} fetched in full")
 
-        return ads
+            # Log API usage
+            self._log_api_usage(query, total_api_calls, total_ads_returned, kept_count)
+
+    async def _resolve_ids(self, batch_ads: List[dict], exclude_ids: Set[str], blacklisted_pages: Set[str], reservation) -> Tuple[list, int, int, int]:
+        """
+        Turn an ID-first page ({id, page_name} dicts) into full ads, in order.
 
-    def _parse_api_ad(self, ad_data: dict) -> Optional[ScrapedAdCreate]:
+        Returns (ads, known, hydrated, blacklisted): `ads` holds ScrapedAdCreate
+        for ads already saved and full API dicts for the rest. Excluded and
+        blacklisted ads are dropped before anything is fetched.
+        """
+        candidates = []
+        blacklisted = 0
+        for ad_data in batch_ads:
+            ad_id = ad_data.get("id")
+            if not ad_id or ad_id in exclude_ids:
+                continue
+            if blacklisted_pages and (ad_data.get("page_name") or "").lower() in blacklisted_pages:
+                blacklisted += 1
+                continue
+            candidates.append(ad_id)
+
+        known_ads = self._known_ads(candidates)
+        unseen = [ad_id for ad_id in candidates if ad_id not in known_ads]
+        fetched = {}
+        if unseen:
+            fetched = await fetch_ads_by_id(
+                get_http_client(GRAPH),
+                unseen,
+                API_AD_FIELDS,
+                self.access_token,
+                budget=api_budget,
+                reservation=reservation,
+                throttle=graph_throttle,
+            )
+
+        ads = [known_ads.get(ad_id) or fetched.get(ad_id) for ad_id in candidates]
+        return [ad for ad in ads if ad is not None], len(known_ads), len(fetched), blacklisted
+
+    def _known_ads(self, ad_ids: List[str]) -> Dict[str, ScrapedAdCreate]:
+        """Saved ads for these external IDs, rebuilt from their scraped_ads rows."""
+        if not ad_ids:
+            return {}
+
+        from app.models import ScrapedAd
+
+        rows = self.db.query(ScrapedAd).filter(ScrapedAd.external_id.in_(ad_ids)).all()
+        return {
+            row.external_id: ScrapedAdCreate(
+                brand_name=row.brand_name,
+                headline=row.headline,
+                ad_copy=row.ad_copy,
+                cta_text=row.cta_text,
+                platform=row.platform or "facebook",
+                external_id=row.external_id,
+                ad_link=row.ad_link,
+                platforms=row.platforms,
+                start_date=row.start_date,
+                media_type=row.media_type
+            )
+            for row in rows
+        }
+
+    @staticmethod
+    def _parse_api_ad(ad_data: dict) -> Optional[ScrapedAdCreate]:
         """Parse an ad from the API response into our schema."""
 
         # Get ad copy from various fields
@@ -274,32 +531,33 @@ class FacebookAdsLibraryAPI:
             media_type=media_type
         )
 
-    async def _fallback_search(self, query: str, limit: int, country: str = "US", offset: int = 0, exclude_ids: List[str] = None, negative_keywords: List[str] = None) -> List[ScrapedAdCreate]:
+    async def _iter_fallback_search(self, query: str, limit: int, country: str = "US", offset: int = 0, exclude_ids: Set[str] = None, negative_keywords: List[str] = None) -> AsyncIterator[List[ScrapedAdCreate]]:
         """
         Scrape Facebook Ads Library using Playwright.
-        Extracts ad text data from DOM without media.
+        Reads ads from the page's own GraphQL/JSON responses (falling back to
+        the DOM extractor when none are captured), without downloading media,
+        yielding lists of at most PLAYWRIGHT_PAGE_SIZE ads.
 
         Args:
-            offset: Number of scroll batches to skip before collecting (for pagination)
+            offset: Number of result pages to scroll past before collecting (for pagination)
             exclude_ids: Ad IDs to skip (already fetched in previous requests)
             negative_keywords: Keywords to filter out from results
         """
         exclude_ids = set(exclude_ids or [])
-        negative_keywords = [kw.lower() for kw in (negative_keywords or [])]
-        from playwright.async_api import async_playwright
+        blacklisted_pages, blacklisted_keywords = self._load_blacklists()
+        keyword_matcher = get_keyword_matcher(negative_keywords, blacklisted_keywords)
+        from app.services.browser_pool import browser_pool
+        from app.services.ad_extractor import install_extractor, drain_ads, parse_search_record, EXTRACTED_COUNT_JS
+        from app.services.graphql_capture import AdsLibraryCapture, parse_search_node
+        from app.services.playwright_helpers import scroll_until_settled
         import urllib.parse
-        import json
-
-        ads = []
 
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-                )
+            # Text only: skip creatives, fonts and trackers while scrolling
+            async with browser_pool.context(block_resources=True) as context:
                 page = await context.new_page()
+                capture = AdsLibraryCapture()
+                capture.attach(page)
 
                 # Construct URL for Facebook Ads Library
                 params = {
@@ -321,226 +579,93 @@ class FacebookAdsLibraryAPI:
                     await page.wait_for_selector('text=Library ID:', timeout=15000)
                 except:
                     print("No ads found or page didn't load properly")
-                await page.wait_for_timeout(3000)
-
-                # Scroll to load more ads and trigger lazy loading
-                # offset controls how deep we scroll (for pagination)
-                base_scrolls = min(5, (limit // 3) + 1)
-                total_scrolls = base_scrolls + (offset * 3)  # Each "page" = 3 more scrolls
-
-                print(f"Scrolling {total_scrolls} times (base={base_scrolls}, offset={offset})")
-
-                for i in range(total_scrolls):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await page.wait_for_timeout(1500 if i < base_scrolls else 1000)  # Faster scrolls for pagination
-
-                # Give extra time for content to load
-                await page.wait_for_timeout(2000)
-
-                # Extract ads - text only, no media
-                ads_data = await page.evaluate("""
-                    () => {
-                        const results = [];
-                        const seenIds = new Set();
-
-                        // Find all divs that contain "Library ID:" text directly
-                        const libraryIdDivs = Array.from(document.querySelectorAll('div')).filter(div => {
-                            const text = div.innerText || '';
-                            return text.includes('Library ID:');
-                        });
-
-                        // For each Library ID div, find the closest parent that contains the full ad
-                        libraryIdDivs.forEach(idDiv => {
-                            // Walk up the DOM tree to find ad container
-                            let current = idDiv;
-                            let adContainer = null;
-
-                            // Go up max 10 levels to find container with Sponsored + content
-                            for (let i = 0; i < 10 && current; i++) {
-                                const text = current.innerText || '';
-
-                                // Look for container that has: Library ID + Sponsored (or substantial content)
-                                if (text.includes('Library ID:') &&
-                                    (text.includes('Sponsored') || text.length > 200)) {
-                                    // Make sure it's not too large (probably page container)
-                                    if (text.length < 15000) {
-                                        adContainer = current;
-                                    }
-                                }
-                                current = current.parentElement;
-                            }
-
-                            if (!adContainer) return;
-
-                            const text = adContainer.innerText || '';
-
-                            // Extract Library ID
-                            const idMatch = text.match(/Library ID:\\s*(\\d+)/);
-                            if (!idMatch) return;
-
-                            const libraryId = idMatch[1];
-                            if (seenIds.has(libraryId)) return;
-                            seenIds.add(libraryId);
-
-                            // Split text into lines (handle newlines properly)
-                            const lines = text.split(String.fromCharCode(10)).map(l => l.trim()).filter(l => l.length > 0 && l !== String.fromCharCode(8203));
-
-                            // Find brand name - line immediately before "Sponsored"
-                            let brandName = 'Unknown Brand';
-                            let sponsoredIndex = -1;
-
-                            for (let i = 0; i < lines.length; i++) {
-                                if (lines[i] === 'Sponsored') {
-                                    sponsoredIndex = i;
-                                    // Brand is usually the line right before "Sponsored"
-                                    if (i > 0) {
-                                        const candidate = lines[i - 1];
-                                        // Make sure it's not metadata
-                                        if (candidate && candidate.length > 3 && candidate.length < 150 &&
-                                            !candidate.includes('Library ID') &&
-                                            !candidate.includes('See ad details') &&
-                                            !candidate.includes('Menu') &&
-                                            candidate !== 'Active' &&
-                                            candidate !== 'Inactive') {
-                                            brandName = candidate;
-                                        }
-                                    }
-                                    break;
-                                }
-                            }
-
-                            // Extract ad content - everything after "Sponsored" until we hit metadata or URLs
-                            let adCopy = '';
-                            let headline = '';
-                            let captureContent = false;
-
-                            for (let i = sponsoredIndex + 1; i < lines.length; i++) {
-                                const line = lines[i];
-
-                                // Stop at certain patterns
-                                if (line.includes('Library ID') ||
-                                    line.includes('Started running') ||
-                                    line.includes('Platforms') ||
-                                    line.includes('http://') ||
-                                    line.includes('https://') ||
-                                    line.includes('HTTPS://') ||
-                                    line.includes('HTTP://')) {
-                                    break;
-                                }
-
-                                // Skip empty or very short lines
-                                if (line.length < 3) continue;
-
-                                // First substantive line is headline
-                                if (!headline && line.length >= 10) {
-                                    headline = line;
-                                    captureContent = true;
-                                    continue;
-                                }
-
-                                // Capture remaining lines as ad copy
-                                if (captureContent && line.length >= 10) {
-                                    adCopy += (adCopy ? '\\n' : '') + line;
-                                }
-                            }
-
-                            // Extract CTA button text
-                            let ctaText = null;
-                            adContainer.querySelectorAll('a, button').forEach(el => {
-                                const elText = (el.innerText || '').trim();
-                                const commonCTAs = ['learn more', 'shop now', 'sign up', 'get started',
-                                                   'download', 'subscribe', 'buy now', 'see more'];
-                                if (commonCTAs.some(cta => elText.toLowerCase().includes(cta))) {
-                                    ctaText = elText;
-                                }
-                            });
-
-                            // Extract platforms
-                            let platforms = [];
-                            if (text.includes('Facebook')) platforms.push('facebook');
-                            if (text.includes('Instagram')) platforms.push('instagram');
-                            if (text.includes('Messenger')) platforms.push('messenger');
-                            if (text.includes('Audience Network')) platforms.push('audience_network');
-
-                            // Extract start date
-                            let startDate = null;
-                            const dateMatch = text.match(/Started running on\\s+([A-Za-z]+\\s+\\d+,?\\s*\\d*)/);
-                            if (dateMatch) startDate = dateMatch[1];
-
-                            results.push({
-                                external_id: libraryId,
-                                brand_name: brandName,
-                                headline: headline || null,
-                                ad_copy: adCopy.substring(0, 500),
-                                cta_text: ctaText,
-                                platforms: platforms.length > 0 ? platforms : null,
-                                start_date: startDate
-                            });
-                        });
-
-                        return results;
-                    }
-                """)
-
-                print(f"Found {len(ads_data)} ads from DOM")
-
-                # Filter out excluded IDs
-                if exclude_ids:
-                    ads_data = [ad for ad in ads_data if ad.get('external_id') not in exclude_ids]
-                    print(f"After filtering excludes: {len(ads_data)} ads")
-
-                # Filter out negative keywords
-                if negative_keywords:
-                    filtered = []
-                    for ad_data in ads_data:
-                        # Check all text fields for negative keywords
-                        text_to_check = ' '.join([
-                            ad_data.get('brand_name', ''),
-                            ad_data.get('headline', ''),
-                            ad_data.get('ad_copy', ''),
-                            ad_data.get('cta_text', '')
-                        ]).lower()
-
-                        # Skip if any negative keyword found
-                        has_negative = any(kw in text_to_check for kw in negative_keywords)
-                        if not has_negative:
-                            filtered.append(ad_data)
-
-                    ads_data = filtered
-                    print(f"After filtering negative keywords: {len(ads_data)} ads")
-
-                # Build ScrapedAdCreate objects
-                for i, ad_data in enumerate(ads_data[:limit]):
-                    try:
-                        # Build FB library URL
-                        fb_library_url = f"https://www.facebook.com/ads/library/?id={ad_data['external_id']}"
-
-                        ad = ScrapedAdCreate(
-                            brand_name=ad_data.get('brand_name', 'Unknown Brand'),
-                            headline=ad_data.get('headline'),
-                            ad_copy=ad_data.get('ad_copy', 'No copy available')[:500],
-                            cta_text=ad_data.get('cta_text'),
-                            platform="facebook",
-                            external_id=ad_data['external_id'],
-                            ad_link=fb_library_url,
-                            platforms=ad_data.get('platforms'),
-                            start_date=ad_data.get('start_date')
-                        )
-                        ads.append(ad)
-
-                    except Exception as e:
-                        print(f"Error parsing ad: {e}")
-                        continue
 
-                await browser.close()
+                # Read ads from the page's JSON responses when it loaded any;
+                # otherwise extract each ad once as it renders
+                use_capture = len(capture) > 0
+                if not use_capture:
+                    print("No Ads Library JSON captured, extracting ads from the DOM")
+                    await install_extractor(page)
+
+                # Scroll until the feed holds enough ads or stops growing.
+                # Excluded ads and earlier offset pages are still rendered above.
+                target_count = limit * (offset + 1) + len(exclude_ids)
+                if use_capture:
+                    scroll_stats = await scroll_until_settled(page, target_count, count=capture.count)
+                else:
+                    scroll_stats = await scroll_until_settled(page, target_count, count_js=EXTRACTED_COUNT_JS)
+                print(f"Scrolled for {target_count} ads: {scroll_stats}")
+
+                async def parsed_batches():
+                    if use_capture:
+                        nodes = capture.records()
+                        raw_archive.record(GRAPHQL_SEARCH, nodes, query=query, country=country)
+                        yield [parse_search_node(node) for node in nodes]
+                        return
+                    async for records in drain_ads(page):
+                        raw_archive.record(DOM_SEARCH, records, query=query, country=country)
+                        yield [parse_search_record(record) for record in records]
+
+                found_count = 0
+                kept_count = 0
+                page_ads = []
+                async for batch in parsed_batches():
+                    found_count += len(batch)
+                    for ad_data in batch:
+
+                        # Filter excluded IDs, blacklisted pages and negative keywords (same rules as the API path)
+                        if ad_data['external_id'] in exclude_ids:
+                            continue
+                        if blacklisted_pages and (ad_data.get('brand_name') or '').lower() in blacklisted_pages:
+                            continue
+                        if keyword_matcher and keyword_matcher.matches_ad(
+                            ad_data.get('brand_name'), ad_data.get('headline'), ad_data.get('ad_copy'), ad_data.get('cta_text')
+                        ):
+                            continue
+
+                        try:
+                            # Build FB library URL
+                            fb_library_url = f"https://www.facebook.com/ads/library/?id={ad_data['external_id']}"
+
+                            ad = ScrapedAdCreate(
+                                brand_name=ad_data.get('brand_name', 'Unknown Brand'),
+                                headline=ad_data.get('headline'),
+                                ad_copy=(ad_data.get('ad_copy') or 'No copy available')[:500],
+                                cta_text=ad_data.get('cta_text'),
+                                platform="facebook",
+                                external_id=ad_data['external_id'],
+                                ad_link=fb_library_url,
+                                platforms=ad_data.get('platforms'),
+                                start_date=ad_data.get('start_date'),
+                                media_type=ad_data.get('media_type')
+                            )
+                            page_ads.append(ad)
+
+                        except Exception as e:
+                            print(f"Error parsing ad: {e}")
+                            continue
+
+                        if len(page_ads) >= PLAYWRIGHT_PAGE_SIZE or kept_count + len(page_ads) >= limit:
+                            kept_count += len(page_ads)
+                            yield page_ads
+                            page_ads = []
+                            if kept_count >= limit:
+                                break
+
+                    if kept_count >= limit:
+                        break
+
+                if page_ads:
+                    kept_count += len(page_ads)
+                    yield page_ads
+
+                print(f"Found {found_count} ads from {'JSON responses' if use_capture else 'DOM'}, kept {kept_count} after excludes and filters")
 
         except Exception as e:
             print(f"Scraper error: {e}")
             import traceback
             traceback.print_exc()
 
-        return ads
-
 
 # Singleton instance
 scraper = FacebookAdsLibraryAPI()
@@ -0,0 +1,159 @@
+"""
+Search Result Cache
+
+Short-lived in-memory cache for ad search results, so repeated searches (e.g.
+several researchers looking up "semaglutide" in US within a minute) share one
+upstream fetch instead of each spending Graph API budget or launching Chromium.
+
+- Entries expire after SEARCH_CACHE_TTL_SECONDS and the oldest are evicted
+  beyond SEARCH_CACHE_MAX_ENTRIES.
+- Identical requests that arrive while a fetch is running wait for it
+  (single-flight) rather than starting their own.
+- The whole cache is dropped when the page or keyword blacklist changes (in
+  any worker, see blacklist_snapshot), since cached results were filtered
+  against the old lists. Invalidation is handed to the event loop that serves
+  the cache, since blacklist changes arrive on the LISTEN thread.
+
+The cache is per process; each uvicorn worker keeps its own.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.core.config import settings
+from app.services.blacklist_snapshot import blacklists
+from app.services.keyword_matcher import normalize_keywords
+
+
+def make_search_key(
+    query: str,
+    country: str,
+    offset: int,
+    negative_keywords: Optional[Iterable[str]],
+    limit: int,
+    exclude_ids: Optional[Iterable[str]] = None
+) -> Tuple:
+    """
+    Normalised cache key for a search.
+
+    Query case and whitespace, country case and keyword order don't change the
+    results, so they don't change the key. Excluded IDs do, so they are folded
+    in as a digest to keep keys small.
+    """
+    exclude_digest = None
+    if exclude_ids:
+        joined = '\n'.join(sorted(set(exclude_ids)))
+        exclude_digest = hashlib.sha1(joined.encode('utf-8')).hexdigest()
+
+    return (
+        ' '.join(query.lower().split()),
+        (country or '').upper(),
+        offset,
+        normalize_keywords(negative_keywords),
+        limit,
+        exclude_digest,
+    )
+
+
+class SearchCache:
+    """TTL + LRU result cache with single-flight fetches."""
+
+    def __init__(self, ttl_seconds: int = None, max_entries: int = None):
+        self.ttl_seconds = settings.SEARCH_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or settings.SEARCH_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Hashable, Tuple[float, list]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[list]]) -> list:
+        """
+        Return cached results for key, or run fetch() once for all concurrent callers.
+
+        Failed fetches are not cached; every waiting caller gets the error.
+        """
+        self._loop = asyncio.get_running_loop()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, results = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(results)
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            generation = self._generation
+            task.add_done_callback(lambda done: self._on_fetched(key, done, generation))
+
+        # Shielded so one caller disconnecting doesn't cancel the shared fetch
+        return list(await asyncio.shield(task))
+
+    def invalidate(self):
+        """Drop every cached result (e.g. after a blacklist change)."""
+        self._entries.clear()
+        # Fetches already running were filtered against the old lists
+        self._generation += 1
+        self.invalidations += 1
+
+    def invalidate_threadsafe(self):
+        """invalidate() from any thread, run on the loop that serves the cache."""
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is None or loop is running:
+            self.invalidate()
+            return
+        try:
+            loop.call_soon_threadsafe(self.invalidate)
+        except RuntimeError:
+            # Loop already closed, nothing can be reading the cache
+            self.invalidate()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+    def _on_fetched(self, key: Hashable, task: asyncio.Future, generation: int):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.ttl_seconds <= 0 or generation != self._generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, list(task.result()))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Singleton instance
+search_cache = SearchCache()
+blacklists.add_listener(search_cache.invalidate_threadsafe)
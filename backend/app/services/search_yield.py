@@ -0,0 +1,103 @@
+"""
+Ads Library API Yield History
+
+Remembers, per query and country, what fraction of the requested ads the
+Graph API actually returned, so the scraper can decide up front how to search:
+
+- Yield predicted low: run the API and the Chromium scraper together (hedged)
+  instead of waiting for the API to finish before starting Chromium.
+- API returned nothing several times in a row: skip the API round trip and go
+  straight to Chromium.
+
+Yield is an exponentially weighted moving average, so a keyword whose API
+coverage changes is re-learned within a few searches. Entries expire after
+SEARCH_YIELD_TTL_HOURS, after which the API is tried again normally.
+
+The history is per process, like the search result cache.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from app.core.config import settings
+
+EWMA_ALPHA = 0.5  # Weight of the newest observation
+MAX_ENTRIES = 5000
+
+
+class _YieldEntry:
+    def __init__(self):
+        self.ewma = None
+        self.samples = 0
+        self.zero_streak = 0  # Consecutive searches where the API returned nothing
+        self.updated_at = 0.0
+
+
+class SearchYieldHistory:
+    """Per-query EWMA of Graph API yield (ads returned / ads requested)."""
+
+    def __init__(self, ttl_hours: float = None, low_yield: float = None, blocked_after: int = None):
+        self.ttl_seconds = (settings.SEARCH_YIELD_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self.low_yield = settings.SEARCH_HEDGE_YIELD_THRESHOLD if low_yield is None else low_yield
+        self.blocked_after = blocked_after or settings.SEARCH_SKIP_API_AFTER_ZERO
+        self._entries: "OrderedDict[Hashable, _YieldEntry]" = OrderedDict()
+
+    def record(self, query: str, country: str, returned: int, requested: int):
+        """Record one completed API search."""
+        if requested <= 0:
+            return
+        key = self._key(query, country)
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry):
+            entry = _YieldEntry()
+        ratio = min(1.0, returned / requested)
+        entry.ewma = ratio if entry.ewma is None else EWMA_ALPHA * ratio + (1 - EWMA_ALPHA) * entry.ewma
+        entry.samples += 1
+        entry.zero_streak = entry.zero_streak + 1 if returned == 0 else 0
+        entry.updated_at = time.monotonic()
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def predict(self, query: str, country: str) -> Optional[float]:
+        """Expected yield for the next API search, or None if unknown."""
+        entry = self._get(query, country)
+        return entry.ewma if entry else None
+
+    def predicts_low(self, query: str, country: str) -> bool:
+        predicted = self.predict(query, country)
+        return predicted is not None and predicted < self.low_yield
+
+    def is_blocked(self, query: str, country: str) -> bool:
+        """Whether the API has recently returned nothing for this query every time."""
+        entry = self._get(query, country)
+        return bool(entry) and entry.zero_streak >= self.blocked_after
+
+    def stats(self) -> dict:
+        return {
+            "queries": len(self._entries),
+            "low_yield": sum(1 for e in self._entries.values() if e.ewma is not None and e.ewma < self.low_yield),
+            "blocked": sum(1 for e in self._entries.values() if e.zero_streak >= self.blocked_after),
+        }
+
+    def _get(self, query: str, country: str) -> Optional[_YieldEntry]:
+        key = self._key(query, country)
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            del self._entries[key]
+            return None
+        return entry
+
+    def _expired(self, entry: _YieldEntry) -> bool:
+        return time.monotonic() - entry.updated_at > self.ttl_seconds
+
+    @staticmethod
+    def _key(query: str, country: str) -> tuple:
+        return ' '.join(query.lower().split()), (country or '').upper()
+
+
+# Singleton instance
+search_yield = SearchYieldHistory()
@@ -0,0 +1,269 @@
+"""
+R2 Object Storage
+
+One app-lifetime boto3 client for the R2 bucket (brand scrape media, user
+uploads, the raw payload archive). boto3 clients are thread-safe but their
+calls block, so async callers run them on a dedicated, bounded thread pool
+instead of on the event loop; an upload no longer stalls unrelated requests.
+
+The client's connection pool is sized to the thread pool, retries are handled
+by botocore (standard mode, R2_MAX_ATTEMPTS), and every operation's latency is
+recorded for /uploads/storage-stats.
+
+Large objects (videos, user uploads) go through put_stream, which reads an
+async byte iterator and uploads it as a multipart upload in R2_PART_SIZE parts,
+R2_PART_CONCURRENCY at a time, hashing it on the way. Memory per object stays
+at a few part buffers instead of the whole file.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+# S3 multipart parts (all but the last) must be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class ObjectTooLarge(Exception):
+    """A streamed object went past its size limit (the upload is aborted)."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Object exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+class StoredObject:
+    """Key, public URL, size and SHA-256 of an uploaded object."""
+
+    def __init__(self, key: str, url: str, size: int, sha256: str):
+        self.key = key
+        self.url = url
+        self.size = size
+        self.sha256 = sha256
+
+
+class OperationStats:
+    """Call count, errors and latency for one storage operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, failed: bool):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds * 1000 / self.calls, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+
+class R2Storage:
+    """Shared R2 client with a bounded executor for its blocking calls."""
+
+    def __init__(self, max_workers: int = None, max_attempts: int = None):
+        self.max_workers = max_workers or settings.R2_MAX_WORKERS
+        self.max_attempts = max_attempts or settings.R2_MAX_ATTEMPTS
+        self._client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, OperationStats] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.r2_enabled
+
+    @property
+    def client(self):
+        """The boto3 S3 client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        's3',
+                        endpoint_url=settings.r2_endpoint_url,
+                        aws_access_key_id=settings.R2_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
+                        region_name='auto',
+                        config=Config(
+                            # One connection per worker thread, plus room for sync callers
+                            max_pool_connections=self.max_workers + 2,
+                            retries={"total_max_attempts": self.max_attempts, "mode": "standard"},
+                            connect_timeout=settings.R2_CONNECT_TIMEOUT,
+                            read_timeout=settings.R2_READ_TIMEOUT,
+                        ),
+                    )
+        return self._client
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="r2")
+        return self._executor
+
+    def call(self, operation: str, **kwargs):
+        """Run a client operation (e.g. "put_object") in this thread, timing it."""
+        start = time.monotonic()
+        failed = True
+        try:
+            result = getattr(self.client, operation)(**kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._stats.setdefault(operation, OperationStats()).record(elapsed, failed)
+
+    async def run(self, operation: str, **kwargs):
+        """Run a client operation on the storage thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), partial(self.call, operation, **kwargs))
+
+    def public_url(self, key: str) -> str:
+        return f"{settings.R2_PUBLIC_URL}/{key}"
+
+    def key_from_url(self, url: str) -> str:
+        return url.replace(f"{settings.R2_PUBLIC_URL}/", "")
+
+    async def put(self, key: str, body: bytes, content_type: str) -> str:
+        """Upload an object; returns its public URL."""
+        await self.run("put_object", Bucket=settings.R2_BUCKET_NAME, Key=key, Body=body, ContentType=content_type)
+        return self.public_url(key)
+
+    async def put_stream(
+        self, key: str, chunks: AsyncIterator[bytes], content_type: str,
+        max_size: int = None, part_size: int = None
+    ) -> StoredObject:
+        """
+        Upload an object from an async byte iterator.
+
+        Objects that fit in one part are sent with a single put_object;
+        anything larger becomes a multipart upload, aborted if the stream
+        fails or grows past max_size (ObjectTooLarge).
+        """
+        part_size = max(part_size or settings.R2_PART_SIZE, MIN_PART_SIZE)
+        bucket = settings.R2_BUCKET_NAME
+        digest = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        upload_id = None
+        etags: Dict[int, str] = {}
+        tasks: List[asyncio.Task] = []
+        sending = set()  # Part numbers handed to the thread pool
+        # Parts buffered or in flight, so memory stays at a few parts
+        slots = asyncio.Semaphore(settings.R2_PART_CONCURRENCY)
+
+        async def send_part(number: int, body: bytes):
+            sending.add(number)
+            try:
+                response = await self.run(
+                    "upload_part", Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body
+                )
+                etags[number] = response["ETag"]
+            finally:
+                slots.release()
+
+        async def queue_part(body: bytes):
+            await slots.acquire()
+            for task in tasks:
+                if task.done() and task.exception():
+                    slots.release()
+                    raise task.exception()
+            tasks.append(asyncio.create_task(send_part(len(tasks) + 1, body)))
+
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise ObjectTooLarge(max_size)
+                digest.update(chunk)
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        response = await self.run("create_multipart_upload", Bucket=bucket, Key=key, ContentType=content_type)
+                        upload_id = response["UploadId"]
+                    await queue_part(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+
+            if upload_id is None:
+                await self.run("put_object", Bucket=bucket, Key=key, Body=bytes(buffer), ContentType=content_type)
+            else:
+                if buffer:
+                    await queue_part(bytes(buffer))
+                    buffer.clear()
+                await asyncio.gather(*tasks)
+                await self.run(
+                    "complete_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id,
+                    MultipartUpload={"Parts": [{"ETag": etags[n], "PartNumber": n} for n in sorted(etags)]},
+                )
+        except BaseException:
+            # A part already running on a storage thread can't be stopped, and
+            # an upload_part landing after the abort would leave a stray part:
+            # cancel parts not yet sent and wait for the rest
+            for number, task in enumerate(tasks, 1):
+                if number not in sending:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if upload_id is not None:
+                try:
+                    await self.run("abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id)
+                except Exception as e:
+                    print(f"R2 multipart abort failed for {key}: {e}")
+            raise
+
+        return StoredObject(key, self.public_url(key), size, digest.hexdigest())
+
+    async def delete(self, keys: Iterable[str]) -> List[str]:
+        """Delete objects in batches; returns the keys that could not be deleted."""
+        keys = list(dict.fromkeys(keys))
+        failed = []
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = await self.run(
+                    "delete_objects",
+                    Bucket=settings.R2_BUCKET_NAME,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+                failed.extend(error["Key"] for error in response.get("Errors") or [])
+            except Exception as e:
+                print(f"R2 delete error ({len(batch)} keys): {e}")
+                failed.extend(batch)
+        return failed
+
+    def stats(self) -> dict:
+        with self._lock:
+            operations = {name: op.to_dict() for name, op in self._stats.items()}
+        return {"enabled": self.enabled, "max_workers": self.max_workers, "operations": operations}
+
+    def shutdown(self):
+        """Wait for in-flight operations and stop the thread pool (app shutdown)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+# Singleton instance
+r2_storage = R2Storage()
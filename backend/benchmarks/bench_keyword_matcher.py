@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for negative keyword filtering.
+
+Compares the old per-keyword re.search loop from _api_search against the
+compiled KeywordMatcher, reporting filter cost per ad as the blacklist grows.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py [--ads 300] [--sizes 0,10,50,100,500,1000]
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.keyword_matcher import KeywordMatcher, get_keyword_matcher  # noqa: E402
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def build_ads(rng: random.Random, count: int) -> list:
+    """Ad text roughly the size of brand + headline + 500 char copy + CTA."""
+    return [' '.join(random_word(rng) for _ in range(90)) for _ in range(count)]
+
+
+def legacy_filter(texts: list, keywords: list) -> int:
+    """The original loop: one pattern build and re.search per keyword per ad."""
+    kept = 0
+    for text in texts:
+        should_filter = False
+        for kw in keywords:
+            pattern = r'\b' + re.escape(kw) + r'\b'
+            if re.search(pattern, text):
+                should_filter = True
+                break
+        if not should_filter:
+            kept += 1
+    return kept
+
+
+def matcher_filter(texts: list, keywords: list) -> int:
+    matcher = get_keyword_matcher(keywords)
+    return sum(1 for text in texts if not matcher.matches(text))
+
+
+def time_per_ad(func, texts: list, keywords: list, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(texts, keywords)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ads', type=int, default=300, help='Ads per page (API max is 300)')
+    parser.add_argument('--sizes', default='0,10,50,100,500,1000', help='Comma-separated blacklist sizes')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = build_ads(rng, args.ads)
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    print(f"{'keywords':>9} {'legacy us/ad':>14} {'matcher us/ad':>14} {'compile ms':>11} {'speedup':>9}")
+    for size in sizes:
+        keywords = sorted({random_word(rng) for _ in range(size)})
+
+        start = time.perf_counter()
+        KeywordMatcher(keywords)
+        compile_ms = (time.perf_counter() - start) * 1e3
+
+        legacy = time_per_ad(legacy_filter, texts, keywords, args.repeats)
+        compiled = time_per_ad(matcher_filter, texts, keywords, args.repeats)
+        speedup = legacy / compiled if compiled else float('inf')
+        print(f"{size:>9} {legacy:>14.2f} {compiled:>14.2f} {compile_ms:>11.2f} {speedup:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
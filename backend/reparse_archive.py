@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Re-parse archived raw Graph API / Playwright payloads into scraped_ads and
+brand_scraped_ads with the current parsers (no API calls).
+
+Usage:
+python reparse_archive.py --since 2026-09-01 --until 2026-09-30
+python reparse_archive.py --since 2026-09-01 --kind graph_search --dry-run
+"""
+
+import argparse
+import sys
+import os
+import time
+from datetime import date, timedelta
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.archive_reparse import PARSERS, apply_updates, collect_updates
+from app.services.raw_archive import get_archive_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, default=date.today() - timedelta(days=30), help="First day (YYYY-MM-DD, default: 30 days ago)")
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today(), help="Last day (YYYY-MM-DD, default: today)")
+    parser.add_argument("--kind", action="append", choices=sorted(PARSERS), help="Only these record kinds (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--backend", choices=["local", "r2"], default=None, help="Archive location (default: RAW_ARCHIVE_BACKEND)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without updating the database")
+    args = parser.parse_args()
+
+    store = get_archive_store(args.backend)
+    if store is None:
+        print("Raw archive is disabled (RAW_ARCHIVE_BACKEND)")
+        sys.exit(1)
+
+    started = time.monotonic()
+    updates, stats = collect_updates(store, args.since, args.until, args.kind, args.workers)
+    print(f"Parsed {stats['records']} records from {stats['files']} files in {time.monotonic() - started:.1f}s: {stats}")
+
+    if args.dry_run or not updates:
+        return
+
+    db = SessionLocal()
+    try:
+        updated = apply_updates(db, updates)
+        print(f"Updated rows: {updated} ({time.monotonic() - started:.1f}s total)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,10 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.database import SessionLocal
 from app.services.scheduler_service import SchedulerService
+from app.services.http_clients import http_clients
+from app.services.browser_pool import browser_pool
+from app.services.graph_metering import graph_meter
+from app.services.raw_archive import raw_archive
 import logging
 
 # Configure logging
@@ -31,6 +35,8 @@ logger = logging.getLogger(__name__)
 async def main():
     """Run scheduled searches"""
     db = SessionLocal()
+    graph_meter.start()
+    raw_archive.start()
     try:
         logger.info("Starting scheduled search job")
         scheduler = SchedulerService(db)
@@ -41,6 +47,10 @@ async def main():
         sys.exit(1)
     finally:
         db.close()
+        graph_meter.stop()
+        raw_archive.stop()
+        await browser_pool.close()
+        await http_clients.aclose()
 
 
 if __name__ == "__main__":
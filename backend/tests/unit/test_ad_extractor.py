@@ -0,0 +1,64 @@
+"""Ads Library DOM record parser unit tests."""
+from app.services.ad_extractor import parse_search_record, parse_library_record
+
+RECORD = {
+    "id": "123456",
+    "lines": [
+        "Active",
+        "Library ID: 123456",
+        "Started running on Mar 3, 2025",
+        "Platforms",
+        "See ad details",
+        "Acme Running Co",
+        "Sponsored",
+        "Run farther with CloudStride",
+        "Lightweight cushioning for every mile.",
+        "Free returns within 30 days.",
+        "ACME.COM",
+        "Shop Now",
+    ],
+    "ctas": ["See ad details", "Shop now"],
+    "page_id": "987",
+    "image_urls": ["https://scontent.xx.fbcdn.net/a.jpg"],
+    "has_video": False,
+}
+
+
+class TestParseSearchRecord:
+    """Tests for text-only search result parsing."""
+
+    def test_extracts_fields(self):
+        """Brand, headline, copy, CTA, platforms and start date are parsed."""
+        ad = parse_search_record(RECORD)
+        assert ad["external_id"] == "123456"
+        assert ad["brand_name"] == "Acme Running Co"
+        assert ad["headline"] == "Run farther with CloudStride"
+        assert ad["ad_copy"] == "Lightweight cushioning for every mile.\nFree returns within 30 days."
+        assert ad["cta_text"] == "Shop now"
+        assert ad["start_date"] == "Mar 3, 2025"
+        assert ad["platforms"] is None
+
+    def test_metadata_is_not_a_brand(self):
+        """A metadata line before "Sponsored" leaves the brand unknown."""
+        ad = parse_search_record({"id": "1", "lines": ["See ad details", "Sponsored", "Headline text here"]})
+        assert ad["brand_name"] == "Unknown Brand"
+        assert ad["headline"] == "Headline text here"
+
+
+class TestParseLibraryRecord:
+    """Tests for Graph API-shaped brand scrape records."""
+
+    def test_graph_shape(self):
+        """Records map onto the Graph API field names plus media hints."""
+        ad = parse_library_record(RECORD)
+        assert ad["id"] == "123456" and ad["page_id"] == "987"
+        assert ad["page_name"] == "Acme Running Co"
+        assert ad["ad_creative_link_titles"] == ["Run farther with CloudStride"]
+        assert ad["ad_creative_bodies"] == ["Lightweight cushioning for every mile."]
+        assert ad["ad_creative_link_captions"] == ["Shop Now"]
+        assert ad["_image_urls"] == RECORD["image_urls"]
+
+    def test_full_copy(self):
+        """full_copy joins every body line."""
+        ad = parse_library_record(RECORD, full_copy=True)
+        assert ad["ad_creative_bodies"] == ["Lightweight cushioning for every mile. Free returns within 30 days."]
@@ -0,0 +1,164 @@
+"""Graph API call budget unit tests."""
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.services.api_budget import ApiBudget, BudgetExceeded
+from app.services.graph_metering import GraphMeter
+from app.services.graph_pager import GraphCursorPager
+
+
+class _MemoryLedger:
+    """In-process stand-in for the Postgres reservation table."""
+
+    def __init__(self, spent_rows):
+        self.spent_rows = spent_rows
+        self.held = {}
+        self.reserve_calls = 0
+        self._lock = threading.Lock()  # Plays the advisory lock
+
+    def reserve(self, calls, max_calls, window_seconds, ttl_seconds, owner):
+        with self._lock:
+            self.reserve_calls += 1
+            spent = sum(row["calls"] for row in self.spent_rows)
+            if spent + sum(self.held.values()) + calls > max_calls:
+                return None
+            reservation_id = str(self.reserve_calls)
+            self.held[reservation_id] = calls
+            return reservation_id
+
+    def release(self, reservation_id):
+        self.held.pop(reservation_id, None)
+
+
+def _budget(max_calls):
+    rows = []
+    meter = GraphMeter(window_seconds=3600, writer=rows.extend, loader=lambda since: [])
+    ledger = _MemoryLedger(rows)
+    return ApiBudget(ledger=ledger, meter=meter, max_calls=max_calls, window_minutes=60), ledger, meter, rows
+
+
+class TestApiBudget:
+    """Tests for reserve / spend / settle."""
+
+    def test_concurrent_reservations_do_not_overshoot(self):
+        """Only as many reservations as fit in the budget succeed."""
+        budget, _, _, _ = _budget(max_calls=10)
+
+        async def try_reserve():
+            try:
+                return await budget.reserve(3)
+            except BudgetExceeded:
+                return None
+
+        async def run():
+            return await asyncio.gather(*(try_reserve() for _ in range(8)))
+
+        results = asyncio.run(run())
+        assert sum(1 for r in results if r) == 3
+        assert budget.rejected == 5
+
+    def test_spend_draws_from_reservation_then_reserves_singly(self):
+        """Calls beyond the reservation are reserved and settled one at a time."""
+        budget, ledger, meter, rows = _budget(max_calls=10)
+
+        async def run():
+            reservation = await budget.reserve(2)
+            for _ in range(3):
+                async with budget.spend(1, reservation):
+                    meter.record("graph_client")
+            await budget.settle(reservation)
+            return reservation
+
+        reservation = asyncio.run(run())
+        assert reservation.used == 2 and reservation.settled
+        assert ledger.reserve_calls == 2
+        assert ledger.held == {}
+        # Settling writes the calls made so other workers count them
+        assert sum(row["calls"] for row in rows) == 3
+
+    def test_pager_stops_when_budget_is_exhausted(self):
+        """A page the budget can't cover ends pagination with BudgetExceeded."""
+        budget, _, meter, _ = _budget(max_calls=1)
+
+        def handler(request):
+            meter.record("graph_client")
+            after = int(request.url.params.get("after", 0))
+            return httpx.Response(200, json={
+                "data": [{"id": str(after)}],
+                "paging": {"cursors": {"after": str(after + 1)}, "next": "more"},
+            })
+
+        async def run():
+            ids = []
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                pager = GraphCursorPager(client, "https://graph.example/ads_archive", {}, limit=10, page_size=1, budget=budget)
+                with pytest.raises(BudgetExceeded):
+                    async for page in pager.pages():
+                        ids.extend(ad["id"] for ad in page["data"])
+            return ids, pager
+
+        ids, pager = asyncio.run(run())
+        assert ids == ["0"] and pager.api_calls == 1
+
+    def test_brand_scrape_reserves_once(self, monkeypatch):
+        """A brand scrape claims its pages up front instead of one reservation per page."""
+        import app.services.brand_scraper as brand_module
+        from app.services.brand_scraper import BrandScraperService
+
+        budget, ledger, _, _ = _budget(max_calls=10)
+
+        def handler(request):
+            after = int(request.url.params.get("after", 0))
+            size = int(request.url.params["limit"])
+            return httpx.Response(200, json={
+                "data": [{"id": str(after + i)} for i in range(size)],
+                "paging": {"cursors": {"after": str(after + size)}, "next": "more"},
+            })
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "api_budget", budget)
+                service = BrandScraperService(None)
+                service.access_token = "token"
+                return await service._fetch_page_ads("123", limit=900)
+
+        ads = asyncio.run(run())
+        assert len(ads) == 900
+        assert ledger.reserve_calls == 1 and ledger.held == {}
+
+    def test_new_ads_only_on_every_path(self, monkeypatch):
+        """Stored ads are skipped on the Playwright paths, and a refused hydration doesn't re-list."""
+        import app.services.brand_scraper as brand_module
+        from app.services.brand_scraper import BrandScraperService
+
+        budget, ledger, _, _ = _budget(max_calls=1)
+        requests = []
+
+        def handler(request):
+            requests.append(request.url.params.get("fields"))
+            return httpx.Response(200, json={"data": [{"id": str(i), "page_name": "Brand"} for i in range(10)]})
+
+        async def playwright_scrape_ads(query, limit, is_search=True):
+            return [{"id": str(i)} for i in range(6)]
+
+        async def run(token):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "api_budget", budget)
+                service = BrandScraperService(None)
+                service.access_token = token
+                monkeypatch.setattr(service, "_known_external_ids", lambda page_id: {"0", "1"})
+                monkeypatch.setattr(service, "_playwright_scrape_ads", playwright_scrape_ads)
+                return await service._fetch_page_ads("123", limit=10, only_new=True)
+
+        # No token: straight to Playwright
+        assert [ad["id"] for ad in asyncio.run(run(None))] == ["2", "3", "4", "5"]
+        assert requests == []
+
+        # The listing fits the budget but the hydration doesn't: Playwright, not a full-field re-list
+        assert [ad["id"] for ad in asyncio.run(run("token"))] == ["2", "3", "4", "5"]
+        assert requests == ["id,page_name"] and ledger.held == {}
@@ -0,0 +1,56 @@
+"""Blacklist snapshot unit tests."""
+from app.services.blacklist_snapshot import BlacklistCache
+
+
+class TestBlacklistCache:
+    """Tests for the versioned in-memory blacklist snapshot."""
+
+    def make_cache(self, pages=("Spammy Page",), keywords=("Casino",), **kwargs):
+        loads = []
+
+        def loader(db):
+            loads.append(db)
+            return frozenset(p.lower() for p in pages), tuple(k.lower() for k in keywords)
+
+        return BlacklistCache(loader=loader, **kwargs), loads
+
+    def test_loads_once_until_invalidated(self):
+        """The tables are read once and then served from memory."""
+        cache, loads = self.make_cache(max_age_seconds=300)
+        snapshot = cache.get("db")
+        assert cache.get("db") is snapshot
+        assert snapshot.is_page_blacklisted("SPAMMY page")
+        assert snapshot.keywords == ("casino",)
+        assert len(loads) == 1
+
+        cache.invalidate()
+        assert cache.get("db").version == snapshot.version + 1
+        assert len(loads) == 2
+
+    def test_invalidation_notifies_listeners(self):
+        """Derived caches are dropped alongside the snapshot."""
+        cache, _ = self.make_cache()
+        calls = []
+        cache.add_listener(lambda: calls.append("search_cache"))
+        cache.invalidate()
+        assert calls == ["search_cache"]
+        assert cache.stats()["invalidations"] == 1
+
+    def test_snapshot_invalidated_mid_load_is_not_kept(self):
+        """A load racing a change is returned once but not cached."""
+        cache = None
+
+        def loader(db):
+            cache.invalidate()  # Another worker changed the blacklist meanwhile
+            return frozenset(), ()
+
+        cache = BlacklistCache(loader=loader, max_age_seconds=300)
+        cache.get("db")
+        assert cache.stats()["loaded"] is False
+
+    def test_expired_snapshot_is_reloaded(self):
+        """max_age bounds staleness if a notification is missed."""
+        cache, loads = self.make_cache(max_age_seconds=0)
+        cache.get("db")
+        cache.get("db")
+        assert len(loads) == 2
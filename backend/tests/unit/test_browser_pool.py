@@ -0,0 +1,48 @@
+"""Chromium browser pool unit tests."""
+import os
+import subprocess
+
+import pytest
+
+from app.services.browser_pool import BrowserPool, _descendants, _rss_mb
+
+
+class TestBrowserPool:
+    """Tests for pool bookkeeping that does not need a browser."""
+
+    def test_descendants_walks_process_tree(self):
+        """Grandchildren are included, unrelated processes are not."""
+        parents = {10: 1, 11: 10, 12: 11, 20: 1}
+
+        def children(pid):
+            return {child for child, parent in parents.items() if parent == pid}
+
+        assert _descendants(10, children) == {11, 12}
+        assert _descendants(12, children) == set()
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="requires /proc")
+    def test_descendants_of_a_real_process(self):
+        """Only the subtree below the given pid is walked."""
+        child = subprocess.Popen(["sleep", "5"])
+        try:
+            assert child.pid in _descendants(os.getpid())
+            assert _descendants(child.pid) == set()
+        finally:
+            child.kill()
+            child.wait()
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="requires /proc")
+    def test_rss_of_current_process(self):
+        """RSS is read from /proc and missing pids are ignored."""
+        rss = _rss_mb({os.getpid(), 999999999})
+        assert rss is not None and rss > 0
+        assert _rss_mb({999999999}) is None
+
+    def test_stats_before_start(self):
+        """An unstarted pool reports zero utilisation."""
+        pool = BrowserPool(size=3, max_pages=10, max_rss_mb=500)
+        stats = pool.stats()
+        assert stats["started"] is False
+        assert stats["size"] == 3
+        assert stats["utilisation"] == 0
+        assert stats["browsers"] == []
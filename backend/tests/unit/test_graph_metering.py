@@ -0,0 +1,126 @@
+"""Graph API call metering unit tests."""
+import time
+from datetime import datetime, timedelta, timezone
+
+import app.services.graph_metering as graph_metering
+from app.services.graph_metering import GraphMeter, SlidingWindowCounter
+from app.services.rate_limiter import RateLimiter
+
+
+class _FakeResponse:
+    def status(self):
+        return 200
+
+
+class _FakeSdkApi:
+    def __init__(self):
+        self.requests = 0
+
+    def call(self, method, path, params=None, headers=None, files=None, url_override=None, api_version=None):
+        self.requests += 1
+        return _FakeResponse()
+
+
+def _meter(store=None, **kwargs):
+    store = [] if store is None else store
+    meter = GraphMeter(
+        window_seconds=3600,
+        writer=store.extend,
+        loader=lambda since: [(row["created_at"].timestamp(), row["calls"]) for row in store],
+        **kwargs
+    )
+    return meter, store
+
+
+class TestSlidingWindowCounter:
+    """Tests for the bucketed window count."""
+
+    def test_calls_expire_with_the_window(self):
+        """Calls older than the window stop counting."""
+        now = time.time()
+        counter = SlidingWindowCounter(window_seconds=600, bucket_seconds=60)
+        counter.load([(now - 900, 5), (now - 300, 3), (now - 10, 2)])
+        assert counter.total(now) == 5
+        assert counter.total(now + 700) == 0
+
+    def test_reset_in_seconds(self):
+        """Reset time is when the oldest counted bucket leaves the window."""
+        counter = SlidingWindowCounter(window_seconds=600, bucket_seconds=60)
+        now = time.time()
+        counter.add(1, now)
+        assert 540 <= counter.reset_in_seconds(now) <= 660
+
+
+class TestGraphMeter:
+    """Tests for recording, batched writes and limiter integration."""
+
+    def test_records_are_written_in_batches(self):
+        """Recorded calls count immediately and are written on flush."""
+        meter, store = _meter()
+        for _ in range(3):
+            meter.record("graph_client", "https://graph.facebook.com/v21.0/ads_archive?q=x", 200)
+        assert meter.calls_in_window() == 3 and store == []
+
+        meter.flush()
+        assert len(store) == 3
+        assert store[0]["path"] == "/v21.0/ads_archive"
+        assert meter.calls_in_window() == 3
+
+    def test_flush_syncs_other_workers_calls(self):
+        """After a flush the count includes calls recorded by other processes."""
+        store = []
+        worker_a, _ = _meter(store)
+        worker_b, _ = _meter(store)
+        worker_a.record("graph_client", calls=4)
+        worker_a.flush()
+        worker_b.flush()
+        assert worker_b.calls_in_window() == 4
+
+    def test_sdk_calls_are_metered(self):
+        """Instrumented SDK calls are counted, batches once per request."""
+        meter, _ = _meter()
+        api = meter.instrument_sdk(_FakeSdkApi())
+        api.call("GET", ("act_1", "campaigns"))
+        api.call("POST", ("",), params={"batch": '[{"method": "GET"}, {"method": "GET"}]'})
+        assert api.requests == 2
+        assert meter.calls_in_window() == 3
+        assert meter.instrument_sdk(api) is api
+
+    def test_rate_limiter_reads_meter(self):
+        """The limiter blocks once metered calls reach the budget."""
+        meter, _ = _meter()
+        limiter = RateLimiter(max_calls=5, window_minutes=60, meter=meter)
+        meter.record("graph_client", calls=4)
+        assert limiter.check_limit()[:2] == (True, 1)
+        meter.record("facebook_sdk")
+        allowed, remaining, reset_seconds = limiter.check_limit()
+        assert not allowed and remaining == 0 and reset_seconds > 0
+
+    def test_failed_load_is_not_retried_on_every_call(self):
+        """After a failed load, lookups use local counts until the retry delay passes."""
+        loads = []
+
+        def loader(since):
+            loads.append(since)
+            raise RuntimeError("database down")
+
+        meter = GraphMeter(window_seconds=3600, writer=lambda batch: None, loader=loader)
+        meter.record("graph_client")
+        assert meter.calls_in_window() == 1
+        assert meter.calls_in_window() == 1
+        assert len(loads) == 1
+
+    def test_old_records_are_pruned_by_the_flush_thread(self, monkeypatch):
+        """Records past the retention period (never shorter than the window) are deleted on start and periodically."""
+        monkeypatch.setattr(graph_metering, "PRUNE_SECONDS", 0)
+        cutoffs = []
+        meter, _ = _meter(pruner=cutoffs.append, retention_seconds=60)
+        meter.flush()
+        assert cutoffs == []
+
+        meter.start()
+        meter.stop()
+
+        assert len(cutoffs) == 2
+        expected = datetime.now(timezone.utc) - timedelta(seconds=3600)
+        assert abs((cutoffs[0] - expected).total_seconds()) < 5
@@ -0,0 +1,94 @@
+"""Graph API cursor pager unit tests."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.graph_pager import GraphCursorPager
+
+URL = "https://graph.example/ads_archive"
+
+
+def _graph_client(pages, requests):
+    """Client serving `pages` in order, chained by cursor, recording each request."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(dict(request.url.params))
+        index = int(request.url.params.get("after", 0))
+        if index >= len(pages):
+            return httpx.Response(200, json={"data": []})
+        body = {"data": pages[index]}
+        if index + 1 < len(pages):
+            body["paging"] = {"cursors": {"after": str(index + 1)}, "next": "more"}
+        return httpx.Response(200, json=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestGraphCursorPager:
+    """Tests for prefetching Ads Library pagination."""
+
+    def test_follows_cursors_until_exhausted(self):
+        """All pages are yielded in order and accounted for."""
+        pages = [[{"id": "1"}, {"id": "2"}], [{"id": "3"}], [{"id": "4"}]]
+        requests = []
+
+        async def run():
+            async with _graph_client(pages, requests) as client:
+                pager = GraphCursorPager(client, URL, {"search_terms": "shoes"}, limit=900)
+                ids = [ad["id"] async for page in pager.pages() for ad in page["data"]]
+                return pager, ids
+
+        pager, ids = asyncio.run(run())
+        assert ids == ["1", "2", "3", "4"]
+        assert pager.api_calls == 3
+        assert pager.ads_returned == 4
+        assert pager.exhausted and pager.next_cursor is None
+        assert requests[0]["search_terms"] == "shoes" and "after" not in requests[0]
+        assert requests[1]["after"] == "1"
+
+    def test_prefetches_next_page_while_consumer_works(self):
+        """Page N+1 is requested before the consumer finishes page N."""
+        pages = [[{"id": "1"}], [{"id": "2"}], [{"id": "3"}]]
+        requests = []
+
+        async def run():
+            async with _graph_client(pages, requests) as client:
+                pager = GraphCursorPager(client, URL, {}, limit=900, lookahead=1)
+                seen_while_parsing = []
+                async for _ in pager.pages():
+                    await asyncio.sleep(0.01)  # Simulated parse time
+                    seen_while_parsing.append(len(requests))
+                return seen_while_parsing
+
+        seen = asyncio.run(run())
+        assert seen[0] >= 2
+
+    def test_stops_at_limit_and_keeps_cursor(self):
+        """No more than `limit` ads are requested; the resume cursor is kept."""
+        pages = [[{"id": str(i)} for i in range(3)]] * 5
+        requests = []
+
+        async def run():
+            async with _graph_client(pages, requests) as client:
+                pager = GraphCursorPager(client, URL, {}, limit=5, page_size=3)
+                async for _ in pager.pages():
+                    pass
+                return pager
+
+        pager = asyncio.run(run())
+        assert [r["limit"] for r in requests] == ["3", "2"]
+        assert pager.next_cursor == "2" and not pager.exhausted
+
+    def test_propagates_http_errors(self):
+        """A failed page surfaces to the consumer."""
+
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(500))
+            async with httpx.AsyncClient(transport=transport) as client:
+                pager = GraphCursorPager(client, URL, {}, limit=10)
+                async for _ in pager.pages():
+                    pass
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(run())
@@ -0,0 +1,121 @@
+"""Date-window sharded Graph fetch unit tests."""
+import asyncio
+from datetime import date
+
+import httpx
+
+from app.services.graph_shards import ShardCheckpoint, ShardedGraphFetcher, date_windows
+
+URL = "https://graph.example/ads_archive"
+
+
+def _shard_client(ads_by_window, requests, fail_once=None):
+    """Client serving one-ad pages per window (keyed by date max), chained by cursor."""
+    failed = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        window = request.url.params["ad_delivery_date_max"]
+        index = int(request.url.params.get("after", 0))
+        requests.append((window, index))
+        if (window, index) == fail_once and fail_once not in failed:
+            failed.add(fail_once)
+            return httpx.Response(500)
+        ads = ads_by_window[window]
+        body = {"data": [{"id": ads[index]}]}
+        if index + 1 < len(ads):
+            body["paging"] = {"cursors": {"after": str(index + 1)}, "next": "more"}
+        return httpx.Response(200, json=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestDateWindows:
+    """Tests for splitting the lookback period."""
+
+    def test_windows_are_contiguous_newest_first(self):
+        """Windows cover the period without gaps; the oldest is open-ended."""
+        windows = date_windows(30, 3, today=date(2025, 6, 30))
+        assert windows == [
+            ("2025-06-21", "2025-06-30"),
+            ("2025-06-11", "2025-06-20"),
+            (None, "2025-06-10"),
+        ]
+
+
+class TestShardedGraphFetcher:
+    """Tests for concurrent date-window pagination."""
+
+    def _checkpoints(self):
+        return [ShardCheckpoint("2025-06-21", "2025-06-30"), ShardCheckpoint(None, "2025-06-20")]
+
+    def test_merges_and_dedupes_shards(self):
+        """Ads from every window are returned once, even if delivered in several."""
+        requests = []
+        ads_by_window = {"2025-06-30": ["1", "2", "3"], "2025-06-20": ["3", "4"]}
+
+        async def run():
+            async with _shard_client(ads_by_window, requests) as client:
+                fetcher = ShardedGraphFetcher(client, URL, {}, limit=100, checkpoints=self._checkpoints(), page_size=1)
+                ids = [ad["id"] async for page in fetcher.pages() for ad in page["data"]]
+                return fetcher, ids
+
+        fetcher, ids = asyncio.run(run())
+        assert sorted(ids) == ["1", "2", "3", "4"]
+        assert fetcher.duplicates == 1 and fetcher.exhausted
+        assert fetcher.api_calls == 5
+
+    def test_failed_shard_resumes_from_checkpoint(self):
+        """A shard that errors mid-way retries from its last cursor."""
+        requests = []
+        ads_by_window = {"2025-06-30": ["1", "2", "3"], "2025-06-20": ["4"]}
+
+        async def run():
+            async with _shard_client(ads_by_window, requests, fail_once=("2025-06-30", 2)) as client:
+                fetcher = ShardedGraphFetcher(client, URL, {}, limit=100, checkpoints=self._checkpoints(), page_size=1)
+                ids = [ad["id"] async for page in fetcher.pages() for ad in page["data"]]
+                return fetcher, ids
+
+        fetcher, ids = asyncio.run(run())
+        assert sorted(ids) == ["1", "2", "3", "4"]
+        newest = [index for window, index in requests if window == "2025-06-30"]
+        assert newest == [0, 1, 2, 2]
+        assert fetcher.checkpoints[0].attempts == 2 and fetcher.checkpoints[0].done
+
+    def test_shards_share_the_limit(self):
+        """Together the shards request only `limit` ads, in as many calls as one cursor chain."""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            window = request.url.params["ad_delivery_date_max"]
+            index = int(request.url.params.get("after", 0))
+            size = int(request.url.params["limit"])
+            requests.append(size)
+            ads = [{"id": f"{window}-{index + i}"} for i in range(size)]
+            return httpx.Response(200, json={"data": ads, "paging": {"cursors": {"after": str(index + size)}, "next": "more"}})
+
+        checkpoints = [ShardCheckpoint(*window) for window in date_windows(80, 8, today=date(2025, 6, 30))]
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                fetcher = ShardedGraphFetcher(client, URL, {}, limit=1000, checkpoints=checkpoints, concurrency=4)
+                ids = [ad["id"] async for page in fetcher.pages() for ad in page["data"]]
+                return fetcher, ids
+
+        fetcher, ids = asyncio.run(run())
+        assert len(ids) == 1000 and len(set(ids)) == 1000
+        assert sorted(requests) == [100, 300, 300, 300]
+        assert fetcher.api_calls == 4
+
+    def test_duplicates_are_made_up_by_further_pages(self):
+        """Ads dropped as duplicates are requested again, up to the limit."""
+        requests = []
+        ads_by_window = {"2025-06-30": ["1", "2", "3"], "2025-06-20": ["1", "2", "4", "5"]}
+
+        async def run():
+            async with _shard_client(ads_by_window, requests) as client:
+                fetcher = ShardedGraphFetcher(client, URL, {}, limit=4, checkpoints=self._checkpoints(), page_size=1)
+                ids = [ad["id"] async for page in fetcher.pages() for ad in page["data"]]
+                return fetcher, ids
+
+        fetcher, ids = asyncio.run(run())
+        assert len(ids) == 4 and len(set(ids)) == 4
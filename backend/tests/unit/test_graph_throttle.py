@@ -0,0 +1,140 @@
+"""Graph API adaptive throttle unit tests."""
+import asyncio
+import json
+
+import httpx
+
+from app.services.graph_throttle import GraphThrottle, parse_usage_headers
+
+URL = "https://graph.example/ads_archive"
+
+
+def _throttle(sleeps):
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    return GraphThrottle(
+        start_pct=75, max_delay_seconds=20, retry_attempts=3,
+        retry_base_seconds=1, retry_max_seconds=30, sleep=fake_sleep
+    )
+
+
+def _client(responses, seen):
+    def handler(request):
+        seen.append(request)
+        return responses.pop(0)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestParseUsageHeaders:
+    """Tests for reading Facebook's usage headers."""
+
+    def test_pressure_is_highest_usage(self):
+        """App, business use case and ad account usage all count."""
+        reading = parse_usage_headers({
+            "x-app-usage": json.dumps({"call_count": 40, "total_cputime": 12, "total_time": 30}),
+            "x-business-use-case-usage": json.dumps({
+                "123": [{"type": "ads_archive", "call_count": 88, "total_cputime": 5, "total_time": 9, "estimated_time_to_regain_access": 2}]
+            }),
+        })
+        assert reading["pressure"] == 0.88
+        assert reading["regain_seconds"] == 120
+        assert reading["usage"]["app.call_count"] == 40.0
+
+    def test_missing_or_malformed_headers(self):
+        """Responses without usable headers leave pressure alone."""
+        assert parse_usage_headers({}) is None
+        assert parse_usage_headers({"x-app-usage": "not json"}) is None
+
+
+class TestGraphThrottle:
+    """Tests for request spacing and retries."""
+
+    def test_interval_ramps_with_pressure(self):
+        """No delay below the start threshold, the max delay at 100%."""
+        throttle = _throttle([])
+        for pct, expected in ((50, 0.0), (75, 0.0), (100, 20.0)):
+            throttle.observe(httpx.Response(200, headers={"x-app-usage": json.dumps({"call_count": pct})}))
+            assert throttle.interval() == expected
+        throttle.observe(httpx.Response(200, headers={"x-app-usage": json.dumps({"call_count": 90})}))
+        assert 0 < throttle.interval() < 20
+
+    def test_concurrent_requests_are_spaced(self):
+        """Requests queue up one interval apart instead of sleeping in lockstep."""
+        sleeps = []
+        throttle = _throttle(sleeps)
+        throttle.observe(httpx.Response(200, headers={"x-app-usage": json.dumps({"call_count": 100})}))
+
+        async def run():
+            await asyncio.gather(*(throttle.wait_turn() for _ in range(3)))
+
+        asyncio.run(run())
+        assert len(sleeps) == 2
+        assert round(sleeps[0]) == 20 and round(sleeps[1]) == 40
+
+    def test_retries_transient_errors(self):
+        """5xx and rate-limit codes are retried with backoff."""
+        sleeps, seen = [], []
+        throttle = _throttle(sleeps)
+        responses = [
+            httpx.Response(503),
+            httpx.Response(400, json={"error": {"code": 17, "message": "User request limit reached"}}),
+            httpx.Response(200, json={"data": []}),
+        ]
+
+        async def run():
+            async with _client(responses, seen) as client:
+                return await throttle.get(client, URL)
+
+        response = asyncio.run(run())
+        assert response.status_code == 200
+        assert len(seen) == 3 and throttle.retries == 2
+        assert all(0 <= s <= 2 for s in sleeps)
+
+    def test_every_attempt_is_spent(self):
+        """Retries are charged to the budget, and nothing is held while backing off."""
+        sleeps, seen, spent = [], [], []
+        throttle = _throttle(sleeps)
+        responses = [httpx.Response(503), httpx.Response(200, json={"data": []})]
+        holding = []
+
+        class _Spend:
+            async def __aenter__(self):
+                spent.append(1)
+                holding.append(1)
+
+            async def __aexit__(self, *exc):
+                holding.pop()
+
+        async def fake_sleep(seconds):
+            # Backoff happens outside the spend context
+            assert not holding
+            sleeps.append(seconds)
+
+        throttle._sleep = fake_sleep
+
+        async def run():
+            async with _client(responses, seen) as client:
+                return await throttle.get(client, URL, spend=_Spend)
+
+        response = asyncio.run(run())
+        assert response.status_code == 200
+        assert len(spent) == len(seen) == 2
+
+    def test_long_blocks_are_not_retried(self):
+        """A block longer than the backoff cap returns the error for fallback."""
+        sleeps, seen = [], []
+        throttle = _throttle(sleeps)
+        blocked = httpx.Response(
+            400,
+            json={"error": {"code": 80000, "message": "There have been too many calls"}},
+            headers={"x-business-use-case-usage": json.dumps({"1": [{"type": "ads_archive", "call_count": 100, "estimated_time_to_regain_access": 15}]})},
+        )
+
+        async def run():
+            async with _client([blocked], seen) as client:
+                return await throttle.get(client, URL)
+
+        response = asyncio.run(run())
+        assert response.status_code == 400 and len(seen) == 1
+        assert throttle.retries == 0
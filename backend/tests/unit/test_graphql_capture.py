@@ -0,0 +1,76 @@
+"""Ads Library JSON capture unit tests."""
+import json
+
+from app.services.graphql_capture import (
+    AdsLibraryCapture, media_key, parse_graphql_ad, parse_library_node, parse_search_node
+)
+
+
+def _node(ad_id, **snapshot):
+    return {
+        "ad_archive_id": ad_id,
+        "page_id": "55",
+        "page_name": "Acme",
+        "publisher_platform": ["FACEBOOK", "INSTAGRAM"],
+        "start_date": 1760000000,
+        "snapshot": {"title": "Big sale", "body": {"text": "Everything half price"}, "cta_text": "Shop Now", **snapshot},
+    }
+
+
+def _graphql_response(*nodes):
+    edges = [{"node": {"collated_results": [node]}} for node in nodes]
+    return {"data": {"ad_library_main": {"search_results_connection": {"edges": edges}}}}
+
+
+class TestAdsLibraryCapture:
+    """Tests for collecting ad nodes from captured responses."""
+
+    def test_collects_from_graphql_and_html(self):
+        """Ads are found in embedded page JSON and in GraphQL batches, once each, in load order."""
+        capture = AdsLibraryCapture()
+        html = (
+            '<html><script type="application/json" data-sjs>'
+            + json.dumps({"require": [[_graphql_response(_node("1"))]]})
+            + '</script><script type="application/json">{"unrelated": true}</script></html>'
+        )
+        capture.feed_html(html)
+        capture.feed_json("for (;;);" + json.dumps(_graphql_response(_node("2"), _node("1"))) + "\n" + json.dumps({"extensions": {}}))
+
+        assert [node["ad_archive_id"] for node in capture.records()] == ["1", "2"]
+        assert capture.count() == 2 and capture.responses == 2
+
+    def test_media_keys_grow_with_the_capture(self):
+        """The media key set is kept up to date as ads arrive, without re-parsing earlier ones."""
+        capture = AdsLibraryCapture()
+        keys = capture.media_keys()
+        capture.feed_json(json.dumps(_graphql_response(_node("1", images=[{"original_image_url": "https://scontent.fbcdn.net/1.jpg?oh=a"}]))))
+        capture.feed_json(json.dumps(_graphql_response(_node("2", videos=[{"video_hd_url": "https://video.fbcdn.net/2.mp4?sig=1"}]))))
+
+        assert keys is capture.media_keys()
+        assert keys == {media_key("https://scontent.fbcdn.net/1.jpg"), media_key("https://video.fbcdn.net/2.mp4")}
+
+
+class TestParseGraphqlAd:
+    """Tests for turning captured nodes into scraper records."""
+
+    def test_video_ad(self):
+        ad = parse_graphql_ad(_node("1", videos=[{"video_hd_url": "https://video.fbcdn.net/v.mp4?sig=1", "video_preview_image_url": "p"}]))
+        assert ad["media_type"] == "video" and ad["video_urls"] == ["https://video.fbcdn.net/v.mp4?sig=1"]
+        assert ad["platforms"] == ["facebook", "instagram"] and ad["start_date"] == "2025-10-09"
+
+    def test_carousel_uses_first_card_text(self):
+        cards = [
+            {"title": "Card one", "body": "First card copy", "original_image_url": "https://scontent.fbcdn.net/1.jpg"},
+            {"title": "Card two", "original_image_url": "https://scontent.fbcdn.net/2.jpg"},
+        ]
+        node = _node("3", cards=cards)
+        node["snapshot"].update(title=None, body={"text": "{{product.brand}}"})
+        search = parse_search_node(node)
+        assert (search["headline"], search["ad_copy"], search["media_type"]) == ("Card one", "First card copy", "carousel")
+
+        library = parse_library_node(node)
+        assert library["_image_urls"] == ["https://scontent.fbcdn.net/1.jpg", "https://scontent.fbcdn.net/2.jpg"]
+        assert library["ad_creative_link_captions"] == ["Shop Now"] and not library["_has_video"]
+
+    def test_media_key_ignores_signature(self):
+        assert media_key("https://scontent.fbcdn.net/a.jpg?oh=1&oe=2") == media_key("https://scontent.fbcdn.net/a.jpg?oh=3")
@@ -0,0 +1,42 @@
+"""Shared HTTP client registry unit tests."""
+import asyncio
+
+import pytest
+
+from app.services.http_clients import HttpClientRegistry, GRAPH, MEDIA
+
+
+class TestHttpClientRegistry:
+    """Tests for pooled, app-lifetime HTTP clients."""
+
+    def test_reuses_client_per_profile(self):
+        """The same profile returns the same client within a loop."""
+        registry = HttpClientRegistry()
+
+        async def run():
+            graph = registry.get(GRAPH)
+            assert registry.get(GRAPH) is graph
+            assert registry.get(MEDIA) is not graph
+            assert registry.get(MEDIA).follow_redirects
+            await registry.aclose()
+            assert graph.is_closed
+
+        asyncio.run(run())
+
+    def test_recreates_after_close(self):
+        """A closed registry hands out fresh clients on next use."""
+        registry = HttpClientRegistry()
+
+        async def run():
+            first = registry.get(GRAPH)
+            await registry.aclose()
+            second = registry.get(GRAPH)
+            assert second is not first and not second.is_closed
+            await registry.aclose()
+
+        asyncio.run(run())
+
+    def test_unknown_profile(self):
+        """Unknown profiles are rejected."""
+        with pytest.raises(ValueError):
+            HttpClientRegistry().get("nope")
@@ -0,0 +1,68 @@
+"""Negative keyword matcher unit tests."""
+import re
+
+from app.services.keyword_matcher import KeywordMatcher, get_keyword_matcher, normalize_keywords
+
+
+def legacy_matches(keywords, text):
+    """The per-keyword whole-word check the matcher replaces."""
+    return any(re.search(r'\b' + re.escape(kw) + r'\b', text.lower()) for kw in keywords)
+
+
+class TestKeywordMatcher:
+    """Tests for compiled whole-word keyword matching."""
+
+    def test_whole_word_only(self):
+        """Keywords match whole words, not substrings."""
+        matcher = KeywordMatcher(["keto"])
+        assert matcher.matches("Try our KETO plan")
+        assert not matcher.matches("ketones explained")
+
+    def test_overlapping_keywords(self):
+        """Shared prefixes and phrases still match independently."""
+        matcher = KeywordMatcher(["keto", "keto diet", "kept"])
+        assert matcher.matches("the keto diet works")
+        assert matcher.matches("keto dieting")  # falls back to "keto"
+        assert matcher.matches("we kept it")
+        assert not matcher.matches("ketogenic kepts")
+
+    def test_special_characters_escaped(self):
+        """Regex metacharacters in keywords are treated literally."""
+        matcher = KeywordMatcher(["c.o.d", "50% off"])
+        assert matcher.matches("pay c.o.d today")
+        assert not matcher.matches("pay cxoxd today")
+        assert matcher.matches("get 50% off now")
+
+    def test_empty_matcher(self):
+        """No keywords (or only blanks) never filters."""
+        matcher = KeywordMatcher(["", "   "])
+        assert not matcher
+        assert not matcher.matches("anything at all")
+
+    def test_matches_ad_joins_fields(self):
+        """matches_ad checks brand, headline, copy and CTA together, skipping None."""
+        matcher = KeywordMatcher(["casino"])
+        assert matcher.matches_ad("Brand", None, "Visit our casino", None)
+        assert not matcher.matches_ad("Brand", None, None, "Shop Now")
+
+    def test_equivalent_to_legacy_loop(self):
+        """Compiled matcher agrees with the old per-keyword loop."""
+        keywords = ["loan", "loans", "payday loan", "crypto", "btc", "a+b"]
+        texts = [
+            "Get a payday loan today",
+            "Loans for everyone",
+            "cryptocurrency news",
+            "Buy BTC now",
+            "a+b equals c",
+            "nothing to see here",
+        ]
+        matcher = KeywordMatcher(keywords)
+        for text in texts:
+            assert matcher.matches(text) == legacy_matches(keywords, text), text
+
+    def test_get_keyword_matcher_is_cached(self):
+        """Same keyword set (any order/case) returns the same compiled matcher."""
+        first = get_keyword_matcher(["Keto"], ["loan"])
+        second = get_keyword_matcher(["loan"], ["keto "])
+        assert first is second
+        assert normalize_keywords(["B", "a", "b"]) == ("a", "b")
@@ -0,0 +1,378 @@
+"""Brand scrape media pipeline unit tests."""
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import app.services.brand_scraper as brand_module
+import app.services.media_store as media_store_module
+from app.database import Base
+from app.models import BrandScrapedAd, MediaObject
+from app.services.brand_scraper import BrandScraperService
+from app.services.media_pipeline import MediaLimits
+from app.services.media_spool import MediaSpool
+from app.services.media_store import MediaStore
+from app.services.storage import StoredObject
+
+
+class _Session:
+    """SQLite session for media_objects; scraped ads are only recorded."""
+
+    def __init__(self, tmp_path):
+        # A file, so the media store's worker-thread sessions see the same database
+        engine = create_engine(f"sqlite:///{tmp_path / 'media.db'}")
+        Base.metadata.create_all(engine, tables=[MediaObject.__table__])
+        self.session = sessionmaker(bind=engine)()
+        self.added = []
+        self.commits = 0
+
+    def add(self, record):
+        if isinstance(record, BrandScrapedAd):
+            self.added.append(record)
+        else:
+            self.session.add(record)
+
+    def commit(self):
+        self.commits += 1
+        self.session.commit()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class _FakeR2:
+    """Records puts (and how many overlap) instead of calling R2."""
+
+    enabled = True
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.keys = []
+        self.deleted = []
+        self.now = 0
+        self.peak = 0
+
+    def public_url(self, key):
+        return f"https://r2.example/{key}"
+
+    def key_from_url(self, url):
+        return url.replace("https://r2.example/", "")
+
+    async def put(self, key, body, content_type):
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        await asyncio.sleep(self.delay)
+        self.now -= 1
+        self.keys.append(key)
+        return self.public_url(key)
+
+    async def put_stream(self, key, chunks, content_type, **kwargs):
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+        self.keys.append(key)
+        return StoredObject(key, self.public_url(key), size, digest.hexdigest())
+
+    async def delete(self, keys):
+        self.deleted.extend(keys)
+        return []
+
+
+def _body(url):
+    return (url.encode() * 200)[:2000]
+
+
+def _ads(count, media_per_ad=3):
+    return [
+        {
+            "id": str(i),
+            "page_name": "Brand",
+            "_media_urls": [f"https://scontent-{j % 2}.fbcdn.net/{i}_{j}.jpg" for j in range(media_per_ad)],
+        }
+        for i in range(count)
+    ]
+
+
+def _brand_scrape():
+    return SimpleNamespace(
+        id="scrape-1", brand_name="Brand", page_id="123", page_url=None,
+        status="pending", total_ads=0, media_downloaded=0, error_message=None,
+    )
+
+
+async def _media_handler(request):
+    await asyncio.sleep(0.002)
+    return httpx.Response(200, content=_body(str(request.url)), headers={"content-type": "image/jpeg"})
+
+
+class TestMediaLimits:
+    """Tests for per-stage and per-host slots."""
+
+    def test_per_host_limit(self):
+        """Downloads to one host never exceed its slot count."""
+        limits = MediaLimits(snapshots=1, downloads=10, per_host=2, uploads=1)
+        active = {"now": 0, "peak": 0}
+
+        async def fetch():
+            async with limits.download_slot("https://scontent.fbcdn.net/a.jpg"):
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+                await asyncio.sleep(0.01)
+                active["now"] -= 1
+
+        async def run():
+            await asyncio.gather(*(fetch() for _ in range(6)))
+
+        asyncio.run(run())
+        assert active["peak"] == 2
+
+
+class TestBrandMediaPipeline:
+    """Tests for processing a brand scrape's ads concurrently."""
+
+    def test_ads_are_processed_concurrently_within_limits(self, tmp_path, monkeypatch):
+        """Uploads overlap up to the limit, and progress is committed as ads finish."""
+        monkeypatch.setattr(brand_module.settings, "BRAND_DOWNLOAD_CONCURRENCY", 4)
+        monkeypatch.setattr(brand_module.settings, "BRAND_DOWNLOAD_PER_HOST", 2)
+        monkeypatch.setattr(brand_module.settings, "BRAND_UPLOAD_CONCURRENCY", 3)
+        monkeypatch.setattr(brand_module.settings, "BRAND_ADS_IN_FLIGHT", 5)
+        monkeypatch.setattr(brand_module.settings, "BRAND_PROGRESS_COMMIT_ADS", 4)
+
+        db = _Session(tmp_path)
+        service = BrandScraperService(db)
+        brand_scrape = _brand_scrape()
+        r2 = _FakeR2(delay=0.005)
+
+        async def fetch_page_ads(*args, **kwargs):
+            return _ads(12)
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(_media_handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "r2_storage", r2)
+                monkeypatch.setattr(media_store_module, "r2_storage", r2)
+                monkeypatch.setattr(service, "_fetch_page_ads", fetch_page_ads)
+                await service.scrape_brand(brand_scrape)
+
+        asyncio.run(run())
+
+        assert brand_scrape.status == "completed"
+        assert len(db.added) == 12 and brand_scrape.media_downloaded == 36
+        assert 1 < r2.peak <= 3
+        assert len(r2.keys) == 36
+        record = next(r for r in db.added if r.external_id == "0")
+        # Media keeps its position in the ad, whatever order it finished in
+        urls = [f"https://scontent-{j % 2}.fbcdn.net/0_{j}.jpg" for j in range(3)]
+        keys = {media.sha256: media.r2_key for media in db.query(MediaObject)}
+        assert record.media_urls == [f"https://r2.example/{keys[hashlib.sha256(_body(url)).hexdigest()]}" for url in urls]
+        assert record.media_type == "carousel"
+        # Status commits plus a progress commit every 4 ads
+        assert db.commits >= 5
+
+    def test_failed_saves_do_not_abort_the_scrape(self, tmp_path, monkeypatch):
+        """A record that can't be saved, or a failed progress commit, is rolled back and skipped."""
+        monkeypatch.setattr(brand_module.settings, "BRAND_PROGRESS_COMMIT_ADS", 2)
+
+        class _FlakySession(_Session):
+            def __init__(self, tmp_path):
+                super().__init__(tmp_path)
+                self.rollbacks = 0
+                self.failed_commit = False
+
+            def add(self, record):
+                if isinstance(record, BrandScrapedAd) and record.external_id == "3":
+                    raise IntegrityError("INSERT INTO brand_scraped_ads", {}, Exception("duplicate key"))
+                super().add(record)
+
+            def commit(self):
+                if len(self.added) >= 2 and not self.failed_commit:
+                    self.failed_commit = True
+                    raise OperationalError("COMMIT", {}, Exception("connection reset"))
+                super().commit()
+
+            def rollback(self):
+                self.rollbacks += 1
+                self.session.rollback()
+
+        db = _FlakySession(tmp_path)
+        service = BrandScraperService(db)
+        brand_scrape = _brand_scrape()
+        r2 = _FakeR2()
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(_media_handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "r2_storage", r2)
+                monkeypatch.setattr(media_store_module, "r2_storage", r2)
+                return await service._process_ads(_ads(6, media_per_ad=1), brand_scrape)
+
+        media_count = asyncio.run(run())
+
+        assert db.rollbacks == 1
+        assert "3" not in {record.external_id for record in db.added}
+        # Ad 3 is skipped and the two ads in the failed commit are lost; the other three count
+        assert media_count == brand_scrape.media_downloaded == 3
+        # The unsaved ads' media is given back, and deleted since nothing else uses it
+        assert db.query(MediaObject).count() == 3 and len(r2.deleted) == 3
+        assert {media.ref_count for media in db.query(MediaObject)} == {1}
+
+    def test_videos_are_streamed_to_r2(self, tmp_path, monkeypatch):
+        """Video URLs are piped from the CDN into a streamed upload, not buffered."""
+        service = BrandScraperService(_Session(tmp_path))
+        r2 = _FakeR2()
+
+        async def handler(request):
+            return httpx.Response(200, content=b"v" * 50000, headers={"content-type": "video/mp4"})
+
+        ad = {"id": "9", "_media_urls": ["https://video.fbcdn.net/v/clip"], "_video_urls": ["https://video.fbcdn.net/v/clip"]}
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "r2_storage", r2)
+                monkeypatch.setattr(media_store_module, "r2_storage", r2)
+                return await service._process_ad(ad, "scrape-1", MediaLimits())
+
+        record = asyncio.run(run())
+
+        assert record.media_type == "video"
+        assert len(r2.keys) == 1 and r2.keys[0].startswith("media/stream/") and r2.keys[0].endswith(".mp4")
+        assert record.media_urls == [f"https://r2.example/{r2.keys[0]}"]
+        assert service.db.query(MediaObject).one().size == 50000
+
+
+    def test_captured_media_is_combined_with_the_ads_own_urls(self, tmp_path, monkeypatch):
+        """Captured items stand in for the URLs they match; the ad's other media is downloaded."""
+        service = BrandScraperService(_Session(tmp_path))
+        service.media_spool = MediaSpool(directory=str(tmp_path))
+        r2 = _FakeR2()
+        requests = []
+        captured, other, video = (
+            "https://scontent.fbcdn.net/v/captured.jpg", "https://scontent.fbcdn.net/v/other.jpg", "https://video.fbcdn.net/v/clip.mp4"
+        )
+
+        async def handler(request):
+            requests.append(str(request.url))
+            if request.url.host.startswith("video"):
+                return httpx.Response(200, content=b"v" * 5000, headers={"content-type": "video/mp4"})
+            return await _media_handler(request)
+
+        async def run():
+            spooled = await service.media_spool.add(captured + "?oh=signed", _body(captured), "image/jpeg")
+            ad = {
+                "id": "7",
+                "_media_urls": [video, captured, other],
+                "_video_urls": [video],
+                "_media_data": [{"url": spooled.url, "type": "image", "content_type": "image/jpeg", "spooled": service.media_spool.claim(spooled)}],
+            }
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "r2_storage", r2)
+                monkeypatch.setattr(media_store_module, "r2_storage", r2)
+                return await service._process_ad(ad, "scrape-1", MediaLimits())
+
+        record = asyncio.run(run())
+
+        assert sorted(requests) == [other, video]
+        assert record.media_type == "video" and len(record.media_urls) == 3
+        assert record.original_media_urls == [video, captured + "?oh=signed", other]
+        assert len(service.media_spool) == 0
+
+
+class TestContentAddressedMedia:
+    """Tests for deduplicated, reference-counted media across ads and scrapes."""
+
+    def test_shared_media_is_stored_once_and_released_by_reference(self, tmp_path, monkeypatch):
+        """Same URL or same bytes reuse one object; R2 deletes wait for the last reference."""
+        db = _Session(tmp_path)
+        service = BrandScraperService(db)
+        r2 = _FakeR2()
+        requests = []
+        shared = "https://scontent.fbcdn.net/v/shared.jpg"
+        copy = "https://scontent.fbcdn.net/v/copy.jpg"
+
+        async def handler(request):
+            requests.append(str(request.url))
+            if str(request.url) == copy:
+                # Arrives after the shared URL is stored, so that URL is the one recorded as the source
+                await asyncio.sleep(0.05)
+            # The copy is the same file served from another URL
+            return httpx.Response(200, content=_body(shared), headers={"content-type": "image/jpeg"})
+
+        ads = [{"id": "1", "_media_urls": [shared]}, {"id": "2", "_media_urls": [shared, copy]}]
+
+        async def scrape():
+            limits, media_store = MediaLimits(), MediaStore(db)
+            return await asyncio.gather(*(service._process_ad(ad, "scrape", limits, media_store) for ad in ads))
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(brand_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(brand_module, "r2_storage", r2)
+                monkeypatch.setattr(media_store_module, "r2_storage", r2)
+                first = await scrape()
+                downloads = len(requests)
+                second = await scrape()
+                return first, second, downloads
+
+        first, second, downloads = asyncio.run(run())
+
+        media = db.query(MediaObject).one()
+        assert r2.keys == [media.r2_key] and media.ref_count == 6
+        # The re-scrape found the creative by its source URL; the copy was downloaded but not uploaded again
+        assert downloads == 2 and requests[2:] == [copy]
+        assert first[1].media_urls == [f"https://r2.example/{media.r2_key}"] * 2
+
+        store = MediaStore(db)
+        assert store.release([url for record in first for url in record.media_urls]) == []
+        db.commit()
+        assert db.query(MediaObject).one().ref_count == 3
+        legacy = "https://r2.example/brand/1_0.jpg"
+        assert store.release([url for record in second for url in record.media_urls] + [legacy]) == ["brand/1_0.jpg", media.r2_key]
+        db.commit()
+        assert db.query(MediaObject).count() == 0
+
+    def test_streamed_upload_is_recorded_if_the_stored_copy_vanishes(self, tmp_path, monkeypatch):
+        """When the row that beat an upload is deleted before it can be reused, the upload is recorded instead."""
+        db = _Session(tmp_path)
+        store = MediaStore(db)
+        r2 = _FakeR2()
+        monkeypatch.setattr(media_store_module, "r2_storage", r2)
+        create = store._create
+        attempts = []
+
+        def racing_create(session, *args, **kwargs):
+            attempts.append(args)
+            # As if another worker inserted this hash first, then a deletion removed it
+            return None if len(attempts) == 1 else create(session, *args, **kwargs)
+
+        monkeypatch.setattr(store, "_create", racing_create)
+
+        async def chunks():
+            yield b"v" * 5000
+
+        media = asyncio.run(store.put_stream(chunks(), ".mp4"))
+
+        assert len(attempts) == 2 and r2.deleted == []
+        assert media.r2_key == r2.keys[0] and db.query(MediaObject).one().ref_count == 1
+
+    def test_reuploads_never_share_a_deleted_objects_key(self, tmp_path, monkeypatch):
+        """Storing a file again after its object was released uses a new key, so the old delete can't remove it."""
+        db = _Session(tmp_path)
+        store = MediaStore(db)
+        r2 = _FakeR2()
+        monkeypatch.setattr(media_store_module, "r2_storage", r2)
+
+        first = asyncio.run(store.put_bytes(b"x" * 2000, ".jpg"))
+        assert store.release([store.url(first)]) == [first.r2_key]
+        db.commit()
+        second = asyncio.run(store.put_bytes(b"x" * 2000, ".jpg"))
+
+        assert second.r2_key != first.r2_key and r2.keys == [first.r2_key, second.r2_key]
+        assert db.query(MediaObject).one().r2_key == second.r2_key
@@ -0,0 +1,111 @@
+"""Captured media spool unit tests."""
+import asyncio
+import os
+
+from app.services.media_spool import MediaSpool
+
+
+def _spool(tmp_path, **kwargs):
+    options = {"memory_bytes": 10_000, "max_bytes": 30_000, "inline_max_bytes": 4_000, "directory": str(tmp_path)}
+    options.update(kwargs)
+    return MediaSpool(**options)
+
+
+def _url(name):
+    return f"https://scontent.fbcdn.net/v/{name}.jpg?oh=signed"
+
+
+class TestMediaSpool:
+    """Tests for keeping captured media within memory and disk limits."""
+
+    def test_large_and_overflow_items_spill_to_disk(self, tmp_path):
+        """Small items stay in memory until the budget is used; the rest go to temp files."""
+        spool = _spool(tmp_path)
+
+        async def run():
+            small = [await spool.add(_url(f"s{i}"), b"s" * 3_000, "image/jpeg") for i in range(4)]
+            large = await spool.add(_url("large"), b"L" * 8_000, "image/jpeg")
+            return small, large
+
+        small, large = asyncio.run(run())
+
+        assert [item.in_memory for item in small] == [True, True, True, False]
+        assert not large.in_memory and os.path.exists(large.path)
+        assert spool.stats()["memory_bytes"] == 9_000 and spool.stats()["disk_bytes"] == 11_000
+
+        async def read():
+            return b"".join([chunk async for chunk in large.chunks(chunk_size=3_000)])
+
+        assert asyncio.run(read()) == b"L" * 8_000
+        # Signed query strings differ between loads
+        assert spool.get(_url("large").replace("signed", "other")) is large
+
+    def test_concurrent_spills_count_against_the_cap(self, tmp_path):
+        """Spills written at the same time are reserved up front, and a duplicate keeps one copy."""
+        spool = _spool(tmp_path, max_bytes=12_000, inline_max_bytes=1)
+
+        async def run():
+            return await asyncio.gather(
+                spool.add(_url("a"), b"a" * 5_000, "image/jpeg"),
+                spool.add(_url("a"), b"a" * 5_000, "image/jpeg"),
+                spool.add(_url("b"), b"b" * 5_000, "image/jpeg"),
+                spool.add(_url("c"), b"c" * 5_000, "image/jpeg"),
+            )
+
+        first, again, second, third = asyncio.run(run())
+
+        assert again is first
+        assert spool.get(_url("a")) is first and spool.get(_url("b")) is second and third is None
+        assert spool.used == 10_000 and len(os.listdir(spool._tempdir)) == 2
+
+    def test_cap_evicts_unwanted_then_oldest(self, tmp_path):
+        """At the cap, items no ad refers to go first and claimed items are kept."""
+        wanted = {"scontent.fbcdn.net/v/a.jpg"}
+        spool = _spool(tmp_path, max_bytes=9_000, wanted=wanted)
+
+        async def run():
+            a = await spool.add(_url("a"), b"a" * 3_000, "image/jpeg")
+            await spool.add(_url("b"), b"b" * 3_000, "image/jpeg")
+            c = spool.claim(await spool.add(_url("c"), b"c" * 3_000, "image/jpeg"))
+
+            await spool.add(_url("d"), b"d" * 3_000, "image/jpeg")
+            assert spool.get(_url("b")) is None and spool.get(_url("a")) is a
+
+            await spool.add(_url("e"), b"e" * 3_000, "image/jpeg")
+            assert spool.get(_url("d")) is None and spool.get(_url("a")) is a
+
+            # With only wanted items left unclaimed, the oldest goes
+            wanted.add("scontent.fbcdn.net/v/e.jpg")
+            await spool.add(_url("f"), b"f" * 3_000, "image/jpeg")
+            assert spool.get(_url("a")) is None and spool.get(_url("c")) is c
+            assert spool.used <= 9_000 and spool.stats()["evicted"] == 3
+
+            assert await spool.add(_url("huge"), b"h" * 10_000, "image/jpeg") is None
+            assert spool.stats()["dropped"] == 1
+
+        asyncio.run(run())
+
+    def test_items_are_released_after_their_last_ad(self, tmp_path):
+        """Spilled files are removed once every ad using them is done, and on close."""
+        spool = _spool(tmp_path, inline_max_bytes=1)
+
+        async def run():
+            shared = await spool.add(_url("shared"), b"x" * 5_000, "image/jpeg")
+            await spool.add(_url("unmatched"), b"y" * 5_000, "image/jpeg")
+            return shared
+
+        shared = asyncio.run(run())
+        spool.claim(shared)
+        spool.claim(shared)
+
+        spool.release_unclaimed()
+        assert len(spool) == 1
+
+        path = shared.path
+        spool.done(shared)
+        assert os.path.exists(path)
+        spool.done(shared)
+        assert not os.path.exists(path) and spool.used == 0
+
+        spool.close()
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,97 @@
+"""Playwright helper unit tests."""
+import asyncio
+
+from app.services.playwright_helpers import ResourceBlocker, scroll_until_settled
+
+
+class _FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = type("Request", (), {"resource_type": resource_type, "url": url})()
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "abort"
+
+    async def continue_(self):
+        self.outcome = "continue"
+
+
+class _FeedPage:
+    """Page whose ad count grows by the given steps, one per scroll."""
+
+    def __init__(self, growth):
+        self.growth = list(growth)
+        self.count = 0
+        self.waited_ms = 0
+
+    async def evaluate(self, script):
+        if script.startswith("window.scrollTo"):
+            self.count += self.growth.pop(0) if self.growth else 0
+            return None
+        return self.count
+
+    async def wait_for_timeout(self, ms):
+        self.waited_ms += ms
+
+
+class TestResourceBlocker:
+    """Tests for text-only request interception."""
+
+    def test_blocks_media_and_trackers(self):
+        """Creatives, fonts and analytics are blocked; page code is not."""
+        blocker = ResourceBlocker()
+        assert blocker.should_block("image", "https://scontent.xx.fbcdn.net/a.jpg")
+        assert blocker.should_block("media", "https://video.xx.fbcdn.net/v.mp4")
+        assert blocker.should_block("font", "https://static.xx.fbcdn.net/f.woff2")
+        assert blocker.should_block("script", "https://www.googletagmanager.com/gtm.js")
+        assert not blocker.should_block("script", "https://static.xx.fbcdn.net/rsrc.php/app.js")
+        assert not blocker.should_block("document", "https://www.facebook.com/ads/library/?q=shoes")
+        assert not blocker.should_block("xhr", "https://www.facebook.com/api/graphql/")
+
+    def test_handler_counts_outcomes(self):
+        """Routes are aborted or continued and counted."""
+        blocker = ResourceBlocker()
+        image = _FakeRoute("image", "https://scontent.xx.fbcdn.net/a.jpg")
+        doc = _FakeRoute("document", "https://www.facebook.com/ads/library/")
+
+        async def run():
+            await blocker._handle(image)
+            await blocker._handle(doc)
+
+        asyncio.run(run())
+        assert image.outcome == "abort" and doc.outcome == "continue"
+        assert blocker.blocked == 1 and blocker.allowed == 1
+
+
+class TestScrollUntilSettled:
+    """Tests for adaptive feed scrolling."""
+
+    def test_stops_at_target(self):
+        """Scrolling stops once enough ads are on the page, without idle waits."""
+        page = _FeedPage([10, 10, 10, 10])
+        stats = asyncio.run(scroll_until_settled(page, target_count=25, poll_ms=100))
+        assert stats.stop_reason == "target"
+        assert stats.scrolls == 3 and stats.ads_seen == 30
+        assert stats.wait_ms == 300
+
+    def test_stops_when_feed_is_exhausted(self):
+        """K scrolls in a row without new ads end the run."""
+        page = _FeedPage([10, 5])
+        stats = asyncio.run(scroll_until_settled(
+            page, target_count=500, idle_limit=2, step_timeout_ms=1000, poll_ms=250
+        ))
+        assert stats.stop_reason == "idle"
+        assert stats.scrolls == 4 and stats.ads_seen == 15
+        assert stats.wait_ms == 250 + 250 + 1000 + 1000
+
+    def test_respects_max_scrolls(self):
+        """A feed that keeps growing is capped by max_scrolls."""
+        page = _FeedPage([1] * 100)
+        stats = asyncio.run(scroll_until_settled(page, target_count=500, max_scrolls=5))
+        assert stats.stop_reason == "max_scrolls" and stats.scrolls == 5
+
+    def test_counts_with_python_callable(self):
+        """A count callable (e.g. captured JSON ads) replaces the in-page count."""
+        page = _FeedPage([10, 10])
+        stats = asyncio.run(scroll_until_settled(page, target_count=15, poll_ms=100, count=lambda: page.count * 2))
+        assert stats.stop_reason == "target" and stats.scrolls == 1 and stats.ads_seen == 20
@@ -0,0 +1,91 @@
+"""Raw payload archive and offline re-parse unit tests."""
+from datetime import date, datetime, timezone
+
+from app.services.archive_reparse import BRAND_SCRAPED_ADS, SCRAPED_ADS, collect_updates
+from app.services.raw_archive import (
+    GRAPH_SEARCH, LocalArchiveStore, RawArchive, encode_records, decode_records, get_archive_store
+)
+
+
+def _archive(tmp_path):
+    return RawArchive(LocalArchiveStore(str(tmp_path)), flush_seconds=60, flush_bytes=1 << 20, level=3)
+
+
+class TestRawArchive:
+    """Tests for buffering and writing compressed daily partitions."""
+
+    def test_flush_writes_readable_partition(self, tmp_path):
+        """Flushed records land in today's partition and read back with their context."""
+        archive = _archive(tmp_path)
+        archive.record(GRAPH_SEARCH, [{"id": "1"}, {"id": "2"}], query="keto", country="US")
+        archive.flush()
+        archive.record(GRAPH_SEARCH, [{"id": "3"}], query="keto", country="US")
+        archive.flush()
+
+        today = datetime.now(timezone.utc).date()
+        records = list(archive.read(today, today))
+        assert [r["payload"]["id"] for r in records] == ["1", "2", "3"]
+        assert records[0]["context"] == {"query": "keto", "country": "US"}
+        assert archive.stats()["files_written"] == 2
+        assert (tmp_path / f"dt={today.isoformat()}").is_dir()
+
+    def test_buffer_is_capped_while_store_fails(self):
+        """Failed writes are retried later, but the oldest records go once the cap is hit."""
+        class _DownStore:
+            def put(self, key, data):
+                raise OSError("store down")
+
+        archive = RawArchive(_DownStore(), flush_seconds=60, flush_bytes=1 << 20, level=3, max_pending_bytes=500)
+        for i in range(20):
+            archive.record(GRAPH_SEARCH, [{"id": str(i)}])
+            archive.flush()
+
+        stats = archive.stats()
+        assert stats["flush_errors"] == 20 and stats["dropped"] > 0
+        assert archive._pending_bytes <= 500
+        kept = [line for lines in archive._pending.values() for line in lines]
+        assert b'"id": "19"' in kept[-1] and stats["pending_records"] == 20 - stats["dropped"]
+
+    def test_local_archive_needs_an_absolute_directory(self, monkeypatch):
+        monkeypatch.setattr("app.services.raw_archive.settings.RAW_ARCHIVE_DIR", "raw_archive")
+        assert get_archive_store("local") is None
+        assert get_archive_store("off") is None
+
+    def test_disabled_archive_records_nothing(self):
+        archive = RawArchive(store=None)
+        archive.record(GRAPH_SEARCH, [{"id": "1"}])
+        assert archive.stats()["recorded"] == 0
+
+    def test_decodes_concatenated_frames(self):
+        data = encode_records([b'{"a": 1}\n'], level=3) + encode_records([b'{"a": 2}\n'], level=3)
+        assert [r["a"] for r in decode_records(data)] == [1, 2]
+
+
+class TestReparse:
+    """Tests for re-running the current parsers over archived payloads."""
+
+    def test_latest_payload_per_ad_is_parsed(self, tmp_path):
+        """Each ad is parsed from its most recent capture, in a process pool."""
+        store = LocalArchiveStore(str(tmp_path))
+        lines = [
+            b'{"kind": "graph_search", "captured_at": "2026-10-01T10:00:00+00:00", "context": {}, '
+            b'"payload": {"id": "1", "page_name": "Old", "ad_creative_link_titles": ["Old title"]}}\n',
+            b'{"kind": "graph_search", "captured_at": "2026-10-01T12:00:00+00:00", "context": {}, '
+            b'"payload": {"id": "1", "page_name": "New", "ad_creative_link_titles": ["New title"], "publisher_platforms": ["FACEBOOK"]}}\n',
+        ]
+        store.put("dt=2026-10-01/a.ndjson.zst", encode_records(lines[:1], level=3))
+        store.put("dt=2026-10-02/b.ndjson.zst", encode_records(lines[1:], level=3))
+        store.put("dt=2026-10-02/c.ndjson.zst", encode_records([
+            b'{"kind": "dom_library", "captured_at": "2026-10-02T09:00:00+00:00", "context": {"full_copy": true}, '
+            b'"payload": {"id": "7", "lines": ["Brand", "Sponsored", "Headline for the ad", "First body line", "Second body line"], "page_id": "99"}}\n',
+        ], level=3))
+
+        updates, stats = collect_updates(store, date(2026, 10, 1), date(2026, 10, 2), workers=2)
+
+        assert stats["files"] == 3 and stats["records"] == 3 and stats["parse_errors"] == 0
+        captured_at, fields = updates[SCRAPED_ADS]["1"]
+        assert captured_at.startswith("2026-10-01T12")
+        assert (fields["brand_name"], fields["headline"], fields["platforms"]) == ("New", "New title", ["facebook"])
+        brand_fields = updates[BRAND_SCRAPED_ADS]["7"][1]
+        assert brand_fields["page_name"] == "Brand"
+        assert brand_fields["ad_copy"] == "First body line Second body line"
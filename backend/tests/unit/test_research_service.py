@@ -0,0 +1,72 @@
+"""Research service unit tests."""
+import asyncio
+
+from app.schemas.research import BatchSearchRequest, ScrapedAdSearchResult
+from app.services.research_service import ResearchService
+
+
+def _ad(external_id, headline):
+    return ScrapedAdSearchResult(
+        external_id=external_id, brand_name="Acme", headline=headline,
+        ad_link=f"https://www.facebook.com/ads/library/?id={external_id}"
+    )
+
+
+class TestBatchSearch:
+    """Tests for the query x country search fan-out."""
+
+    def _run(self, service, request):
+        async def collect():
+            return [event async for event in service.iter_batch_search(request)]
+        return asyncio.run(collect())
+
+    def test_expands_and_dedupes(self):
+        """Every pair is searched once; ads repeated across pairs are dropped."""
+        calls = []
+
+        async def fake_search(request):
+            calls.append((request.query, request.country))
+            return [_ad("1", "Shared ad"), _ad(f"{request.query}-{request.country}", f"Own ad {request.query} {request.country}")]
+
+        service = ResearchService(db=None)
+        service.search_ads_async = fake_search
+        events = self._run(service, BatchSearchRequest(queries=["shoes", " shoes", "hats"], countries=["us", "GB"]))
+
+        assert sorted(calls) == [("hats", "GB"), ("hats", "US"), ("shoes", "GB"), ("shoes", "US")]
+        results = [e for e in events if e["type"] == "result"]
+        assert len(results) == 4
+        assert sum(len(e["ads"]) for e in results) == 5
+        assert sum(e["duplicates"] for e in results) == 3
+        assert events[-1]["type"] == "summary" and events[-1]["unique_ads"] == 5
+
+    def test_failures_do_not_stop_the_batch(self):
+        """A failing search yields an error event and the rest still complete."""
+        async def fake_search(request):
+            if request.country == "GB":
+                raise RuntimeError("boom")
+            return [_ad(request.query, request.query)]
+
+        service = ResearchService(db=None)
+        service.search_ads_async = fake_search
+        events = self._run(service, BatchSearchRequest(queries=["a", "b"], countries=["US", "GB"]))
+
+        assert [e["type"] for e in events].count("error") == 2
+        assert events[-1]["failed"] == 2 and events[-1]["unique_ads"] == 2
+
+    def test_concurrency_is_bounded(self, monkeypatch):
+        """No more than BATCH_SEARCH_CONCURRENCY searches run at once."""
+        from app.services import research_service as module
+        monkeypatch.setattr(module.settings, "BATCH_SEARCH_CONCURRENCY", 2)
+        running = {"now": 0, "peak": 0}
+
+        async def fake_search(request):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return []
+
+        service = ResearchService(db=None)
+        service.search_ads_async = fake_search
+        self._run(service, BatchSearchRequest(queries=["a", "b", "c"], countries=["US", "GB"]))
+        assert running["peak"] == 2
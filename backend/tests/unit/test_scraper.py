@@ -0,0 +1,300 @@
+"""Facebook Ads Library search unit tests."""
+import asyncio
+
+from app.schemas.research import ScrapedAdCreate
+from app.services.scraper import FacebookAdsLibraryAPI
+
+
+def make_ad(ad_id, brand="Brand"):
+    return ScrapedAdCreate(
+        brand_name=brand,
+        headline=f"Headline {ad_id}",
+        external_id=str(ad_id),
+        ad_link=f"https://www.facebook.com/ads/library/?id={ad_id}",
+    )
+
+
+def collect(async_iter):
+    async def run():
+        return [page async for page in async_iter]
+    return asyncio.run(run())
+
+
+class TestIterAds:
+    """Tests for streaming search with Playwright fallback."""
+
+    def make_scraper(self, api_pages, fallback_pages=None, api_error=None):
+        scraper = FacebookAdsLibraryAPI()
+        scraper.access_token = "token"
+        calls = {}
+
+        async def fake_api(query, limit, country, offset, exclude_ids, negative_keywords, id_first=False):
+            for page in api_pages:
+                yield page
+            if api_error:
+                raise api_error
+
+        async def fake_fallback(query, limit, country, offset, exclude_ids, negative_keywords):
+            calls["fallback"] = {"limit": limit, "exclude_ids": set(exclude_ids)}
+            for page in fallback_pages or []:
+                yield page
+
+        scraper._iter_api_search = fake_api
+        scraper._iter_fallback_search = fake_fallback
+        return scraper, calls
+
+    def test_yields_api_pages(self):
+        """API pages are yielded as they arrive without a fallback."""
+        scraper, calls = self.make_scraper([[make_ad(1), make_ad(2)], [make_ad(3)]])
+        pages = collect(scraper.iter_ads("keto", limit=3))
+        assert [[ad.external_id for ad in page] for page in pages] == [["1", "2"], ["3"]]
+        assert "fallback" not in calls
+
+    def test_low_yield_falls_back_for_remainder(self):
+        """A short API result is topped up by Playwright, excluding ads already yielded."""
+        scraper, calls = self.make_scraper([[make_ad(1)]], fallback_pages=[[make_ad(9)]])
+        pages = collect(scraper.iter_ads("semaglutide", limit=100, exclude_ids=["0"]))
+        assert [ad.external_id for page in pages for ad in page] == ["1", "9"]
+        assert calls["fallback"] == {"limit": 99, "exclude_ids": {"0", "1"}}
+
+    def test_api_error_falls_back(self):
+        """An API failure mid-stream keeps the pages already yielded."""
+        scraper, calls = self.make_scraper(
+            [[make_ad(1)]], fallback_pages=[[make_ad(2)]], api_error=RuntimeError("boom")
+        )
+        ads = asyncio.run(scraper.search_ads("keto", limit=2))
+        assert [ad.external_id for ad in ads] == ["1", "2"]
+        assert calls["fallback"]["limit"] == 1
+
+
+def _unlimited_budget():
+    """Budget whose reservations always succeed, without a database."""
+    from app.services.api_budget import ApiBudget
+    from app.services.graph_metering import GraphMeter
+
+    class Ledger:
+        def reserve(self, calls, max_calls, window_seconds, ttl_seconds, owner):
+            return "reservation"
+
+        def release(self, reservation_id):
+            pass
+
+    meter = GraphMeter(writer=lambda rows: None, loader=lambda since: [])
+    return ApiBudget(ledger=Ledger(), meter=meter)
+
+
+class TestPagedSearch:
+    """Tests for cursor-resumable search used by search sessions."""
+
+    def test_resumes_from_stored_cursor(self, monkeypatch):
+        """Each call continues from the saved Graph cursor without refetching."""
+        import httpx
+        from app.services import scraper as scraper_module
+        from app.services.scraper import PagingState
+
+        graph_pages = [[{"id": "1", "page_name": "A"}, {"id": "2", "page_name": "B"}], [{"id": "3", "page_name": "C"}]]
+        requests = []
+
+        def handler(request):
+            requests.append(request.url.params.get("after"))
+            index = int(request.url.params.get("after") or 0)
+            body = {"data": graph_pages[index]}
+            if index + 1 < len(graph_pages):
+                body["paging"] = {"cursors": {"after": str(index + 1)}, "next": "more"}
+            return httpx.Response(200, json=body)
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(scraper_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(scraper_module, "api_budget", _unlimited_budget())
+                scraper = FacebookAdsLibraryAPI()
+                scraper.access_token = "token"
+                paging = PagingState()
+
+                first = [ad async for page in scraper.iter_ads("keto", limit=2, paging=paging) for ad in page]
+                assert (paging.after_cursor, paging.exhausted, paging.source) == ("1", False, "api")
+
+                second = [ad async for page in scraper.iter_ads("keto", limit=2, exclude_ids=["1", "2"], paging=paging) for ad in page]
+                return first, second, paging
+
+        first, second, paging = asyncio.run(run())
+        assert [ad.external_id for ad in first] == ["1", "2"]
+        assert [ad.external_id for ad in second] == ["3"]
+        assert paging.exhausted and paging.after_cursor is None
+        assert requests == [None, "1"]
+
+
+def _ads(prefix, count):
+    return [make_ad(f"{prefix}{i}") for i in range(count)]
+
+
+def _history(query, *results):
+    """Yield history with the given (returned, requested) API results for query in US."""
+    from app.services.search_yield import SearchYieldHistory
+
+    history = SearchYieldHistory(ttl_hours=1, low_yield=0.5, blocked_after=2)
+    for returned, requested in results:
+        history.record(query, "US", returned, requested)
+    return history
+
+
+class TestHedgedSearch:
+    """Tests for concurrent API + Chromium search of low-yield keywords."""
+
+    def _scraper(self, api_ads, api_delay, browser_ads, browser_delay, calls):
+        scraper = FacebookAdsLibraryAPI()
+        scraper.access_token = "token"
+
+        def source(name, ads, delay):
+            async def iterate(*args, **kwargs):
+                calls.append(name)
+                try:
+                    await asyncio.sleep(delay)
+                    yield ads
+                except asyncio.CancelledError:
+                    calls.append(f"{name} cancelled")
+                    raise
+            return iterate
+
+        scraper._iter_api_search = source("api", api_ads, api_delay)
+        scraper._iter_fallback_search = source("browser", browser_ads, browser_delay)
+        return scraper
+
+    def test_low_yield_query_is_hedged(self, monkeypatch):
+        """A predicted low-yield query runs both searches; the first full result wins."""
+        from app.services import scraper as scraper_module
+        monkeypatch.setattr(scraper_module, "search_yield", _history("semaglutide", (10, 100)))
+
+        calls = []
+        scraper = self._scraper(_ads("a", 10), 0.2, _ads("b", 100), 0.01, calls)
+        ads = asyncio.run(scraper.search_ads("semaglutide", limit=100))
+
+        assert len(ads) == 100 and ads[0].external_id == "b0"
+        assert "api cancelled" in calls
+
+    def test_short_results_are_merged(self, monkeypatch):
+        """If neither search fills the limit, API ads come first, deduped."""
+        from app.services import scraper as scraper_module
+        history = _history("semaglutide", (10, 100))
+        monkeypatch.setattr(scraper_module, "search_yield", history)
+
+        calls = []
+        scraper = self._scraper(_ads("a", 10), 0.01, _ads("a", 5) + _ads("b", 50), 0.02, calls)
+        ads = asyncio.run(scraper.search_ads("semaglutide", limit=100))
+
+        assert [ad.external_id for ad in ads[:10]] == [f"a{i}" for i in range(10)]
+        assert len(ads) == 60
+        # The completed API search updates the history
+        assert history.predict("semaglutide", "US") == 0.1
+
+    def test_pages_stream_while_the_other_search_runs(self, monkeypatch):
+        """API pages are yielded as they arrive, not after Chromium finishes."""
+        from app.services import scraper as scraper_module
+        monkeypatch.setattr(scraper_module, "search_yield", _history("semaglutide", (10, 100)))
+
+        calls = []
+        scraper = self._scraper(_ads("a", 10), 0.01, _ads("b", 100), 0.5, calls)
+
+        async def run():
+            pages = scraper.iter_ads("semaglutide", limit=100)
+            first = await asyncio.wait_for(pages.__anext__(), timeout=0.2)
+            await pages.aclose()
+            return first
+
+        first = asyncio.run(run())
+        assert [ad.external_id for ad in first] == [f"a{i}" for i in range(10)]
+        assert "browser cancelled" in calls
+
+    def test_cancelled_and_failed_api_searches_update_the_history(self, monkeypatch):
+        """The API's yield is recorded when Chromium wins, and a failure counts as zero."""
+        from app.services import scraper as scraper_module
+        history = _history("semaglutide", (40, 100))
+        monkeypatch.setattr(scraper_module, "search_yield", history)
+
+        scraper = self._scraper(_ads("a", 10), 0.2, _ads("b", 100), 0.01, [])
+        asyncio.run(scraper.search_ads("semaglutide", limit=100))
+        assert history.predict("semaglutide", "US") == 0.2
+
+        async def failing(*args, **kwargs):
+            raise RuntimeError("Graph API error")
+            yield []
+
+        scraper._iter_api_search = failing
+        scraper._iter_fallback_search = self._scraper([], 0, _ads("b", 50), 0.01, [])._iter_fallback_search
+        asyncio.run(scraper.search_ads("semaglutide", limit=100))
+        assert history.predict("semaglutide", "US") == 0.1
+
+    def test_blocked_query_skips_api(self, monkeypatch):
+        """Repeated empty API results send the query straight to Chromium."""
+        from app.services import scraper as scraper_module
+        monkeypatch.setattr(scraper_module, "search_yield", _history("blocked term", (0, 10), (0, 10)))
+
+        calls = []
+        scraper = self._scraper([], 0, _ads("b", 10), 0, calls)
+        ads = asyncio.run(scraper.search_ads("blocked term", limit=10))
+        assert calls == ["browser"] and len(ads) == 10
+
+
+class TestIdFirstSearch:
+    """Tests for listing IDs first and fetching only unseen ads in full."""
+
+    def test_fetches_full_fields_only_for_unseen_ads(self, monkeypatch):
+        """Saved ads come from their rows; unseen IDs are fetched in one ?ids= batch."""
+        import httpx
+        from app.services import scraper as scraper_module
+
+        requests = []
+
+        def handler(request):
+            params = request.url.params
+            requests.append(dict(params))
+            if "ids" in params:
+                return httpx.Response(200, json={
+                    ad_id: {"id": ad_id, "page_name": "New", "ad_creative_link_titles": [f"Fresh {ad_id}"]}
+                    for ad_id in params["ids"].split(",")
+                })
+            return httpx.Response(200, json={"data": [
+                {"id": "1", "page_name": "Known"},
+                {"id": "2", "page_name": "New"},
+                {"id": "3", "page_name": "Blocked"},
+                {"id": "4", "page_name": "New"},
+            ]})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                monkeypatch.setattr(scraper_module, "get_http_client", lambda name: client)
+                monkeypatch.setattr(scraper_module, "api_budget", _unlimited_budget())
+                scraper = FacebookAdsLibraryAPI(db=object())
+                scraper.access_token = "token"
+                scraper._load_blacklists = lambda: ({"blocked"}, [])
+                scraper._known_ads = lambda ids: {"1": make_ad(1, brand="Known")} if "1" in ids else {}
+                scraper._log_api_usage = lambda *args: None
+                return await scraper.search_ads("keto", limit=10, id_first=True)
+
+        ads = asyncio.run(run())
+        assert [(ad.external_id, ad.headline) for ad in ads] == [("1", "Headline 1"), ("2", "Fresh 2"), ("4", "Fresh 4")]
+        assert requests[0]["fields"] == "id,page_name"
+        assert requests[1]["ids"] == "2,4"
+        assert len(requests) == 2
+
+
+class TestApiUsageLog:
+    """Tests for recording API usage on the caller's session."""
+
+    def test_usage_is_left_for_the_caller_to_commit(self):
+        """The log is added to the search's session but not committed mid-search."""
+        class _Db:
+            def __init__(self):
+                self.added = []
+                self.commits = 0
+
+            def add(self, record):
+                self.added.append(record)
+
+            def commit(self):
+                self.commits += 1
+
+        db = _Db()
+        FacebookAdsLibraryAPI(db=db)._log_api_usage("keto", 2, 40, 30)
+        assert [(log.query, log.api_calls, log.ads_saved) for log in db.added] == [("keto", 2, 30)]
+        assert db.commits == 0
@@ -0,0 +1,106 @@
+"""Search result cache unit tests."""
+import asyncio
+import threading
+
+import pytest
+
+from app.services.search_cache import SearchCache, make_search_key
+
+
+class TestSearchCache:
+    """Tests for TTL caching and single-flight fetches."""
+
+    def test_key_normalisation(self):
+        """Case, whitespace and keyword order don't change the key."""
+        a = make_search_key("  Semaglutide  Pens", "us", 0, ["Free", "trial"], 50)
+        b = make_search_key("semaglutide pens", "US", 0, ["trial", "free "], 50)
+        assert a == b
+        assert a != make_search_key("semaglutide pens", "US", 0, ["trial", "free"], 50, ["123"])
+        assert a != make_search_key("semaglutide pens", "CA", 0, ["trial", "free"], 50)
+
+    def test_hits_after_first_fetch(self):
+        """A second lookup inside the TTL is served from memory."""
+        cache = SearchCache(ttl_seconds=60, max_entries=10)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return ["ad"]
+
+        async def run():
+            first = await cache.get_or_fetch("k", fetch)
+            second = await cache.get_or_fetch("k", fetch)
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first == second == ["ad"]
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_coalesces_concurrent_requests(self):
+        """Identical in-flight searches share one upstream fetch."""
+        cache = SearchCache(ttl_seconds=60, max_entries=10)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ["ad"]
+
+        async def run():
+            return await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert all(r == ["ad"] for r in results)
+        assert len(calls) == 1
+        assert cache.coalesced == 4
+
+    def test_errors_and_invalidation_are_not_cached(self):
+        """Failures propagate without caching; invalidate() empties the cache."""
+        cache = SearchCache(ttl_seconds=60, max_entries=10)
+
+        async def boom():
+            raise RuntimeError("upstream down")
+
+        async def ok():
+            return ["ad"]
+
+        async def run():
+            with pytest.raises(RuntimeError):
+                await cache.get_or_fetch("k", boom)
+            assert await cache.get_or_fetch("k", ok) == ["ad"]
+            cache.invalidate()
+            assert cache.stats()["entries"] == 0
+
+        asyncio.run(run())
+
+    def test_invalidation_from_another_thread_runs_on_the_loop(self):
+        """A blacklist change on the LISTEN thread is applied by the event loop."""
+        cache = SearchCache(ttl_seconds=60, max_entries=10)
+
+        async def ok():
+            return ["ad"]
+
+        async def run():
+            await cache.get_or_fetch("k", ok)
+            listener = threading.Thread(target=cache.invalidate_threadsafe)
+            listener.start()
+            listener.join()
+            # Not touched from the listener thread itself
+            assert cache.stats()["entries"] == 1
+            await asyncio.sleep(0)
+            return cache.stats()
+
+        stats = asyncio.run(run())
+        assert stats["entries"] == 0 and stats["invalidations"] == 1
+
+    def test_evicts_oldest_entries(self):
+        """The cache never holds more than max_entries results."""
+        cache = SearchCache(ttl_seconds=60, max_entries=2)
+
+        async def run():
+            for key in ("a", "b", "c"):
+                await cache.get_or_fetch(key, lambda: asyncio.sleep(0, result=[key]))
+
+        asyncio.run(run())
+        assert list(cache._entries) == ["b", "c"]
@@ -0,0 +1,182 @@
+"""Shared R2 storage client unit tests."""
+import asyncio
+import hashlib
+import threading
+import time
+
+import pytest
+
+from app.services.storage import MIN_PART_SIZE, ObjectTooLarge, R2Storage
+
+
+class _FakeS3:
+    def __init__(self):
+        self.threads = set()
+        self.deleted = []
+
+    def put_object(self, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        self.deleted.append(keys)
+        return {"Errors": [{"Key": key} for key in keys if key.startswith("locked")]}
+
+    def get_object(self, **kwargs):
+        raise RuntimeError("not found")
+
+    def create_multipart_upload(self, **kwargs):
+        self.parts = {}
+        self.aborted = False
+        return {"UploadId": "u1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+        return {}
+
+
+def _storage():
+    storage = R2Storage(max_workers=2, max_attempts=1)
+    storage._client = _FakeS3()
+    return storage
+
+
+class TestR2Storage:
+    """Tests for offloaded R2 calls and their metrics."""
+
+    def test_put_runs_on_storage_threads(self):
+        """Uploads run on the bounded pool, never on the event loop's thread."""
+        storage = _storage()
+
+        async def run():
+            return await asyncio.gather(*(storage.put(f"k{i}.jpg", b"x", "image/jpeg") for i in range(5)))
+
+        urls = asyncio.run(run())
+        storage.shutdown()
+
+        assert urls[0].endswith("/k0.jpg")
+        assert storage._client.threads and all(name.startswith("r2") for name in storage._client.threads)
+        assert storage.stats()["operations"]["put_object"]["calls"] == 5
+
+    def test_delete_batches_and_reports_failures(self, monkeypatch):
+        """Deletes are batched and keys R2 refused are returned."""
+        monkeypatch.setattr("app.services.storage.DELETE_BATCH_SIZE", 2)
+        storage = _storage()
+
+        failed = asyncio.run(storage.delete(["a", "b", "locked-c", "a"]))
+        storage.shutdown()
+
+        assert storage._client.deleted == [["a", "b"], ["locked-c"]]
+        assert failed == ["locked-c"]
+
+    def test_errors_are_counted(self):
+        storage = _storage()
+        with pytest.raises(RuntimeError):
+            storage.call("get_object", Bucket="b", Key="missing")
+        assert storage.stats()["operations"]["get_object"]["errors"] == 1
+
+
+async def _chunks(total: int, chunk_size: int = 1024 * 1024):
+    for start in range(0, total, chunk_size):
+        yield bytes([start // chunk_size % 256]) * min(chunk_size, total - start)
+
+
+class TestStreamingUpload:
+    """Tests for multipart uploads from async byte streams."""
+
+    def test_large_stream_is_uploaded_in_parts(self):
+        """A stream larger than a part becomes ordered parts with a running checksum."""
+        storage = _storage()
+        total = 2 * MIN_PART_SIZE + 123
+
+        async def run():
+            expected = hashlib.sha256()
+            async for chunk in _chunks(total):
+                expected.update(chunk)
+            stored = await storage.put_stream("v.mp4", _chunks(total), "video/mp4", part_size=MIN_PART_SIZE)
+            return stored, expected.hexdigest()
+
+        stored, expected = asyncio.run(run())
+        storage.shutdown()
+
+        s3 = storage._client
+        assert s3.completed == [1, 2, 3]
+        assert [len(s3.parts[n]) for n in (1, 2, 3)] == [MIN_PART_SIZE, MIN_PART_SIZE, 123]
+        assert stored.size == total and stored.sha256 == expected
+
+    def test_small_stream_is_a_single_put(self):
+        storage = _storage()
+        stored = asyncio.run(storage.put_stream("i.jpg", _chunks(5000, 1000), "image/jpeg"))
+        storage.shutdown()
+        assert stored.size == 5000 and storage.stats()["operations"]["put_object"]["calls"] == 1
+
+    def test_too_large_stream_is_aborted(self):
+        """Going past max_size aborts the multipart upload."""
+        storage = _storage()
+        with pytest.raises(ObjectTooLarge):
+            asyncio.run(storage.put_stream(
+                "big.mp4", _chunks(3 * MIN_PART_SIZE), "video/mp4", max_size=MIN_PART_SIZE * 2, part_size=MIN_PART_SIZE
+            ))
+        storage.shutdown()
+        assert storage._client.aborted
+        assert not hasattr(storage._client, "completed")
+
+    def test_abort_waits_for_parts_in_flight(self):
+        """A failing stream aborts only after parts already sending have finished."""
+        storage = _storage()
+        events = []
+        s3 = storage._client
+
+        def upload_part(PartNumber, Body, **kwargs):
+            events.append(f"start {PartNumber}")
+            time.sleep(0.05)
+            events.append(f"end {PartNumber}")
+            return {"ETag": f"etag-{PartNumber}"}
+
+        def abort_multipart_upload(**kwargs):
+            events.append("abort")
+            return {}
+
+        s3.upload_part = upload_part
+        s3.abort_multipart_upload = abort_multipart_upload
+
+        async def broken():
+            async for chunk in _chunks(2 * MIN_PART_SIZE):
+                yield chunk
+            # Both parts are on storage threads by now
+            await asyncio.sleep(0.01)
+            raise RuntimeError("client went away")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(storage.put_stream("v.mp4", broken(), "video/mp4", part_size=MIN_PART_SIZE))
+        storage.shutdown()
+
+        assert events[-1] == "abort"
+        assert events.count("end 1") == 1 and events.count("end 2") == 1
+
+
+class TestLocalUpload:
+    """Tests for streaming uploads to the local uploads directory."""
+
+    def test_partial_file_is_removed(self, tmp_path, monkeypatch):
+        """A stream that breaks off leaves no file behind."""
+        from app.api.v1 import uploads
+
+        monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+
+        async def broken():
+            yield b"x" * 1000
+            raise RuntimeError("client went away")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(uploads.upload_to_local(broken(), "a.jpg", max_size=10_000))
+        assert list(tmp_path.iterdir()) == []